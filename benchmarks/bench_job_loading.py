@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark of reading statepoints and job documents of a workspace.
+
+Compares the previous per job access through signac's synced dictionaries with
+the bulk loader using a single thread and a thread pool, as well as a warm job
+index.
+
+Usage: python benchmarks/bench_job_loading.py [number of jobs] [workspace folder]
+
+Pass a folder on the file system of interest, ie. a Lustre or GPFS scratch
+folder, since the benefit of the thread pool depends on the metadata latency.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import signac
+
+from obr.core.job_index import INDEX_FILE, load_job_files
+from obr.core.queries import flatten_jobs
+
+
+def create_workspace(path: str, n_jobs: int) -> signac.Project:
+    project = signac.init_project(path)
+    base = project.open_job({"solver": "pisoFoam", "parent": {}}).init()
+    for i in range(n_jobs):
+        job = project.open_job({
+            "operation": "decomposePar",
+            "numberOfSubdomains": i,
+            "parent_id": base.id,
+            "parent": {"solver": "pisoFoam", "parent": {}},
+        }).init()
+        job.doc = {
+            "state": {"global": "ready", "is_initialized": True},
+            "cache": {"nCells": 1000 * i},
+            "history": [{"cmd": "decomposePar", "state": "success"}] * 10,
+            "data": [],
+        }
+    return project
+
+
+def legacy_flatten_jobs(jobs) -> dict:
+    """flatten_jobs before the bulk loader"""
+    docs: dict = {}
+    for job in jobs:
+        docs[job.id] = {}
+        for key, value in job.doc.items():
+            docs[job.id].update({key: value})
+        docs[job.id].update(job.sp())
+    return docs
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    folder = sys.argv[2] if len(sys.argv) > 2 else None
+    with tempfile.TemporaryDirectory(dir=folder) as tmp_dir:
+        create_workspace(tmp_dir, n_jobs)
+        # open a fresh project to avoid signac's in memory caches
+        project = signac.get_project(tmp_dir)
+        jobs = list(project)
+        job_paths = {job.id: job.path for job in jobs}
+        index_path = os.path.join(tmp_dir, ".obr", INDEX_FILE)
+
+        print(f"Loading {len(jobs)} jobs")
+        print(f"signac synced dicts:   {timed(legacy_flatten_jobs, jobs):7.3f}s")
+        print(
+            "bulk loader 1 thread: "
+            f" {timed(load_job_files, job_paths, max_workers=1):7.3f}s"
+        )
+        print(f"bulk loader pool:      {timed(load_job_files, job_paths):7.3f}s")
+        print(f"flatten_jobs cold:     {timed(flatten_jobs, project):7.3f}s")
+        print(f"flatten_jobs warm:     {timed(flatten_jobs, project):7.3f}s")
+        os.remove(index_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Benchmark of initializing a child case from its parent case, ie. `_link_path`,
+with the previous subprocess based implementation and `link_tree` using a single
+thread and a thread pool on a synthetic decomposed case.
+
+Usage: python benchmarks/bench_link_path.py [number of processors] [folder]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from subprocess import check_output
+
+from obr.core.core import link_tree
+
+FIELDS = ["U", "p", "k", "epsilon", "nut", "alphat"]
+MESH = ["points", "faces", "owner", "neighbour", "boundary"]
+# the reconstructed case holds more time folders than the processor folders
+TIMES = [str(i / 10) for i in range(20)]
+PROC_TIMES = ["0", "0.1", "0.2"]
+
+
+def legacy_link_path(base: Path, dst: Path, parent_id: str):
+    """_link_path before replacing the subprocess calls"""
+    check_output(["mkdir", "-p", str(dst)])
+    for root, folder, files in os.walk(Path(base)):
+        relative_path = Path(root).relative_to(base)
+        if "processor0" in folder:
+            for fold in folder:
+                if not fold.startswith("processor"):
+                    continue
+                proc_root, proc_folder, _ = next(os.walk(f"{base}/{fold}"))
+                trgt_proc_fold = f"{dst}/{fold}"
+                for proc_cont in proc_folder:
+                    if proc_cont == "constant":
+                        check_output(["mkdir", "-p", trgt_proc_fold])
+                        check_output(
+                            [
+                                "ln",
+                                "-s",
+                                f"../../../{parent_id}/case/{fold}/constant",
+                            ],
+                            cwd=trgt_proc_fold,
+                        )
+                    else:
+                        shutil.copytree(
+                            src=f"{proc_root}/{proc_cont}",
+                            dst=f"{trgt_proc_fold}/{proc_cont}",
+                            symlinks=False,
+                        )
+            pop_idx = [i for i, f in enumerate(folder) if f.startswith("processor")]
+            for i in sorted(pop_idx, reverse=True):
+                del folder[i]
+
+        for fold in folder:
+            dst_ = dst / relative_path / fold
+            if not dst_.exists():
+                check_output(["mkdir", fold], cwd=dst / relative_path)
+
+        for fn in files:
+            src = Path(root) / fn
+            dst_ = Path(dst) / relative_path / fn
+            if not dst_.exists():
+                check_output(
+                    ["ln", "-s", str(os.path.relpath(src, dst / relative_path))],
+                    cwd=dst / relative_path,
+                )
+
+
+def create_case(path: Path, n_procs: int) -> None:
+    """Creates a decomposed case with some time folders"""
+
+    def write(folder: Path, fns: list[str]):
+        folder.mkdir(parents=True, exist_ok=True)
+        for fn in fns:
+            (folder / fn).write_text("FoamFile {}\n" + "0 " * 1000)
+
+    write(
+        path / "system", ["controlDict", "fvSolution", "fvSchemes", "decomposeParDict"]
+    )
+    write(path / "constant", ["transportProperties", "turbulenceProperties"])
+    write(path / "constant/polyMesh", MESH)
+    for time_folder in TIMES:
+        write(path / time_folder, FIELDS)
+    for i in range(n_procs):
+        write(path / f"processor{i}/constant/polyMesh", MESH)
+        for time_folder in PROC_TIMES:
+            write(path / f"processor{i}/{time_folder}", FIELDS)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def best_of(repeats, func, base, dst, *args, **kwargs):
+    """Returns the minimum runtime of repeated linking into a fresh dst"""
+    runtimes = []
+    for _ in range(repeats):
+        runtimes.append(timed(func, base, dst, *args, **kwargs))
+        shutil.rmtree(dst.parent)
+    return min(runtimes)
+
+
+def main():
+    n_procs = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    folder = sys.argv[2] if len(sys.argv) > 2 else None
+    with tempfile.TemporaryDirectory(dir=folder) as tmp_dir:
+        workspace = Path(tmp_dir)
+        base = workspace / "parent" / "case"
+        create_case(base, n_procs)
+        print(f"Linking a case with {n_procs} processor folders")
+        for name, func, kwargs in [
+            ("subprocess", legacy_link_path, {}),
+            ("link_tree 1 thread", link_tree, {"max_workers": 1}),
+            ("link_tree pool", link_tree, {}),
+        ]:
+            dst = workspace / "child" / "case"
+            runtime = best_of(3, func, base, dst, "parent", **kwargs)
+            print(f"{name + ':':22} {runtime:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
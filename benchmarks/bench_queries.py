@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark of the compiled query engine against the previous per-key
+implementation of `query_flat_jobs` on synthetic flattened jobs.
+
+Usage: python benchmarks/bench_queries.py [number of jobs]
+"""
+import sys
+import random
+import time
+
+from copy import deepcopy
+
+from obr.core.queries import (
+    build_filter_query,
+    execute_query,
+    query_flat_jobs,
+    query_result,
+)
+
+
+def legacy_query_flat_jobs(jobs, queries, output, latest_only, strict):
+    """query_flat_jobs before compiling queries to a QueryMatcher"""
+    ret = []
+    for job_id, doc in jobs.items():
+        tmp_qs = []
+        all_required = True
+        for q in queries:
+            res_cache = {}
+            for key, value in doc.items():
+                q_tmp = deepcopy(q)
+                res = execute_query(q_tmp, key, value, latest_only, [])
+                if res.state:
+                    if res.negate:
+                        all_required = False
+                        break
+                    res_cache = res.state
+                    tmp_qs.append(res)
+            if q.value and not res_cache:
+                all_required = False
+
+        res_tmp = query_result(job_id)
+        for q in tmp_qs:
+            res_tmp.result.append(q.state)
+            res_tmp.sub_keys.append(q.sub_keys)
+        if strict:
+            all_required = len(res_tmp.result) == len(queries)
+        res_tmp_dict = {}
+        for d in res_tmp.result:
+            res_tmp_dict.update(d)
+        res_tmp.result = [res_tmp_dict]
+        if all_required:
+            ret.append(deepcopy(res_tmp))
+    return ret
+
+
+def synthetic_jobs(n_jobs: int, seed: int = 42) -> dict[str, dict]:
+    """Creates flattened jobs resembling a three level parameter study"""
+    rng = random.Random(seed)
+    base = {
+        "solver": "pisoFoam",
+        "type": "GitRepo",
+        "parent": {},
+        "parent_id": None,
+        "has_child": True,
+        "post_build": [{"fvSolution": {"maxIter": 3000, "tolerance": "1e-04"}}],
+    }
+    jobs = {}
+    for i in range(n_jobs):
+        mesh = {
+            "operation": "blockMesh",
+            "cells": rng.choice([10, 20, 40, 80]),
+            "parent_id": "base",
+            "parent": base,
+            "has_child": True,
+        }
+        jobs[f"{i:032x}"] = {
+            "state": {"global": rng.choice(["ready", "completed", "failure"])},
+            "cache": {"nCells": rng.randint(1000, 100000)},
+            "history": [
+                {"cmd": "blockMesh", "state": "success"},
+                {"cmd": "decomposePar", "state": "success"},
+            ],
+            "operation": "decomposePar",
+            "numberOfSubdomains": rng.choice([1, 2, 4, 8, 16]),
+            "parent_id": f"mesh{i}",
+            "parent": mesh,
+            "has_child": False,
+            "keys": ["numberOfSubdomains"],
+        }
+    return jobs
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - start
+
+
+def main():
+    n_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    jobs = synthetic_jobs(n_jobs)
+    filters = [
+        ["solver==pisoFoam"],
+        ["global==completed", "numberOfSubdomains>=4"],
+        ["maxIter>2900", "cells<40", "nCells"],
+    ]
+    print(f"Querying {n_jobs} synthetic jobs")
+    for f in filters:
+        queries = build_filter_query(f)
+        legacy, t_legacy = timed(
+            legacy_query_flat_jobs, jobs, queries, False, True, False
+        )
+        compiled, t_compiled = timed(query_flat_jobs, jobs, queries, False, True, False)
+        assert [(r.id, r.result, r.sub_keys) for r in legacy] == [
+            (r.id, r.result, r.sub_keys) for r in compiled
+        ]
+        print(
+            f"{str(f):50} matches: {len(compiled):6} legacy: {t_legacy:7.3f}s"
+            f" compiled: {t_compiled:7.3f}s speedup: {t_legacy / t_compiled:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 
-from ..core.core import modifies_file
+from ..core.core import logged_cache_hit, modifies_file
+from ..core.file_hash import file_digest
+from ..core.mesh_cache import cached_mesh, mesh_cache_enabled, mesh_key
 from typing import TYPE_CHECKING, Any, Optional
-from subprocess import check_output
-import sys
+import re
+import time
 from pathlib import Path
 
 
 if TYPE_CHECKING:
 
     class OpenFOAMCase:
+        path: Any
+        job: Any
         constant_folder: Any
         controlDict: Any
         system_folder: Any
@@ -19,6 +23,9 @@ if TYPE_CHECKING:
 else:
     _Base = object
 
+# entries of the controlDict which determine how meshes are written
+MESH_WRITE_SETTINGS = ("writeFormat", "writePrecision", "writeCompression")
+
 
 def calculate_simple_partition(nSubDomains, decomp):
     """Calculates a simple domain decomposition based on nSubDomains
@@ -54,24 +61,39 @@ def calculate_simple_partition(nSubDomains, decomp):
         return decomp
 
 
-def sed(fn, in_reg_exp, out_reg_exp, inline=True):
-    """wrapper around sed"""
-    if sys.platform == "darwin":
-        ret = check_output(
-            ["sed", "-i", "", "s/" + in_reg_exp + "/" + out_reg_exp + "/g", fn]
-        )
-    else:
-        ret = check_output(
-            ["sed", "-i", "s/" + in_reg_exp + "/" + out_reg_exp + "/g", fn]
+def cells_pattern(cells: str) -> re.Pattern:
+    """Returns a pattern matching the tokens of a cells entry, ie. (10 10 1),
+    independent of the whitespace between the tokens. Numbers only match complete
+    numbers, ie. 10 does not match 110."""
+    tokens = re.findall(r"[()]|[^\s()]+", cells)
+    is_word = [token not in "()" for token in tokens]
+    pattern = r"(?<![^\s()])" if is_word[0] else ""
+    for i, token in enumerate(tokens):
+        if i:
+            pattern += r"\s+" if is_word[i - 1] and is_word[i] else r"\s*"
+        pattern += re.escape(token)
+    if is_word[-1]:
+        pattern += r"(?![^\s()])"
+    return re.compile(pattern)
+
+
+def set_cells(blockMeshDict: Path, substitutions: list[tuple[str, str]]) -> None:
+    """Replaces cells entries of a blockMeshDict in a single read and write. The
+    substitutions are applied in the given order.
+
+    Raises:
+        ValueError: if a cells entry is not found
+    """
+    content = Path(blockMeshDict).read_text()
+    for old_cells, new_cells in substitutions:
+        content, count = cells_pattern(old_cells.strip()).subn(
+            lambda _: new_cells.strip(), content
         )
+        if not count:
+            raise ValueError(f"{old_cells.strip()} not found in {blockMeshDict}")
+    Path(blockMeshDict).write_text(content)
 
 
-def set_cells(blockMeshDict, old_cells, new_cells):
-    """ """
-    sed(blockMeshDict, old_cells, new_cells)
-
-
-# TODO use FileParse as a base for modifying the blockMeshDict
 class BlockMesh(_Base):
     """A mixin class to add block mesh functionalities and wrapper"""
 
@@ -103,7 +125,7 @@ class BlockMesh(_Base):
         fn = self.blockMeshDict
         if not fn:
             return None
-        return check_output(["md5sum", str(fn)], text=True)
+        return file_digest(fn)
 
     def refineMesh(self, args: dict):
         """ """
@@ -112,21 +134,21 @@ class BlockMesh(_Base):
             modifies_file(self.controlDict.path)
             deltaT = float(self.controlDict.get("deltaT"))
             self.controlDict.set({"deltaT": deltaT / 2.0})
-        self._exec_operation(["refineMesh", "-overwrite"])
+        # the current mesh and refineMeshDict determine the refined mesh
+        inputs = [self.constant_folder / "polyMesh"]
+        inputs.append(self.system_folder / "refineMeshDict")
+        self._exec_mesher(["refineMesh", "-overwrite"], inputs)
 
     def modifyBlockMesh(self, args: dict):
-        modifies_file(self.blockMeshDict)
+        blockMeshDict = self.blockMeshDict
+        if not blockMeshDict:
+            raise ValueError(f"No blockMeshDict found in {self.path}")
+        modifies_file(blockMeshDict)
         blocks = args["modifyBlock"]
         if isinstance(blocks, str):
             blocks = [blocks]
 
-        for block in blocks:
-            orig_block, target_block = block.split("->")
-            set_cells(
-                self.blockMeshDict,
-                orig_block,
-                target_block,
-            )
+        set_cells(blockMeshDict, [block.split("->") for block in blocks])
 
     def blockMesh(self, args: dict = {}):
         # TODO replace this with writes_file and clean polyMesh folder
@@ -137,7 +159,57 @@ class BlockMesh(_Base):
             self.controlDict.set(controlDictArgs)
         if args.get("modifyBlock"):
             self.modifyBlockMesh(args)
-        self._exec_operation(["blockMesh"])
+        inputs = None
+        # files included by the blockMeshDict are not part of the mesh key, thus
+        # dictionaries with includes are not cached. This also matches
+        # #includeEtc and #includeFunc
+        fn = self.blockMeshDict
+        if fn and b"#include" not in fn.read_bytes():
+            inputs = [fn]
+        self._exec_mesher(["blockMesh"], inputs)
+
+    def _exec_mesher(self, cmd: list[str], inputs: Optional[list[Path]]):
+        """Calls a mesher, if a mesh with identical inputs has been generated before
+        the mesh is taken from the mesh cache instead, see obr.core.mesh_cache
+
+        Args:
+            cmd: the mesher and its arguments
+            inputs: files and folders which determine the mesh, None if the mesh
+                can't be cached
+        """
+        if inputs is None or not mesh_cache_enabled():
+            return self._exec_operation(cmd)
+
+        poly_mesh = self.constant_folder / "polyMesh"
+        log = None
+
+        def generate() -> bool:
+            nonlocal log
+            start = int(time.time())
+            log = self._exec_operation(cmd)
+            # failed meshers leave the previous mesh
+            for fn in ("points", "points.gz"):
+                points = poly_mesh / fn
+                if points.exists() and points.stat().st_mtime >= start:
+                    return True
+            return False
+
+        key = mesh_key(cmd[0], self.path, inputs, self._mesh_write_settings())
+        entry = cached_mesh(self.job.path, key, poly_mesh, generate)
+        if entry:
+            logged_cache_hit(cmd, entry, self.job.doc)
+        return log
+
+    def _mesh_write_settings(self) -> dict[str, Any]:
+        """Returns the entries of the controlDict which determine how the mesh is
+        written, missing entries are None"""
+        settings = {}
+        for name in MESH_WRITE_SETTINGS:
+            try:
+                settings[name] = self.controlDict.get(name)
+            except Exception:
+                settings[name] = None
+        return settings
 
     def checkMesh(self, args: dict = {}):
         # TODO replace this with writes_file and clean polyMesh folder
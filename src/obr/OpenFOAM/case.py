@@ -3,15 +3,16 @@ import os
 import re
 import logging
 
+from copy import deepcopy
+from functools import cached_property
 from typing import Union, Generator, Tuple, Any
 from pathlib import Path
-from subprocess import check_output
 from signac.job import Job
-from datetime import datetime
 from Owls.parser.FoamDict import FileParser
 from Owls.parser.LogFile import LogFile
 
 from ..core.core import (
+    logged_cache_hit,
     logged_execute,
     logged_func,
     modifies_file,
@@ -19,8 +20,23 @@ from ..core.core import (
     TemporaryFolder,
     DelinkFolder,
     find_time_folder,
+    parse_foam_file_dict,
+    read_foam_header,
 )
+from ..core.decomposition_cache import (
+    decompose_slot,
+    decomposition_cache,
+    decomposition_cache_enabled,
+    decomposition_key,
+    populate_decomposition,
+    store_decomposition,
+)
+from ..core.history import latest_job_history, record_time
+from ..core.job_graph import set_job_cache, set_job_state, update_job_state
+from ..core.dict_cache import DictCache
+from ..core.file_hash import digest_algorithm, file_digest, hash_algorithm, stat_key
 from .BlockMesh import BlockMesh, calculate_simple_partition
+from .log_tail import SolverLogTail
 
 logger = logging.getLogger("OBR")
 
@@ -33,12 +49,16 @@ OF_HEADER_REGEX = r"""(/\*--------------------------------\*- C\+\+ -\*---------
 \\\*---------------------------------------------------------------------------\*/)"""
 
 
+_dict_cache = DictCache()
+
+
 class File(FileParser):
     def __init__(self, **kwargs):
         # forwards all unused arguments
         self._file = kwargs["file"]
         self._folder = kwargs["folder"]
         self.job = kwargs["job"]
+        self._parsed_key = None
         kwargs["path"] = Path(self._folder) / self._file
         if not kwargs["path"].exists():
             self.path = kwargs["path"]
@@ -48,27 +68,40 @@ class File(FileParser):
         self._md5sum = None
 
     def get(self, name: str):
-        """Get a value from an OpenFOAM dictionary file"""
-        # TODO replace with a safer option
-        # also consider moving that to Owls
-        self.update()
-        try:
-            return eval(super().get(name))
-        except:
-            return super().get(name)
+        """Get a value from an OpenFOAM dictionary file. Values are cached until
+        the file changes, see `DictCache`"""
+        key = stat_key(self.path)
+        values = _dict_cache.values(self.path, key)
+        if name not in values:
+            self._update(key)
+            # TODO replace with a safer option
+            # also consider moving that to Owls
+            try:
+                values[name] = eval(super().get(name))
+            except:
+                values[name] = super().get(name)
+        value = values[name]
+        return deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def _update(self, key: Union[tuple, None] = None):
+        """Parses the file unless it has been parsed in its current state"""
+        key = key or stat_key(self.path)
+        if self._parsed_key != key:
+            self.update()
+            self._parsed_key = key
 
     def md5sum(self, refresh=False) -> str:
-        """Compute a files md5sum"""
+        """Compute a files md5sum, see `file_digest`"""
         if not self.path.exists():
             raise FileNotFoundError(self.path)
         if not self._md5sum or refresh:
-            self._md5sum = check_output(["md5sum", str(self.path)], text=True)
+            self._md5sum = file_digest(self.path)
         return self._md5sum
 
     def is_modified(self) -> bool:
         if not self._md5sum:
             return False
-        current_md5sum = check_output(["md5sum", str(self.path)], text=True)
+        current_md5sum = file_digest(self.path, digest_algorithm(self._md5sum))
         return self._md5sum != current_md5sum
 
     # @decorator_modifies_file
@@ -81,7 +114,9 @@ class File(FileParser):
         args_copy = {k: v for k, v in args.items()}
 
         modifies_file(self.path)
-        self.update()
+        key = stat_key(self.path)
+        self._update(key)
+        values = _dict_cache.values(self.path, key)
         if self.job:
             logged_func(
                 self.set_key_value_pairs,
@@ -92,7 +127,11 @@ class File(FileParser):
         else:
             self.set_key_value_pairs(args_copy)
 
-        self.update()
+        # the written values are dropped even if the stat key did not change, ie.
+        # on file systems with a coarse modification time, and the file is parsed
+        # again on the next lookup of an uncached value
+        self._parsed_key = None
+        _dict_cache.written(self.path, stat_key(self.path), values, args)
         self.md5sum(refresh=True)
 
 
@@ -100,35 +139,46 @@ class OpenFOAMCase(BlockMesh):
     """A class for simple access to typical OpenFOAM files"""
 
     latest_log_path_: Path = Path()
+    latest_log_tail_: Union[SolverLogTail, None] = None
 
     def __init__(self, path, job):
         self.path_ = Path(path)
         self.job: Job = job
 
-        # Non-optional files system folder files
-        self.controlDict = File(folder=self.system_folder, file="controlDict", job=job)
-        self.fvSolution = File(folder=self.system_folder, file="fvSolution", job=job)
-        self.fvSchemes = File(folder=self.system_folder, file="fvSchemes", job=job)
+    # File handles are created on first access, such that constructing a case
+    # neither touches the file system nor scans the case tree
+    @cached_property
+    def controlDict(self) -> File:
+        return File(folder=self.system_folder, file="controlDict", job=self.job)
 
-        self.transportProperties = File(
-            folder=self.constant_folder, file="transportProperties", job=job
-        )
+    @cached_property
+    def fvSolution(self) -> File:
+        return File(folder=self.system_folder, file="fvSolution", job=self.job)
 
-        # optional but commonly used files
-        self.decomposeParDict = False
-        if Path(self.system_folder / "decomposeParDict").exists():
-            self.decomposeParDict = File(
-                folder=self.system_folder, file="decomposeParDict", job=job
-            )
+    @cached_property
+    def fvSchemes(self) -> File:
+        return File(folder=self.system_folder, file="fvSchemes", job=self.job)
 
-        self.turbulenceProperties = False
-        if Path(self.constant_folder / "turbulenceProperties").exists():
-            self.turbulenceProperties = File(
-                folder=self.constant_folder, file="turbulenceProperties", job=job
-            )
+    @cached_property
+    def transportProperties(self) -> File:
+        return File(
+            folder=self.constant_folder, file="transportProperties", job=self.job
+        )
 
-        self.file_dict: dict[str, File] = dict()
-        self.config_file_tree
+    # optional but commonly used files
+    @cached_property
+    def decomposeParDict(self) -> Union[File, bool]:
+        if not Path(self.system_folder / "decomposeParDict").exists():
+            return False
+        return File(folder=self.system_folder, file="decomposeParDict", job=self.job)
+
+    @cached_property
+    def turbulenceProperties(self) -> Union[File, bool]:
+        if not Path(self.constant_folder / "turbulenceProperties").exists():
+            return False
+        return File(
+            folder=self.constant_folder, file="turbulenceProperties", job=self.job
+        )
 
     @property
     def path(self) -> Path:
@@ -191,18 +241,22 @@ class OpenFOAMCase(BlockMesh):
             # const_polymesh and system_include can be None
             return
         if folder.is_dir():
-            for f_path in folder.iterdir():
-                if f_path.is_file() and not f_path.is_symlink():
-                    if self.has_openfoam_header(f_path):
-                        rel_path = str(f_path.relative_to(self.path))
-                        file_obj = File(folder=folder, file=f_path.name, job=self.job)
-                        yield file_obj, rel_path
+            with os.scandir(folder) as it:
+                f_paths = [Path(e.path) for e in it if e.is_file(follow_symlinks=False)]
+            for f_path in f_paths:
+                if self.has_openfoam_header(f_path):
+                    rel_path = str(f_path.relative_to(self.path))
+                    file_obj = File(folder=folder, file=f_path.name, job=self.job)
+                    yield file_obj, rel_path
 
     @property
     def current_time(self) -> float:
-        """Returns the current timestep of the simulation"""
-        self.fetch_latest_log()
-        return self.latest_log.latestTime.time
+        """Returns the current timestep of the simulation, 0 if the log does not
+        contain a completed time step yet"""
+        tail = self.latest_log_tail
+        if not tail:
+            raise ValueError("No Logfile found")
+        return tail.time or 0.0
 
     @property
     def progress(self) -> float:
@@ -224,11 +278,31 @@ class OpenFOAMCase(BlockMesh):
         self.latest_log_handle_ = LogFile(log, matcher=[])
         return self.latest_log_handle_
 
+    @property
+    def latest_log_tail(self) -> Union[SolverLogTail, None]:
+        """Returns the statistics of the latest time step of the latest log.
+
+        The parsed offset and statistics are stored in the job document cache,
+        thus only the part of the log appended since the last call is parsed.
+        """
+        log = self.latest_solver_log_path
+        if not log or not log.exists():
+            return None
+        key = path_to_key(log.name)
+        tails = self.job.doc.get("cache", {}).get("log_tail", {})
+        state = tails.get(key)
+        tail = SolverLogTail.from_dict(state() if callable(state) else state)
+        if tail.update(log):
+            # only the state of the latest log is kept
+            set_job_cache(self.job, "log_tail", {key: tail.to_dict()})
+        self.latest_log_tail_ = tail
+        return tail
+
     @property
     def finished(self) -> bool:
         """check if the latest simulation run has finished gracefully"""
-        if self.process_latest_time_stats():
-            return self.latest_log.footer.completed
+        if self.process_latest_time_stats() and self.latest_log_tail_:
+            return self.latest_log_tail_.completed
         return False
 
     @property
@@ -251,33 +325,47 @@ class OpenFOAMCase(BlockMesh):
         else:
             self.latest_log_path_ = None
 
-    @property
-    def config_file_tree(self) -> list[str]:
-        """Iterates through case file tree and returns a list of paths to non-symlinked files."""
+    @cached_property
+    def file_dict(self) -> dict[str, File]:
+        """The OpenFOAM config files of the case by their path relative to the case,
+        the case tree is scanned on first access"""
+        file_dict: dict[str, File] = dict()
         for file, rel_path in self.config_files_in_folder(self.system_folder):
-            self.file_dict[rel_path] = file
+            file_dict[rel_path] = file
         for file, rel_path in self.config_files_in_folder(self.constant_folder):
-            self.file_dict[rel_path] = file
+            file_dict[rel_path] = file
         for file, rel_path in self.config_files_in_folder(self.system_include_folder):
-            self.file_dict[rel_path] = file
+            file_dict[rel_path] = file
         # TODO dont try to create File object for polyMesh files because that might
         # take very long
         # for file, rel_path in self.config_files_in_folder(self.const_polyMesh_folder):
-        #     self.file_dict[rel_path] = file
+        #     file_dict[rel_path] = file
+        return file_dict
+
+    @property
+    def config_file_tree(self) -> list[str]:
+        """Iterates through case file tree and returns a list of paths to non-symlinked files."""
         return list(self.file_dict.keys())
 
     def get(self, key: str) -> Union[File, None]:
         return self.file_dict.get(key, None)
 
     def has_openfoam_header(self, path: Path) -> bool:
-        with path.open() as f:
-            try:
-                header = "".join(f.readlines()[:7])
-                return re.match(OF_HEADER_REGEX, header) is not None
-            except UnicodeDecodeError:
-                return False
+        """Checks the OpenFOAM banner in the first lines of a file. Only the file
+        header is read, see `read_foam_header`, thus files in binary format are
+        recognized by the format entry of the FoamFile dictionary and skipped.
+        """
+        header_bytes = read_foam_header(path)
+        lines = header_bytes.split(b"\n", 7)[:7]
+        try:
+            header = b"\n".join(lines).decode()
+        except UnicodeDecodeError:
+            return False
+        if re.match(OF_HEADER_REGEX, header) is None:
+            return False
+        return parse_foam_file_dict(header_bytes).get("format") != "binary"
 
-    def _exec_operation(self, operation) -> Path:
+    def _exec_operation(self, operation) -> Union[Path, None]:
         return logged_execute(operation, self.path, self.job.doc)
 
     @property
@@ -292,7 +380,7 @@ class OpenFOAMCase(BlockMesh):
         """Removes all artifacts after case generation"""
         self.remove_solver_logs()
 
-        self.job.doc["state"]["global"] = "ready"
+        set_job_state(self.job, "global", "ready")
 
     def decomposePar(self, args={}):
         """Sets decomposeParDict and calls decomposePar. If no decomposeParDict exists a new one
@@ -313,13 +401,6 @@ class OpenFOAMCase(BlockMesh):
                     zero_orig_path, zero_target_path, not self.esi_version
                 )
 
-        tmp_constant_folder = None
-        tmp_zero_folder = None
-        if not self.esi_version:
-            logger.warning(f"Non ESI version of foam detected! Delinking symlinks")
-            tmp_constant_folder = DelinkFolder(self.constant_folder)
-            tmp_zero_folder = DelinkFolder(self.path / "0")
-
         if not self.decomposeParDict:
             decomposeParDictFile = Path(self.system_folder / "decomposeParDict")
             with open(decomposeParDictFile, "a") as fh:
@@ -354,12 +435,11 @@ class OpenFOAMCase(BlockMesh):
                 "numberOfSubdomains": numberSubDomains,
             })
 
-        log = self._exec_operation(["decomposePar", "-force"])
-
-        if tmp_zero_folder:
-            tmp_zero_folder.tear_down()
-        if tmp_constant_folder:
-            tmp_constant_folder.tear_down()
+        if decomposition_cache_enabled():
+            log = self._decompose_cached()
+        else:
+            with decompose_slot(self.job.path):
+                log = self._decompose()
 
         fvSolutionArgs = args.get("fvSolution", {})
         if fvSolutionArgs:
@@ -372,6 +452,49 @@ class OpenFOAMCase(BlockMesh):
             )
         return log
 
+    def _decompose(self) -> Union[Path, None]:
+        """Calls decomposePar, symlinks are replaced by copies for non ESI versions"""
+        tmp_constant_folder = None
+        tmp_zero_folder = None
+        if not self.esi_version:
+            logger.warning(f"Non ESI version of foam detected! Delinking symlinks")
+            tmp_constant_folder = DelinkFolder(self.constant_folder)
+            tmp_zero_folder = DelinkFolder(self.path / "0")
+
+        log = self._exec_operation(["decomposePar", "-force"])
+
+        if tmp_zero_folder:
+            tmp_zero_folder.tear_down()
+        if tmp_constant_folder:
+            tmp_constant_folder.tear_down()
+        return log
+
+    def _decompose_cached(self) -> Union[Path, None]:
+        """Copies the processor folders of an identical decomposition from the
+        decomposition cache, decomposePar is only called if no such decomposition
+        exists. Failed decompositions are not cached."""
+        log = None
+        computed = False
+
+        def create(entry: Path):
+            nonlocal log, computed
+            computed = True
+            with decompose_slot(self.job.path):
+                log = self._decompose()
+            processor_zero = self.path / "processor0"
+            if processor_zero.exists() and find_time_folder(processor_zero):
+                store_decomposition(self.path, entry)
+
+        key = decomposition_key(self.path)
+        entry = decomposition_cache(self.job.path).entry(key, create)
+        if not entry:
+            return log
+        populate_decomposition(entry, self.path)
+        if not computed:
+            logger.info(f"Decomposing case {self.job.id}, reusing {entry.name}")
+            logged_cache_hit(["decomposePar", "-force"], entry, self.job.doc)
+        return log
+
     def setKeyValuePair(self, args: dict):
         path = Path(args.pop("file"))
         file_handle = File(
@@ -387,13 +510,19 @@ class OpenFOAMCase(BlockMesh):
         """Checks if a file has been modified by comparing the current md5sum with
         the previously saved one inside `self.job.dict`.
         """
-        if "md5sum" not in self.job.doc["cache"]:
+        entry = self.job.doc["cache"].get("md5sum", {}).get(path_to_key(file))
+        if not entry:
             return False  # no md5sum has been calculated for this file
-        current_md5sum, last_modified = self.job.doc["cache"]["md5sum"].get(file)
-        if os.path.getmtime(self.path / file) == last_modified:
+        current_md5sum, last_modified, *key = entry
+        path = self.path / file
+        current_key = stat_key(path)
+        if key and tuple(key[0]) == current_key:
+            # if inode, size and modification date dont differ, the md5sums wont
+            return False
+        if not key and os.path.getmtime(path) == last_modified:
             # if modification dates dont differ, the md5sums wont, either
             return False
-        md5sum = check_output(["md5sum", file], text=True)
+        md5sum = file_digest(path, digest_algorithm(current_md5sum), current_key)
         return current_md5sum != md5sum
 
     def is_tree_modified(self) -> list[str]:
@@ -408,50 +537,19 @@ class OpenFOAMCase(BlockMesh):
 
     def process_latest_time_stats(self) -> bool:
         """This function parses the latest time step log and stores the results in
-        the job document.
+        the job document. The statistics are gathered in a single pass over the
+        part of the log which has been appended since the last call.
 
         Return: A boolean indication whether processing was successful
         """
-        if not self.latest_log:
+        tail = self.latest_log_tail
+        if not tail:
             return False
 
         # TODO eventually this should be part of OWLS
-        # Check for failure states
-        if "There are not enough slots available" in self.latest_log.footer.content:
-            self.job.doc["state"]["global"] = "failure"
-            self.job.doc["state"]["failureState"] = "MPI startup error"
-            # No reason for further parsing
-            return False
-
-        if "ERROR" in self.latest_log.footer.content:
-            self.job.doc["state"]["global"] = "failure"
-            self.job.doc["state"]["failureState"] = "FOAM ERROR"
-
-        if "error" in self.latest_log.footer.content:
-            self.job.doc["state"]["global"] = "failure"
-
-        try:
-            self.job.doc["state"]["global"] = "incomplete"
-            self.job.doc["state"]["latestTime"] = self.latest_log.latestTime.time
-            self.job.doc["state"][
-                "continuityErrors"
-            ] = self.latest_log.latestTime.continuity_errors
-            self.job.doc["state"][
-                "CourantNumber"
-            ] = self.latest_log.latestTime.Courant_number
-            self.job.doc["state"]["ExecutionTime"] = (
-                self.latest_log.latestTime.execution_time["ExecutionTime"]
-            )
-            self.job.doc["state"]["ClockTime"] = (
-                self.latest_log.latestTime.execution_time["ClockTime"]
-            )
-            if self.latest_log.footer.completed:
-                self.job.doc["state"]["global"] = "completed"
-            return True
-        except Exception:
-            # if parsing of log file fails, check failure handler
-            self.job.doc["state"]["global"] = "failure"
-            return False
+        state, success = tail.job_state()
+        update_job_state(self.job, state)
+        return success
 
     def detailed_update(self):
         """Perform a detailed update on the job doc state"""
@@ -465,49 +563,48 @@ class OpenFOAMCase(BlockMesh):
     def perform_post_md5sum_calculations(self):
         """
         calculates md5sums for all case files. Primarily called from `dispatch_post_hooks`
+
+        Files whose inode, size and modification time did not change since the last
+        calculation are skipped and the job document is only written if an md5sum
+        changed.
         """
+        md5sums = self.job.doc["cache"].get("md5sum", {})
+        md5sums = md5sums() if callable(md5sums) else dict(md5sums)
+        algorithm = hash_algorithm()
+        updated = dict(md5sums)
         for case_path in self.config_file_tree:
             case_file = Path(self.job.path) / "case" / case_path
-            md5sum = check_output(["md5sum", case_file], text=True)
-            if "md5sum" not in self.job.doc["cache"]:
-                self.job.doc["cache"]["md5sum"] = dict()
             signac_friendly_path = path_to_key(
                 str(case_path)
             )  # signac does not allow . inside paths or job.doc keys
-            last_modified = os.path.getmtime(case_file)
-            self.job.doc["cache"]["md5sum"][signac_friendly_path] = (
-                md5sum.split()[0],
-                last_modified,
-            )
+            key = stat_key(case_file)
+            entry = md5sums.get(signac_friendly_path)
+            if (
+                entry
+                and len(entry) > 2
+                and tuple(entry[2]) == key
+                and digest_algorithm(entry[0]) == algorithm
+            ):
+                continue
+            md5sum = file_digest(case_file, algorithm, key)
+            last_modified = key[2] / 1e9
+            updated[signac_friendly_path] = [md5sum, last_modified, list(key)]
+        if updated != md5sums:
+            set_job_cache(self.job, "md5sum", updated)
 
     def was_successful(self) -> bool:
         """Returns True, if both its label and the last OBR operation returned successful, False otherwise."""
         # check state of last obr operation
         last_op_state = "Failure"
-        if "cache" not in self.job.doc:
-            logger.info(f"Job with {self.job.id} has no cache key.")
+        obr_ops = [
+            record
+            for record in latest_job_history(self.job).values()
+            if record.get("type") == "logged_func"
+        ]
+        if not obr_ops:
+            logger.info(f"Job with {self.job.id} has no obr operation in its history.")
             # TODO possibly debatable if this should return false
             return False
-        else:
-            # find last obr operation
-            last_time = datetime(1, 1, 1, 1, 1, 1)
-            for k, v in self.job.doc["cache"].items():
-                # skip md5sums
-                if k == "md5sum":
-                    continue
-
-                last_of_obr_op = v[-1]
-                if not (time := last_of_obr_op.get("timestamp", None)):
-                    continue
-
-                # timestamps are not standardized and can have to formats (in our case)
-                try:
-                    dt = datetime.strptime(time, "%Y-%m-%d_%H:%M:%S")
-                except ValueError:
-                    dt = datetime.strptime(time, "%Y-%m-%d %H:%M:%S.%f")
-
-                if dt > last_time:
-                    last_time = dt
-                    last_op_state = last_of_obr_op["state"]
+        last_op_state = max(obr_ops, key=record_time)["state"]
         label_state = self.job.doc["state"]
         return last_op_state == label_state == "success"
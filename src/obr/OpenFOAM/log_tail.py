@@ -0,0 +1,217 @@
+"""Incremental reader of OpenFOAM solver logs.
+
+Solver logs of long runs can grow to several GB. Instead of parsing the full log
+whenever the state of a job is validated, ``SolverLogTail`` remembers the byte
+offset up to which a log has been parsed together with the statistics of the
+latest completed time step and only parses the appended part of the log on the next
+update. The state is a plain dictionary, such that it can be stored in the job
+document cache.
+"""
+
+import os
+import re
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Union
+
+# number of bytes before the parsed offset used to detect whether a log has been
+# replaced instead of appended to
+FINGERPRINT_SIZE = 64
+# logs larger than this are not parsed from the start on the first update,
+# instead parsing starts at the second to last time step
+TAIL_SEEK_SIZE = 1 << 20
+READ_CHUNK_SIZE = 1 << 20
+# maximum number of lines kept after the latest completed time step, only lines
+# used to derive the job state are kept, see `is_footer_line`
+FOOTER_MAX_LINES = 8
+MPI_SLOTS_ERROR = "There are not enough slots available"
+
+TIME_RE = re.compile(r"^Time = ([^\s]+?)s?$")
+COURANT_RE = re.compile(r"^Courant Number mean: ([^\s]+) max: ([^\s]+)")
+CONTINUITY_RE = re.compile(
+    r"^time step continuity errors : sum local = ([^\s,]+), global = ([^\s,]+),"
+    r" cumulative = ([^\s,]+)"
+)
+EXECUTION_TIME_RE = re.compile(r"^ExecutionTime = ([^\s]+) s\s+ClockTime = ([^\s]+) s")
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return float("nan")
+
+
+def is_footer_line(line: str) -> bool:
+    """Whether a line after the latest completed time step is used to derive the
+    job state"""
+    return line == "End" or "ERROR" in line or MPI_SLOTS_ERROR in line
+
+
+@dataclass
+class SolverLogTail:
+    """Statistics of the latest completed time step of a solver log and the
+    position up to which the log has been parsed. A time step is completed once
+    its ExecutionTime line has been written, the statistics of the time step in
+    progress are kept in ``step``."""
+
+    offset: int = 0
+    inode: int = 0
+    fingerprint: str = ""
+    time: Union[float, None] = None
+    courant_number: dict[str, float] = field(default_factory=dict)
+    continuity_errors: dict[str, float] = field(default_factory=dict)
+    execution_time: dict[str, float] = field(default_factory=dict)
+    step: dict[str, Any] = field(default_factory=dict)
+    footer: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, d: Union[dict, None]) -> "SolverLogTail":
+        if not d:
+            return cls()
+        return cls(**{k: v for k, v in d.items() if k in cls.__dataclass_fields__})
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @property
+    def footer_content(self) -> str:
+        """Lines after the latest completed time step which are used to derive the
+        job state, see `is_footer_line`"""
+        return "\n".join(self.footer)
+
+    @property
+    def completed(self) -> bool:
+        """Whether the solver has written End after the latest time step"""
+        return "End" in self.footer
+
+    def job_state(self) -> tuple[dict[str, Any], bool]:
+        """Derives the job state from the log
+
+        A log without a completed time step is a failure, otherwise the job is
+        completed if the solver has written End and incomplete else. A FOAM ERROR
+        is recorded as failureState but does not change the global state.
+
+        Returns: the job state and whether the log contained a completed time step
+        """
+        footer = self.footer_content
+        if MPI_SLOTS_ERROR in footer:
+            return {"global": "failure", "failureState": "MPI startup error"}, False
+
+        state: dict[str, Any] = {}
+        if "ERROR" in footer:
+            state["failureState"] = "FOAM ERROR"
+        if self.time is None:
+            state["global"] = "failure"
+            return state, False
+
+        state["global"] = "completed" if self.completed else "incomplete"
+        state["latestTime"] = self.time
+        state["continuityErrors"] = self.continuity_errors
+        state["CourantNumber"] = self.courant_number
+        state["ExecutionTime"] = self.execution_time.get("ExecutionTime")
+        state["ClockTime"] = self.execution_time.get("ClockTime")
+        return state, True
+
+    def _is_continuation(self, fh, size: int, inode: int) -> bool:
+        """Checks whether the log has been appended to since the last update"""
+        if not self.offset or inode != self.inode or size < self.offset:
+            return False
+        start = max(0, self.offset - FINGERPRINT_SIZE)
+        fh.seek(start)
+        fingerprint = fh.read(self.offset - start).decode("latin-1")
+        return fingerprint == self.fingerprint
+
+    def _tail_start(self, fh, size: int) -> int:
+        """Returns the offset of the second to last time step of a large log, such
+        that the last time step and its predecessor are parsed completely"""
+        if size <= TAIL_SEEK_SIZE:
+            return 0
+        found = 0
+        end = size
+        data = b""
+        while end > 0:
+            start = max(0, end - READ_CHUNK_SIZE)
+            fh.seek(start)
+            data = fh.read(end - start) + data
+            pos = len(data)
+            while (pos := data.rfind(b"\nTime = ", 0, pos)) != -1:
+                found += 1
+                if found == 2:
+                    return start + pos + 1
+            # keep only the part which could hold a match split across chunks
+            data = data[: len(b"\nTime = ") - 1]
+            end = start
+        return 0
+
+    def update(self, path: Union[str, Path]) -> bool:
+        """Parses the part of the log appended since the last update
+
+        Returns: whether new lines have been parsed
+        """
+        stat = os.stat(path)
+        with open(path, "rb") as fh:
+            if not self._is_continuation(fh, stat.st_size, stat.st_ino):
+                start = self._tail_start(fh, stat.st_size)
+                vars(self).update(vars(SolverLogTail()))
+                self.inode = stat.st_ino
+                self.offset = start
+            fh.seek(self.offset)
+            data = fh.read(stat.st_size - self.offset)
+
+        # only complete lines are parsed, an incomplete last line is parsed once
+        # it has been completed
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return False
+        self._parse(data[:end].decode("utf-8", errors="replace").splitlines())
+        self.offset += end
+        start = max(0, end - FINGERPRINT_SIZE)
+        self.fingerprint = data[start:end].decode("latin-1")
+        return True
+
+    def _parse(self, lines: list[str]) -> None:
+        footer = self.footer
+        step = self.step
+        for line in lines:
+            line = line.strip()
+            if line.startswith("Time = "):
+                if match := TIME_RE.match(line):
+                    step = {"time": _to_float(match.group(1))}
+                    continue
+            if line.startswith("Courant Number"):
+                if match := COURANT_RE.match(line):
+                    mean, max_ = match.groups()
+                    step["courant_number"] = {
+                        "mean": _to_float(mean),
+                        "max": _to_float(max_),
+                    }
+                    continue
+            if line.startswith("time step continuity errors"):
+                if match := CONTINUITY_RE.match(line):
+                    sum_local, global_, cumulative = match.groups()
+                    step["continuity_errors"] = {
+                        "sum_local": _to_float(sum_local),
+                        "global": _to_float(global_),
+                        "cumulative": _to_float(cumulative),
+                    }
+                    continue
+            if line.startswith("ExecutionTime"):
+                if match := EXECUTION_TIME_RE.match(line):
+                    execution_time, clock_time = match.groups()
+                    self.execution_time = {
+                        "ExecutionTime": _to_float(execution_time),
+                        "ClockTime": _to_float(clock_time),
+                    }
+                    if "time" in step:
+                        self.time = step["time"]
+                        self.courant_number = step.get("courant_number", {})
+                        self.continuity_errors = step.get("continuity_errors", {})
+                    step = {}
+                    footer = []
+                    continue
+            if is_footer_line(line):
+                footer.append(line)
+        self.step = step
+        self.footer = footer[-FOOTER_MAX_LINES:]
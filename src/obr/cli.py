@@ -42,6 +42,12 @@ from .cli_util import (
     copy_to_archive,
 )
 from .core.core import map_view_folder_to_job_id, profile_call
+from .core.copy_strategy import copy_stats_of_jobs, copy_strategy
+from .core.history import HISTORY_FILE
+from .core.deferred import deferred_side_effects
+from .core.job_graph import refresh_job_graph
+from .core.label_cache import LabelCache
+from .core.view_index import read_view_index
 from .core.logger_setup import logger, setup_logging
 
 
@@ -241,6 +247,17 @@ def run(ctx: click.Context, **kwargs):
                 GLOBAL_UNINIT_COUNT += 1
         os.environ["GLOBAL_UNINIT_COUNT"] = str(GLOBAL_UNINIT_COUNT)
 
+        if operations == ["generate"]:
+            # generate jobs as soon as their parent is ready instead of layer by layer
+            profile_call(
+                project.run_generate,
+                jobs=jobs,
+                np=kwargs.get("tasks", -1),
+                progress=True,
+            )
+            logger.success("Completed all operations")
+            return
+
         profile_call(
             project.run,
             names=operations,
@@ -306,10 +323,13 @@ def init(ctx: click.Context, **kwargs):
 
     if kwargs.get("generate"):
         logger.info("Generating workspace")
-        project.run(
-            names=["generate"],
-            progress=True,
-            np=kwargs.get("tasks", -1),
+        stats_before = copy_stats_of_jobs(project)
+        project.run_generate(np=kwargs.get("tasks", -1), progress=True)
+        stats = copy_stats_of_jobs(project) - stats_before
+        logger.info(
+            f"Copied {stats.files} files with copy strategy {copy_strategy()},"
+            f" duplicated {stats.duplicated / 2**20:.1f} MiB and shared"
+            f" {stats.shared / 2**20:.1f} MiB"
         )
 
 
@@ -329,23 +349,35 @@ def init(ctx: click.Context, **kwargs):
 def status(ctx: click.Context, **kwargs):
     project, jobs = cli_cmd_setup(kwargs)
     sum = int(kwargs.get("summarize", 0))
-    id_view_map = map_view_folder_to_job_id("view")
+    id_view_map = read_view_index(project.path)
+    if id_view_map is None:
+        id_view_map = map_view_folder_to_job_id("view")
     grouped_jobs = project.group_jobs(jobs, id_view_map, summarize=sum)
 
     if len(grouped_jobs) == 0:
         logger.warning(f"No jobs can be displayed for summarize depth {sum}")
         return
 
+    # labels are evaluated read-only, the side effects of labels are dropped
+    refresh_job_graph(project.workspace)
+    label_cache = LabelCache(project.path)
     max_view_len = len(max(grouped_jobs.keys(), key=lambda k: len(k)))
-    for view, jobs in sorted(grouped_jobs.items()):
-        finished = unfinished = 0
-        for job in jobs:
-            if "finished" in project.labels(job):
-                finished += 1
-            else:
-                unfinished += 1
-        pad = " " * (max_view_len - len(view) + 1)
-        logger.info(f"{view}:{pad}| {finished}x Completed | {unfinished}x Incomplete |")
+    with deferred_side_effects():
+        for view, jobs in sorted(grouped_jobs.items()):
+            finished = unfinished = 0
+            for job in jobs:
+                labels = label_cache.value(
+                    job, "labels", lambda: list(project.labels(job))
+                )
+                if "finished" in labels:
+                    finished += 1
+                else:
+                    unfinished += 1
+            pad = " " * (max_view_len - len(view) + 1)
+            logger.info(
+                f"{view}:{pad}| {finished}x Completed | {unfinished}x Incomplete |"
+            )
+    label_cache.save()
 
 
 @cli.command()
@@ -765,6 +797,18 @@ def archive(ctx: click.Context, **kwargs):
                 logger.debug(f"{target_folder}, {signac_job_document}")
                 copy_to_archive(repo, use_git_repo, signac_job_document, target_file)
 
+            # copy history, archived histories are merged via obr merge
+            history = Path(job.path) / HISTORY_FILE
+            if history.exists():
+                md5sum = check_output(["md5sum", str(history)], text=True).split()[0]
+                target_file = (
+                    target_folder / f"workspace/{job.id}/obr_history_{md5sum}.jsonl"
+                )
+                if dry_run:
+                    logger.info(f"Would copy {history} to {target_file}.")
+                else:
+                    copy_to_archive(repo, use_git_repo, history, target_file)
+
             case_folder = Path(job.path) / "case"
             if not case_folder.exists():
                 logger.info(f"Job with {job.id=} has no case folder.")
@@ -840,6 +884,46 @@ def archive(ctx: click.Context, **kwargs):
                 logger.error(e)
 
 
+@cli.command()
+@click.option(
+    "--debug", is_flag=True, help="Increase verbosity of the output to debug mode"
+)
+@click.option(
+    "-f",
+    "--folder",
+    default=".",
+    help="Path to OBR workspace folder or restored data repository",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=0,
+    help="Number of jobs merged in parallel, defaults to the number of cpus.",
+)
+@click.pass_context
+def merge(ctx: click.Context, **kwargs):
+    """Merges archived job documents and histories into the job document and
+    history of every job, ie. after restoring a data repository"""
+    from .core.merge import merge_job_folders
+
+    setup_logging()
+    if kwargs.get("debug"):
+        logger.setLevel(logging.DEBUG)
+    workspace = Path(kwargs["folder"]) / "workspace"
+    if not workspace.exists():
+        logger.error(f"Could not find {workspace}")
+        sys.exit(1)
+
+    with os.scandir(workspace) as it:
+        job_paths = [entry.path for entry in it if entry.is_dir()]
+    stats = merge_job_folders(job_paths, kwargs.get("jobs") or None)
+    logger.success(
+        f"Merged {sum(s.sources for s in stats)} files of {len(stats)} jobs,"
+        f" skipped {sum(s.duplicates for s in stats)} duplicate records"
+    )
+
+
 def main():
     cli(obj={})
 
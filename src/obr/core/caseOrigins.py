@@ -1,12 +1,15 @@
 import logging
-import shutil
+import os
 
 from os import environ
 from os.path import expandvars, isdir
 from pathlib import Path
 from typing import Union
-from subprocess import check_output
-from git.repo import Repo
+from subprocess import DEVNULL, PIPE, CalledProcessError, Popen, check_output, run
+
+from .copy_strategy import copy_tree
+from .content_cache import content_key
+from .origin_cache import OriginCache, tree_digest
 
 logger = logging.getLogger("OBR")
 
@@ -38,16 +41,31 @@ class CaseOnDisk:
             origin = expandvars(origin)
         self.path = Path(origin).expanduser()
 
-    def init(self, path: str):
+    def cache_id(self) -> str:
+        """Identifies the fetched case, see `prefetch`"""
+        return content_key("CaseOnDisk", str(self.path.absolute()))
+
+    def fetch(self, path: str) -> Union[Path, None]:
+        """Copies the case into the origin cache, see `OriginCache`
+
+        Returns: the cached case or None if the case does not exist
+        """
         if not isdir(self.path):
             logger.warning(
                 f"{self.path.absolute} or some parent directory does not exist!"
             )
-            return
+            return None
+        key = content_key(
+            "CaseOnDisk", str(self.path.absolute()), tree_digest(self.path)
+        )
+        return OriginCache.of_job(path).entry(
+            key,
+            lambda dst: copy_tree(self.path, dst, symlinks=False, hardlinks=False),
+        )
 
-        dst = Path(path) / "case"
-        logger.debug(f"copying {self.path} to {dst}")
-        shutil.copytree(src=f"{str(self.path)}", dst=f"{str(dst)}")
+    def init(self, path: str):
+        if entry := self.fetch(path):
+            OriginCache.of_job(path).populate(entry, Path(path) / "case")
 
 
 class OpenFOAMTutorialCase(CaseOnDisk):
@@ -90,7 +108,8 @@ class GitRepo:
             commit: whether to checkout a specific commit (optional)
             branch: whether to checkout a specific branch (optional)
             folder: only use a specific subfolder (optional)
-            cache_folder: prefer copying from this folder if exists (optional)
+            cache_folder: prefer copying from this checkout if it exists, otherwise
+                the repository is cloned into it (optional)
         """
         self.url = url
         self.commit = commit
@@ -98,58 +117,131 @@ class GitRepo:
         self.folder = folder
         self.cache_folder = cache_folder
 
-    def init(self, path):
-        if self.cache_folder and Path(self.cache_folder).exists():
-            # if cache folder has been cloned into before, check for new commits
-            # either way, copy from cache folder to $path/case
-            # if repo init or copying fails for some reason,
-
-            if Path(self.cache_folder + "/.git").exists():
-                repo = Repo(self.cache_folder)
-                default_remote: str = repo.git.symbolic_ref(
-                    "refs/remotes/origin/HEAD", "--short"
-                )
-                current_commit = repo.git.rev_parse("HEAD")
-                origin_branchname = default_remote.split("/")
-                # if commit is specified and if the current one does not equal, checkout given commit
-                if self.commit and self.commit != current_commit:
-                    repo.git.checkout(self.commit)
-                # if current == self.commit, do nothing
-                # if no commit is specified, simply get latest
-                if not self.commit:
-                    repo.git.pull(origin_branchname[0], origin_branchname[-1])
-                check_output(
-                    ["cp", "-r", f"{self.cache_folder}/{self.folder}", path + "/case"]
-                )
-                return
-            else:
-                logging.warning(
-                    "Could not copy from cache_folder to case, will git clone into it"
-                    " instead."
-                )
-
-        # No specific subfolder is specified, clone to self.path
-        if not self.folder:
-            check_output(["git", "clone", self.url, "case"], cwd=path)
-            # also copy to cache folder if specified
-            if self.commit:
-                check_output(["git", "checkout", self.commit], cwd=Path(path) / "case")
-            # also copy to cache folder if specified
-            if self.cache_folder and "None" not in self.cache_folder:
-                check_output(["cp", "-r", path + "/case/.", self.cache_folder])
-
-        else:  # clone to specific subfolder
-            check_output(["git", "clone", self.url, "repo"], cwd=path)
-            if self.commit:
-                check_output(["git", "checkout", self.commit], cwd=Path(path) / "repo")
-            # also copy to cache folder if specified
-            if self.cache_folder and "None" not in self.cache_folder:
-                check_output(["cp", "-r", path + "/repo/.", self.cache_folder])
-            check_output(["cp", "-r", f"repo/{self.folder}", "case"], cwd=path)
-        # checkout specified branch
+    def cache_id(self) -> str:
+        """Identifies the fetched case, see `prefetch`"""
+        return content_key(
+            "GitRepo",
+            self.url,
+            self.commit,
+            self.branch,
+            self.folder,
+            self.cache_folder,
+        )
+
+    def cache_checkout(self) -> Union[Path, None]:
+        """Returns the cache_folder or None if it is not set"""
+        # unset environment variables are expanded to None
+        if not self.cache_folder or "None" in str(self.cache_folder):
+            return None
+        return Path(self.cache_folder)
+
+    def resolve(self, cache: OriginCache) -> tuple[Path, str]:
+        """Returns the mirror of the repository and the commit to checkout. The
+        mirror is updated once per process if a branch or the default branch is
+        requested and if it does not hold the requested commit."""
+        mirror, cloned = cache.git_mirror(self.url)
+        git = ["git", "--git-dir", str(mirror)]
+        rev = self.branch or self.commit or "HEAD"
+        if cloned:
+            _updated_mirrors.add(str(mirror))
+        elif rev == self.commit:
+            has_commit = run(
+                git + ["cat-file", "-e", f"{rev}^{{commit}}"], stderr=DEVNULL
+            )
+            if has_commit.returncode:
+                cache.update_git_mirror(mirror)
+        elif str(mirror) not in _updated_mirrors:
+            cache.update_git_mirror(mirror)
+            _updated_mirrors.add(str(mirror))
+        commit = check_output(git + ["rev-parse", f"{rev}^{{commit}}"], text=True)
+        return mirror, commit.strip()
+
+    def fetch(self, path: str) -> Union[Path, None]:
+        """Checks out the repository into the origin cache, see `OriginCache`. If
+        the cache_folder holds a checkout already it is updated and used instead,
+        otherwise the repository is cloned into the cache_folder.
+
+        Returns: the cached case or None if the checkout failed
+        """
+        checkout = self.cache_checkout()
+        if checkout and (checkout / ".git").exists():
+            if str(checkout) not in _updated_mirrors:
+                self.update_checkout(checkout)
+                _updated_mirrors.add(str(checkout))
+            return checkout / self.folder if self.folder else checkout
+
+        cache = OriginCache.of_job(path)
+        mirror, commit = self.resolve(cache)
+        key = content_key("GitRepo", self.url, commit, self.branch, self.folder)
+        entry = cache.entry(key, lambda dst: self.checkout(mirror, commit, dst))
+        if checkout and not checkout.exists():
+            try:
+                self.clone(mirror, checkout)
+            except CalledProcessError as e:
+                logger.warning(f"Could not clone into cache_folder {checkout}: {e}")
+        elif checkout:
+            logger.warning(
+                f"cache_folder {checkout} is not a git checkout, using the origin cache"
+                " instead."
+            )
+        return entry
+
+    def update_checkout(self, checkout: Path) -> None:
+        """Checks out the requested commit or pulls the latest commits of the
+        requested or default branch into an existing checkout"""
+        git = ["git", "-C", str(checkout)]
+        if self.commit:
+            current_commit = check_output(git + ["rev-parse", "HEAD"], text=True)
+            if current_commit.strip() != self.commit:
+                check_output(git + ["checkout", "--quiet", self.commit])
+            return
+        branch = self.branch
+        if not branch:
+            default_remote = check_output(
+                git + ["symbolic-ref", "refs/remotes/origin/HEAD", "--short"], text=True
+            )
+            branch = default_remote.strip().split("/")[-1]
+        check_output(git + ["checkout", "--quiet", branch])
+        check_output(git + ["pull", "--quiet", "origin", branch])
+
+    def clone(self, mirror: Path, dst: Path) -> None:
+        """Clones the mirror to dst and checks out the requested commit or
+        branch"""
+        # objects of local clones are hardlinked
+        check_output(["git", "clone", "--quiet", "--local", str(mirror), str(dst)])
+        check_output(["git", "remote", "set-url", "origin", self.url], cwd=dst)
+        if self.commit:
+            check_output(["git", "checkout", "--quiet", self.commit], cwd=dst)
         if self.branch:
-            check_output(["git", "checkout", self.branch], cwd=Path(path) / "case")
-            check_output(["git", "checkout", self.branch], cwd=self.cache_folder)
+            check_output(["git", "checkout", "--quiet", self.branch], cwd=dst)
+
+    def checkout(self, mirror: Path, commit: str, dst: Path) -> None:
+        """Clones the mirror to dst or extracts only the requested folder"""
+        if not self.folder:
+            self.clone(mirror, dst)
+            return
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        repo = dst.parent / "repo"
+        repo.mkdir()
+        archive = Popen(
+            ["git", "--git-dir", str(mirror), "archive", commit, "--", self.folder],
+            stdout=PIPE,
+        )
+        if archive.stdout:
+            check_output(["tar", "-x", "-C", str(repo)], stdin=archive.stdout)
+            archive.stdout.close()
+        if archive.wait():
+            raise CalledProcessError(archive.returncode, "git archive")
+        os.rename(repo / self.folder, dst)
+
+    def init(self, path):
+        if entry := self.fetch(path):
+            OriginCache.of_job(path).populate(entry, Path(path) / "case")
+
+
+# mirrors and checkouts which have been updated by the current process
+_updated_mirrors: set[str] = set()
 
 
 def instantiate_origin_class(
@@ -0,0 +1,134 @@
+"""Content-addressed caches of artifacts shared between jobs.
+
+Fetched cases, decompositions and meshes are stored once per project in a folder
+below ``.obr`` and keyed by a digest of their inputs. Entries are created in a
+temporary folder and renamed when complete, concurrent creations of the same entry
+by several processes are serialized by a lock file, such that an entry is created
+only once.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Generator, Iterable, Union
+
+from .file_hash import file_digest
+
+logger = logging.getLogger("OBR")
+
+
+def foam_version() -> tuple[str, str]:
+    """Returns the name and version of the sourced OpenFOAM distribution"""
+    return (
+        os.environ.get("WM_PROJECT", ""),
+        os.environ.get("WM_PROJECT_VERSION", ""),
+    )
+
+
+def content_key(*parts) -> str:
+    """Returns a digest of the given json serializable parts"""
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def file_entries(
+    base: Union[str, Path], paths: Iterable[Union[str, Path]]
+) -> list[tuple[str, str]]:
+    """Returns the path relative to base and the digest of the given files and of
+    all files below the given folders, missing paths are skipped. Symlinked files
+    are hashed via their target, such that the digests are reused between jobs."""
+    entries = []
+    for path in map(Path, paths):
+        if path.is_file():
+            entries.append((os.path.relpath(path, base), file_digest(path.resolve())))
+            continue
+        for root, folders, files in os.walk(path, followlinks=True):
+            folders.sort()
+            for fn in sorted(files):
+                file_path = Path(root) / fn
+                digest = file_digest(file_path.resolve())
+                entries.append((os.path.relpath(file_path, base), digest))
+    return entries
+
+
+@contextmanager
+def locked(path: Union[str, Path]) -> Generator[None, None, None]:
+    """Holds an exclusive lock on the given lock file"""
+    with open(path, "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+@contextmanager
+def worker_slot(folder: Union[str, Path], workers: int) -> Generator[int, None, None]:
+    """Holds one of a number of slots shared by all processes using the same
+    folder, such that at most `workers` processes run concurrently
+
+    Returns: the index of the slot
+    """
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    while True:
+        for i in range(max(1, workers)):
+            fh = open(Path(folder) / f"slot{i}.lock", "a")
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                fh.close()
+                continue
+            try:
+                yield i
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+                fh.close()
+            return
+        time.sleep(0.1)
+
+
+class ContentCache:
+    """A folder of cache entries keyed by `content_key`"""
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    @classmethod
+    def of_project(cls, job_path: Union[str, Path], name: str) -> "ContentCache":
+        """Returns the cache .obr/<name> of the project holding the job"""
+        return cls(Path(job_path).absolute().parent.parent / ".obr" / name)
+
+    def get(self, key: str) -> Union[Path, None]:
+        """Returns the path of an existing cache entry"""
+        entry = self.root / key
+        return entry if entry.exists() else None
+
+    def entry(self, key: str, create: Callable[[Path], object]) -> Union[Path, None]:
+        """Returns the path of a cache entry, create is called with the target
+        folder if the entry does not exist. If create does not create the target
+        folder, ie. since the artifact could not be created, no entry is added and
+        None is returned."""
+        if entry := self.get(key):
+            return entry
+        entry = self.root / key
+        self.root.mkdir(parents=True, exist_ok=True)
+        with locked(self.root / f"{key}.lock"):
+            if entry.exists():
+                return entry
+            tmp_dir = tempfile.mkdtemp(dir=self.root, prefix=f".{key}.")
+            try:
+                create(Path(tmp_dir) / "entry")
+                if not (Path(tmp_dir) / "entry").exists():
+                    return None
+                os.rename(Path(tmp_dir) / "entry", entry)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.debug(f"Added {entry} to the cache")
+        return entry
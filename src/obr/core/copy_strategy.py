@@ -0,0 +1,237 @@
+"""Copy strategies for case files.
+
+Case files are copied when cases are fetched from the origin cache, when child
+cases are initialized with copies instead of symlinks, when symlinked files are
+modified and for temporary copies of folders, ie. before decomposing a case. The
+strategy is selected via the OBR_COPY environment variable:
+
+    auto      reflinks if the file system supports them, ie. XFS and btrfs,
+              full copies otherwise, this is the default
+    reflink   reflinks, full copies if the file system does not support them
+    hardlink  hardlinks, which are broken by `modifies_file` before a file is
+              modified
+    copy      full copies
+
+Hardlinks are only used if requested, since programs which modify files in place,
+ie. OpenFOAM utilities, modify all linked copies. Files are never hardlinked from or
+into the caches in ``.obr``, ie. the origin, mesh and decomposition caches, since
+an in-place write outside of `modifies_file` would silently modify the cache entry,
+these copies use reflinks or full copies instead. Whether a file system supports
+reflinks is probed once per device.
+
+The number of duplicated and shared bytes of the current process is counted in
+`copy_stats`, `copy_tree` returns the statistics of a single call.
+"""
+
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Callable, Iterable, Union
+
+logger = logging.getLogger("OBR")
+
+COPY_STRATEGIES = ("auto", "reflink", "hardlink", "copy")
+# ioctl request to share the extents of a file, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+
+@dataclass
+class CopyStats:
+    """Number of copied files and bytes which have been duplicated or shared via
+    reflinks or hardlinks"""
+
+    files: int = 0
+    duplicated: int = 0
+    shared: int = 0
+
+    def __add__(self, other: "CopyStats") -> "CopyStats":
+        return CopyStats(
+            *(getattr(self, f.name) + getattr(other, f.name) for f in fields(self))
+        )
+
+    def __sub__(self, other: "CopyStats") -> "CopyStats":
+        return CopyStats(
+            *(getattr(self, f.name) - getattr(other, f.name) for f in fields(self))
+        )
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+_stats = CopyStats()
+_stats_lock = threading.Lock()
+# whether the file system of a device supports reflinks
+_reflink_support: dict[int, bool] = {}
+
+
+def copy_stats() -> CopyStats:
+    """Returns the copy statistics of the current process"""
+    with _stats_lock:
+        return _stats + CopyStats()
+
+
+def _count(size: int, shared: bool) -> CopyStats:
+    global _stats
+    stats = CopyStats(1, 0 if shared else size, size if shared else 0)
+    with _stats_lock:
+        _stats = _stats + stats
+    return stats
+
+
+def copy_strategy() -> str:
+    """Returns the copy strategy selected via OBR_COPY, defaults to auto"""
+    strategy = os.environ.get("OBR_COPY", "auto")
+    if strategy not in COPY_STRATEGIES:
+        raise ValueError(
+            f"Unknown copy strategy {strategy}, valid values are {COPY_STRATEGIES}"
+        )
+    return strategy
+
+
+def _reflink(src: Union[str, Path], dst: Union[str, Path]) -> None:
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def supports_reflink(folder: Union[str, Path]) -> bool:
+    """Probes whether the file system of a folder supports reflinks"""
+    device = os.stat(folder).st_dev
+    if (supported := _reflink_support.get(device)) is not None:
+        return supported
+    with tempfile.TemporaryDirectory(dir=folder, prefix=".obr-reflink") as tmp_dir:
+        src = Path(tmp_dir) / "src"
+        src.write_bytes(b"0")
+        try:
+            _reflink(src, Path(tmp_dir) / "dst")
+            supported = True
+        except OSError:
+            supported = False
+    logger.debug(f"Reflinks supported on device {device}: {supported}")
+    _reflink_support[device] = supported
+    return supported
+
+
+def copy_file(
+    src: Union[str, Path], dst: Union[str, Path], hardlinks: bool = True
+) -> Union[str, Path]:
+    """Copies a single file using the selected copy strategy, existing files are
+    replaced. Can be used as copy_function of shutil.copytree.
+
+    Args:
+        hardlinks: whether the hardlink strategy may be used, otherwise the file is
+            copied as with the auto strategy
+    """
+    _copy_file(src, dst, hardlinks)
+    return dst
+
+
+def _copy_file(
+    src: Union[str, Path], dst: Union[str, Path], hardlinks: bool = True
+) -> CopyStats:
+    strategy = copy_strategy()
+    if strategy == "hardlink" and not hardlinks:
+        strategy = "auto"
+    size = os.stat(src).st_size
+    if strategy == "hardlink":
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        try:
+            os.link(src, dst)
+            return _count(size, shared=True)
+        except OSError:
+            # ie. src and dst are on different devices
+            pass
+    elif strategy == "reflink" or (
+        strategy == "auto" and supports_reflink(os.path.dirname(os.path.abspath(dst)))
+    ):
+        try:
+            _reflink(src, dst)
+            shutil.copystat(src, dst)
+            return _count(size, shared=True)
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return _count(size, shared=False)
+
+
+def copy_tree(
+    src: Union[str, Path],
+    dst: Union[str, Path],
+    symlinks: bool = True,
+    dirs_exist_ok: bool = False,
+    ignore: Union[Callable, None] = None,
+    hardlinks: bool = True,
+) -> CopyStats:
+    """Copies a folder using the selected copy strategy, see `shutil.copytree`
+
+    Args:
+        hardlinks: whether the hardlink strategy may be used, see `copy_file`
+
+    Returns: the statistics of the copied files
+    """
+    stats = CopyStats()
+
+    def copy_function(src_file: str, dst_file: str) -> str:
+        nonlocal stats
+        stats = stats + _copy_file(src_file, dst_file, hardlinks)
+        return dst_file
+
+    shutil.copytree(
+        src,
+        dst,
+        symlinks=symlinks,
+        ignore=ignore,
+        copy_function=copy_function,
+        dirs_exist_ok=dirs_exist_ok,
+    )
+    return stats
+
+
+def copy_path(src: Union[str, Path], dst: Union[str, Path]) -> None:
+    """Copies a file or folder like cp -r"""
+    if os.path.isdir(src):
+        copy_tree(src, dst)
+    else:
+        copy_file(src, dst)
+
+
+def break_links(path: Union[str, Path]) -> None:
+    """Replaces hardlinked files by copies, such that modifying them does not
+    modify other links. Folders are processed recursively."""
+
+    def break_link(fn: str):
+        stat = os.lstat(fn)
+        if stat.st_nlink < 2 or not os.path.isfile(fn) or os.path.islink(fn):
+            return
+        tmp_fn = fn + ".obr-tmp"
+        shutil.copy2(fn, tmp_fn)
+        os.replace(tmp_fn, fn)
+        _count(stat.st_size, shared=False)
+
+    path = str(path)
+    if not os.path.lexists(path) or os.path.islink(path):
+        return
+    if not os.path.isdir(path):
+        break_link(path)
+        return
+    for root, _, files in os.walk(path):
+        for fn in files:
+            break_link(os.path.join(root, fn))
+
+
+def copy_stats_of_jobs(jobs: Iterable) -> CopyStats:
+    """Sums the copy statistics of the operations of jobs, which are stored as
+    copyStats in the job document cache"""
+    total = CopyStats()
+    for job in jobs:
+        stats = job.doc.get("cache", {}).get("copyStats")
+        if stats:
+            stats = stats() if callable(stats) else stats
+            total = total + CopyStats(**stats)
+    return total
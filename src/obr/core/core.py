@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
+import asyncio
 import os
-import subprocess
 import re
 import logging
-import json
 import shutil
+import tempfile
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from subprocess import check_output
 from typing import Union, Generator
@@ -13,6 +14,12 @@ from datetime import datetime
 from signac.job import Job
 from copy import deepcopy
 
+from .copy_strategy import CopyStats, break_links, copy_file, copy_path, copy_tree
+from .history import append_job_history, job_history, latest_job_history
+from .job_index import default_worker_threads
+from .merge import MergeStats, merge_job_folder
+from .runner import LOG_TAIL_SIZE, run_command
+
 logger = logging.getLogger("OBR")
 
 # these are to be replaced with each other
@@ -22,6 +29,13 @@ PATH_TOKEN = "."
 GLOBAL_INIT_COUNT = 0
 GLOBAL_UNINIT_COUNT = 0
 
+# initial and maximum number of bytes read to parse the header of OpenFOAM files
+FOAM_HEADER_SIZE = 4096
+FOAM_HEADER_MAX_SIZE = 1 << 16
+
+# below this number of files and folders link_tree does not use a thread pool
+LINK_TREE_MIN_PARALLEL = 256
+
 
 def parse_variables_impl(in_str, args, domain):
     ocurrances = re.findall(r"\${{" + domain + r"\.(\w+)}}", in_str)
@@ -46,17 +60,13 @@ def key_to_path(sign_path: Union[str, Path]) -> str:
     return str(sign_path).replace(SIGNAC_PATH_TOKEN, PATH_TOKEN)
 
 
-def logged_execute(cmd, path, doc) -> Path:
-    """execute cmd and logs success
+async def logged_execute_async(cmd, path, doc) -> Union[Path, None]:
+    """execute cmd and logs success, see `logged_execute`
 
-    If cmd is a string, it will be interpreted as shell cmd
-    otherwise a callable function is expected
-
-    Returns:
-        path to log file
+    The output is streamed to a temporary log file, which is kept if the output
+    exceeds LOG_TAIL_SIZE, otherwise the output is stored in the history record.
     """
-
-    d = doc["history"]
+    path = Path(path)
     cmd_str = " ".join(cmd)
     cmd_str = path_to_key(cmd_str).split()  # replace dots in cmd_str with _dot_'s
     if len(cmd_str) > 1:
@@ -64,56 +74,74 @@ def logged_execute(cmd, path, doc) -> Path:
     else:
         flags = []
     cmd_str = cmd_str[0]
-    try:
-        ret = check_output(cmd, cwd=path, stderr=subprocess.STDOUT).decode("utf-8")
-        log = ret
-        state = "success"
-    except subprocess.SubprocessError as e:
-        log = e.output.decode("utf-8")
-        logging.error("SubprocessError:" + __file__ + __name__ + str(e) + log)
-        state = "failure"
-    except FileNotFoundError as e:
-        logging.error(__file__ + __name__ + str(e))
-        log = cmd + " not found"
-        state = "failure"
-    except Exception as e:
-        logging.error(__file__ + __name__ + str(e))
-        logging.error("General Exception" + __file__ + __name__ + str(e) + e.output)
-        log = ret
-        state = "failure"
 
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-    log_path = None
-
-    # Only write log files above a certain size
-    # otherwise the log is stored directly in the job doc
-    if log and len(log) > 1000:
-        # the cmd_str might contain / for example if
-        # shell scripts are called. Hence we sanitize
-        # the script name
-        cmd_str_san = key_to_path(cmd_str.split("/")[-1])
-        fn = f"{cmd_str_san}_{timestamp}.log"
-        with open(path / fn, "w") as fh:
-            fh.write(log)
-        log = fn
-        log_path = path / fn
-
-    d.append({
-        "cmd": cmd_str,
-        "type": "shell",
-        "log": log,
-        "state": state,
-        "flags": flags,
-        "timestamp": timestamp,
-        "user": os.environ.get("USER"),
-        "hostname": os.environ.get("HOST"),
-    })
+    fd, tmp_log = tempfile.mkstemp(dir=path, prefix=".obr-", suffix=".log")
+    os.close(fd)
+    try:
+        result = await run_command(cmd, path, tmp_log)
+        log = result.text
+        state = "success" if result.success else "failure"
+        if result.returncode is None:
+            logging.error(__file__ + __name__ + result.error)
+            log = cmd_str + " not found"
+        elif not result.success:
+            logging.error(
+                "SubprocessError:"
+                + __file__
+                + __name__
+                + f"Command {cmd} returned non-zero exit status {result.returncode}"
+                + log
+            )
 
-    doc["history"] = d
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+        log_path = None
+
+        # Only keep log files above a certain size
+        # otherwise the log is stored directly in the job doc
+        if result.size > LOG_TAIL_SIZE:
+            # the cmd_str might contain / for example if
+            # shell scripts are called. Hence we sanitize
+            # the script name
+            cmd_str_san = key_to_path(cmd_str.split("/")[-1])
+            fn = f"{cmd_str_san}_{timestamp}.log"
+            os.replace(tmp_log, path / fn)
+            log = fn
+            log_path = path / fn
+    finally:
+        # short logs are stored in the history record, the temporary log is also
+        # removed if the command is interrupted
+        if os.path.exists(tmp_log):
+            os.unlink(tmp_log)
+
+    append_history(
+        doc,
+        {
+            "cmd": cmd_str,
+            "type": "shell",
+            "log": log,
+            "state": state,
+            "flags": flags,
+            "timestamp": timestamp,
+            "user": os.environ.get("USER"),
+            "hostname": os.environ.get("HOST"),
+        },
+    )
 
     return log_path
 
 
+def logged_execute(cmd, path, doc) -> Union[Path, None]:
+    """execute cmd and logs success
+
+    If cmd is a string, it will be interpreted as shell cmd
+    otherwise a callable function is expected
+
+    Returns:
+        path to log file or None if the output is stored in the history
+    """
+    return asyncio.run(logged_execute_async(cmd, path, doc))
+
+
 def logged_func(func, doc, **kwargs):
     """execute cmd and logs success
 
@@ -140,7 +168,155 @@ def logged_func(func, doc, **kwargs):
         "user": os.environ.get("USER"),
         "hostname": os.environ.get("HOST"),
     }
-    doc["history"].append(res)
+    append_history(doc, res)
+
+
+def logged_cache_hit(cmd, entry: Path, doc) -> None:
+    """logs that the result of cmd has been taken from a cache entry instead of
+    executing cmd"""
+    append_history(
+        doc,
+        {
+            "cmd": cmd[0],
+            "type": "cache",
+            "log": str(entry),
+            "state": "success",
+            "flags": cmd[1:],
+            "timestamp": datetime.now().strftime("%Y-%m-%d_%H:%M:%S"),
+            "user": os.environ.get("USER"),
+            "hostname": os.environ.get("HOST"),
+        },
+    )
+
+
+def read_foam_header(path: Union[str, Path]) -> bytes:
+    """Reads the beginning of a file up to the end of the FoamFile dictionary.
+
+    Only a fixed size prefix of the file is read, which is doubled up to
+    FOAM_HEADER_MAX_SIZE if the FoamFile dictionary is not closed yet. Thus the
+    body of large mesh and field files is never loaded.
+    """
+    size = FOAM_HEADER_SIZE
+    with open(path, "rb") as fh:
+        header = fh.read(size)
+        while len(header) == size and size < FOAM_HEADER_MAX_SIZE:
+            start = header.find(b"FoamFile")
+            if start >= 0 and header.find(b"}", start) >= 0:
+                break
+            header += fh.read(size)
+            size *= 2
+    return header
+
+
+def parse_foam_file_dict(header: bytes) -> dict[str, str]:
+    """Returns the entries of the FoamFile dictionary of a file header, see
+    `read_foam_header`"""
+    start = header.find(b"FoamFile")
+    if start < 0:
+        return {}
+    start = header.find(b"{", start)
+    end = header.find(b"}", start)
+    if start < 0 or end < 0:
+        return {}
+    entries = {}
+    for line in header[start + 1 : end].decode(errors="replace").splitlines():
+        key, _, value = line.strip().partition(" ")
+        if key:
+            entries[key] = value.strip().removesuffix(";")
+    return entries
+
+
+# open job document sessions keyed by the filename of the job document
+_job_document_sessions: dict[str, "JobDocumentSession"] = {}
+
+
+def _update_dict(doc, key: str, values: dict) -> None:
+    # setdefault of signac documents returns an unsynced default
+    if key not in doc:
+        doc[key] = {}
+    doc[key].update(values)
+
+
+def _document_key(doc) -> Union[str, None]:
+    # plain dictionaries are used as job documents in tests
+    return getattr(doc, "filename", None)
+
+
+class JobDocumentSession:
+    """Collects history records and updates of the state and cache dictionaries
+    of a job document in memory and writes them at once when the session is
+    closed. Without a session every state update rewrites the full job document
+    and every history record is appended separately to the history file, see
+    `obr.core.history`. signac writes the document to a temporary file first,
+    thus the flush is atomic. Sessions can be nested, only
+    the outermost session writes the document.
+
+    Use it as a context manager or via `open` and `close` if the session spans
+    several operation hooks. Writes are routed to the session via
+    `append_history` and `update_job_document`.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.history: list[dict] = []
+        self.updates: dict[str, dict] = {}
+        self._key: Union[str, None] = None
+
+    def open(self) -> "JobDocumentSession":
+        key = _document_key(self.job.doc)
+        if key is not None and key not in _job_document_sessions:
+            _job_document_sessions[key] = self
+            self._key = key
+        return self
+
+    def close(self, *_) -> None:
+        """Writes the collected changes to the job document"""
+        if self._key is None:
+            return
+        del _job_document_sessions[self._key]
+        self._key = None
+        self.flush()
+
+    def flush(self) -> None:
+        if not self.history and not self.updates:
+            return
+        doc = self.job.doc
+        with doc.buffered():
+            append_job_history(doc, self.history)
+            for key, values in self.updates.items():
+                _update_dict(doc, key, values)
+        self.history = []
+        self.updates = {}
+
+    def __enter__(self) -> "JobDocumentSession":
+        return self.open()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close(*exc_info)
+
+
+def job_document_session(doc) -> Union[JobDocumentSession, None]:
+    """Returns the open session of a job document if any"""
+    key = _document_key(doc)
+    return None if key is None else _job_document_sessions.get(key)
+
+
+def append_history(doc, record: dict) -> None:
+    """Appends a record to the history of the job owning the job document or to
+    the open session"""
+    if session := job_document_session(doc):
+        session.history.append(record)
+    else:
+        append_job_history(doc, [record])
+
+
+def update_job_document(doc, key: str, values: dict) -> None:
+    """Updates a dictionary, ie. state or cache, of a job document or collects the
+    update in the open session"""
+    if session := job_document_session(doc):
+        session.updates.setdefault(key, {}).update(values)
+    else:
+        _update_dict(doc, key, values)
 
 
 def get_mesh_stats(owner_path: str) -> dict:
@@ -149,50 +325,18 @@ def get_mesh_stats(owner_path: str) -> dict:
     nCells = None
     nFaces = None
     if Path(owner_path).exists():
-        with open(owner_path, errors="replace") as fh:
-            read = True
-            is_foamFile = False
-            found_note = ""
-            while read:
-                # A little parser for the header part of a foam file
-                # TODO this should be moved to OWLS
-                line = fh.readline()
-                if "FoamFile" in line:
-                    is_foamFile = True
-                if is_foamFile and line.strip().startswith("}"):
-                    read = False
-                if is_foamFile and "note" in line:
-                    found_note = line
-        note_line = found_note
+        # A little parser for the header part of a foam file
+        # TODO this should be moved to OWLS
+        note_line = parse_foam_file_dict(read_foam_header(owner_path)).get("note", "")
         nCells = int(re.findall("nCells:[ ]*([0-9]+)", note_line)[0])
         nFaces = int(re.findall("Faces:[ ]*([0-9]+)", note_line)[0])
     return {"nCells": nCells, "nFaces": nFaces}
 
 
-def merge_job_documents(job: Job):
-    """Merge multiple job_document_hash.json files into job_document.json"""
-    root, _, files = next(os.walk(job.path))
-
-    def is_job_sub_document(fn):
-        if fn == "signac_job_document.json":
-            return False
-        return fn.startswith("signac_job_document")
-
-    files = [f for f in files if is_job_sub_document(f)]
-    merged_data = []
-    merged_history = []
-    cache = None
-    for f in files:
-        with open(Path(root) / f) as fh:
-            job_doc = json.load(fh)
-            for record in job_doc["data"]:
-                merged_data.append(record)
-            for record in job_doc["history"]:
-                merged_history.append(record)
-            # TODO handle inconsistent cache
-            if not cache:
-                cache = job_doc["cache"]
-    job.doc = {"data": merged_data, "history": merged_history, "cache": cache}
+def merge_job_documents(job: Job) -> MergeStats:
+    """Merge multiple job_document_hash.json files into job_document.json, see
+    `obr.core.merge`"""
+    return merge_job_folder(job.path)
 
 
 def get_latest_log(job: Job) -> str:
@@ -211,14 +355,17 @@ def get_latest_log(job: Job) -> str:
     case = OpenFOAMCase(case_path, job)
     solver = case.controlDict.get("application")
 
-    history = job.doc["history"]
-    for entry in history[::-1]:
-        if solver in entry().get("cmd", ""):
-            log_path = case_path / entry["log"]
-            if not log_path.exists():
-                continue
-            return entry["log"]
-    return ""
+    # usually the latest solver run is the latest log
+    latest = latest_job_history(job).get(solver)
+    if latest and latest.get("log") and (case_path / latest["log"]).exists():
+        return latest["log"]
+
+    log = ""
+    for entry in job_history(job):
+        if solver in entry.get("cmd", "") and entry.get("log"):
+            if (case_path / entry["log"]).exists():
+                log = entry["log"]
+    return log
 
 
 def get_timestamp_from_log(log) -> str:
@@ -296,9 +443,11 @@ def modifies_file(fns):
 
     def unlink(fn):
         if Path(fn).is_symlink():
-            src = fn.resolve()
-            check_output(["rm", fn])
-            check_output(["cp", "-r", src, fn])
+            src = Path(fn).resolve()
+            os.unlink(fn)
+            copy_path(src, fn)
+        # files hardlinked by the hardlink copy strategy
+        break_links(fn)
 
     if isinstance(fns, list):
         for fn in fns:
@@ -348,6 +497,118 @@ def map_view_folder_to_job_id(view_folder: str) -> dict[str, str]:
     return ret
 
 
+def _plan_link_tree(
+    base: str, dst: str, parent_id: str
+) -> tuple[list[str], list[tuple[str, str]], list[tuple[str, str]]]:
+    """Walks base and collects the folders to create, the symlinks to create as
+    (target, link) pairs and the processor sub folders to copy as (src, dst) pairs
+    """
+    folders = [dst]
+    links = []
+    copies = []
+    stack = [(base, dst)]
+    while stack:
+        src_root, dst_root = stack.pop()
+        with os.scandir(src_root) as it:
+            entries = list(it)
+        # NOTE same as os.walk symlinks to folders are treated as folders
+        folder = [e for e in entries if e.is_dir()]
+        files = [e for e in entries if not e.is_dir()]
+
+        # NOTE Treat processor folder separately
+        # Dont recurse into processor folders since that can become very costly.
+        # Instead all processor folder content is copied, except of the constant
+        # folder which is linked to reduce the resulting folder size
+        if any(e.name == "processor0" for e in folder):
+            for proc in [e for e in folder if e.name.startswith("processor")]:
+                trgt_proc_fold = os.path.join(dst_root, proc.name)
+                with os.scandir(proc.path) as it:
+                    proc_folder = [e for e in it if e.is_dir()]
+                for proc_cont in proc_folder:
+                    if proc_cont.name == "constant":
+                        folders.append(trgt_proc_fold)
+                        # we can use this folder format here because we know where
+                        # the parent job lies relative to this one in the workspace
+                        links.append((
+                            f"../../../{parent_id}/case/{proc.name}/constant",
+                            os.path.join(trgt_proc_fold, "constant"),
+                        ))
+                    else:
+                        copies.append((
+                            proc_cont.path,
+                            os.path.join(trgt_proc_fold, proc_cont.name),
+                        ))
+            folder = [e for e in folder if not e.name.startswith("processor")]
+
+        for fold in folder:
+            dst_fold = os.path.join(dst_root, fold.name)
+            folders.append(dst_fold)
+            if not fold.is_symlink():
+                stack.append((fold.path, dst_fold))
+
+        rel_root = os.path.relpath(src_root, dst_root)
+        for fn in files:
+            links.append(
+                (os.path.join(rel_root, fn.name), os.path.join(dst_root, fn.name))
+            )
+    return folders, links, copies
+
+
+def _symlink(links: list[tuple[str, str]]) -> None:
+    for target, link in links:
+        try:
+            os.symlink(target, link)
+        except FileExistsError:
+            pass
+
+
+def _copy_folder(src: str, dst: str) -> CopyStats:
+    return copy_tree(src, dst, symlinks=False, dirs_exist_ok=True)
+
+
+def link_tree(
+    base: Union[str, Path],
+    dst: Union[str, Path],
+    parent_id: str,
+    max_workers: Union[int, None] = None,
+) -> CopyStats:
+    """Creates a file tree under dst with the same folder structure as base where
+    all files are relative symlinks. Existing files in dst are kept.
+
+    The constant folders of processor folders are linked to the corresponding
+    folder of the parent job, all other processor folder contents are copied.
+
+    Args:
+        base: the case folder of the parent job
+        dst: the case folder of the job
+        parent_id: the id of the parent job
+        max_workers: number of threads used to create the links and copies,
+            defaults to `default_worker_threads`
+
+    Returns: the statistics of the copied processor folder contents
+    """
+    folders, links, copies = _plan_link_tree(str(base), str(dst), parent_id)
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+
+    max_workers = max_workers or default_worker_threads()
+    if max_workers == 1 or len(links) + len(copies) < LINK_TREE_MIN_PARALLEL:
+        _symlink(links)
+        return sum((_copy_folder(src, trgt) for src, trgt in copies), CopyStats())
+
+    # links are cheap, thus they are created in chunks to reduce the overhead
+    chunk = max(LINK_TREE_MIN_PARALLEL // 4, len(links) // (4 * max_workers) + 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        copy_futures = [executor.submit(_copy_folder, *copy) for copy in copies]
+        link_futures = [
+            executor.submit(_symlink, links[i : i + chunk])
+            for i in range(0, len(links), chunk)
+        ]
+        for future in link_futures:
+            future.result()
+        return sum((future.result() for future in copy_futures), CopyStats())
+
+
 def link_folder_to_copy(source: Path) -> Path:
     """Given a path this functions converts all symlinked files into copies
     This file does not delete the created .bck folder, neither does it recurse
@@ -366,7 +627,8 @@ def link_folder_to_copy(source: Path) -> Path:
     targ_root = Path(targ_root)
 
     # NOTE this can be improved by only moving the symlinks in the backup folder.
-    # currently the implementation does unneeded copies of non symlink files
+    # currently the implementation does unneeded copies of non symlink files,
+    # which are cheap if the copy strategy uses reflinks
     for fn in files:
         src_file_path = src_root / fn
         if src_file_path.is_symlink():
@@ -376,16 +638,10 @@ def link_folder_to_copy(source: Path) -> Path:
                 " zero folder are symlinks. Thus we temporarily copy this file."
             )
             src_file_path = src_file_path.resolve()
-            target_file_path = targ_root / fn
-            check_output(["cp", src_file_path, target_file_path])
-        else:
-            target_file_path = targ_root / fn
-            check_output(["cp", src_file_path, target_file_path])
+        copy_file(src_file_path, targ_root / fn)
 
     for fold in folder:
-        src_fold_path = src_root / fold
-        target_path = targ_root / fold
-        check_output(["cp", "-r", src_fold_path, target_path])
+        copy_tree(src_root / fold, targ_root / fold)
     return Path(source_bck)
 
 
@@ -397,7 +653,7 @@ class TemporaryFolder:
         self.source = source
         self.target = target
         self.delink = delink
-        check_output(["cp", "-r", source, target])
+        copy_path(source, target)
 
         if self.delink:
             self.delink_folder = DelinkFolder(self.target)
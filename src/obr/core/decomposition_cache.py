@@ -0,0 +1,97 @@
+"""A cache of decomposed cases shared between sibling jobs.
+
+Variations of a case often differ only in settings which are irrelevant for the
+decomposition, thus decomposePar would produce identical processor folders for
+many jobs. The processor folders are therefore stored once per project in
+``.obr/decompositions`` keyed by a digest of the OpenFOAM version, the mesh, the
+initial fields, the controlDict and the decomposeParDict. Jobs receive copies of the
+processor folders of the cache entry, ie. reflinks on file systems which support
+them, since utilities like renumberMesh modify the processor meshes in place, see
+`populate_decomposition`.
+
+Different decompositions are computed concurrently by the operations of several
+jobs, ie. via ``obr run -t``. The number of concurrent decomposePar runs of all
+processes of a project is limited by OBR_DECOMPOSE_WORKERS, defaults to the number
+of cpus. The cache is disabled by setting OBR_DECOMPOSITION_CACHE=0.
+"""
+
+import os
+import shutil
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, Union
+
+from .content_cache import (
+    ContentCache,
+    content_key,
+    file_entries,
+    foam_version,
+    worker_slot,
+)
+from .copy_strategy import copy_tree
+
+DECOMPOSITION_CACHE_FOLDER = "decompositions"
+# files of the system folder which determine the decomposition
+DECOMPOSITION_SETTINGS = ("controlDict", "decomposeParDict")
+
+
+def decomposition_cache_enabled() -> bool:
+    """Whether the decomposition cache is enabled via OBR_DECOMPOSITION_CACHE"""
+    return os.environ.get("OBR_DECOMPOSITION_CACHE", "1") not in ("0", "false", "False")
+
+
+def decompose_workers() -> int:
+    """Number of concurrent decomposePar runs, set via OBR_DECOMPOSE_WORKERS"""
+    return int(os.environ.get("OBR_DECOMPOSE_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def decomposition_cache(job_path: Union[str, Path]) -> ContentCache:
+    """Returns the decomposition cache of the project holding the job"""
+    return ContentCache.of_project(job_path, DECOMPOSITION_CACHE_FOLDER)
+
+
+@contextmanager
+def decompose_slot(job_path: Union[str, Path]) -> Generator[None, None, None]:
+    """Holds one of the OBR_DECOMPOSE_WORKERS slots of the project"""
+    with worker_slot(
+        decomposition_cache(job_path).root / "workers", decompose_workers()
+    ):
+        yield
+
+
+def decomposition_key(case_path: Union[str, Path]) -> str:
+    """Returns a digest of the OpenFOAM version and the inputs of decomposePar, ie.
+    the files of constant/polyMesh and 0 and the decomposition settings"""
+    case_path = Path(case_path)
+    inputs = [case_path / "constant" / "polyMesh", case_path / "0"]
+    inputs += [case_path / "system" / fn for fn in DECOMPOSITION_SETTINGS]
+    return content_key("decomposePar", foam_version(), file_entries(case_path, inputs))
+
+
+def processor_folders(case_path: Union[str, Path]) -> list[Path]:
+    """Returns the processor folders of a case"""
+    with os.scandir(case_path) as it:
+        return sorted(
+            Path(e.path) for e in it if e.name.startswith("processor") and e.is_dir()
+        )
+
+
+def store_decomposition(case_path: Union[str, Path], entry: Path) -> None:
+    """Moves the processor folders of a decomposed case to a new cache entry"""
+    entry.mkdir(parents=True)
+    for folder in processor_folders(case_path):
+        shutil.move(str(folder), entry / folder.name)
+
+
+def populate_decomposition(entry: Path, case_path: Union[str, Path]) -> None:
+    """Replaces the processor folders of a case by copies of the processor folders
+    of a cache entry"""
+    case_path = Path(case_path)
+    for folder in processor_folders(case_path):
+        if folder.is_symlink():
+            folder.unlink()
+        else:
+            shutil.rmtree(folder)
+    for src in processor_folders(entry):
+        copy_tree(src, case_path / src.name, hardlinks=False)
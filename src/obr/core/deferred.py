@@ -0,0 +1,121 @@
+"""Deferred side effects of labels and pre-conditions.
+
+Some labels and pre-conditions have side effects, the `final` label caches the
+number of cells of the mesh in the job document and `basic_eligible` initializes the
+case of a job by linking the case of its parent. Within `deferred_side_effects` these
+checks are read-only, the work they would do is collected as `PendingWork` instead.
+The pending work is applied afterwards in an explicit batch step, which processes
+jobs concurrently, or is dropped, ie. by ``obr status``. Thus status queries do not
+write to the workspace and can run from many processes at the same time.
+
+Tasks run in a thread pool and must not modify state shared within the process, ie.
+the `obr.core.job_graph.JobGraph`. Instead a task returns a callable which applies
+such updates, these are called one after another once all tasks have finished.
+"""
+
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Generator, Union
+
+from .job_index import default_worker_threads
+
+logger = logging.getLogger("OBR")
+
+# a deferred task, returns a callable which applies updates of shared state or None
+Task = Callable[[], Union[Callable[[], None], None]]
+
+INITIALIZE = "initialize"
+MESH_STATS = "mesh_stats"
+
+
+@dataclass
+class PendingWork:
+    """Deferred tasks by job id and task name, every task is collected once per
+    job"""
+
+    tasks: dict[str, dict[str, Task]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return sum(len(tasks) for tasks in self.tasks.values())
+
+    def add(self, job_id: str, name: str, task: Task) -> None:
+        self.tasks.setdefault(job_id, {}).setdefault(name, task)
+
+    def pending(self, job_id: str, name: Union[str, None] = None) -> bool:
+        """Whether a task or, if name is None, any task of a job is pending"""
+        tasks = self.tasks.get(job_id, {})
+        return bool(tasks) if name is None else name in tasks
+
+    def apply(self, max_workers: Union[int, None] = None) -> int:
+        """Runs the pending tasks, the tasks of a job run in the order they have
+        been collected, different jobs run concurrently. The updates returned by
+        the tasks are applied in the calling thread afterwards.
+
+        Args:
+            max_workers: number of threads, defaults to `default_worker_threads`
+
+        Returns: number of successful tasks
+        """
+
+        def run(item) -> list[tuple[str, str, Union[Callable[[], None], None]]]:
+            job_id, tasks = item
+            done = []
+            for name, task in tasks.items():
+                try:
+                    done.append((job_id, name, task()))
+                except Exception as e:
+                    logger.warning(f"Deferred {name} of job {job_id} failed: {e}")
+            return done
+
+        items, self.tasks = list(self.tasks.items()), {}
+        if not items:
+            return 0
+        max_workers = max_workers or default_worker_threads()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            done = [task for tasks in executor.map(run, items) for task in tasks]
+
+        applied = 0
+        for job_id, name, update in done:
+            try:
+                if update:
+                    update()
+                applied += 1
+            except Exception as e:
+                logger.warning(f"Deferred {name} of job {job_id} failed: {e}")
+        return applied
+
+
+# pending work of the innermost deferred_side_effects context
+_pending_work: Union[PendingWork, None] = None
+
+
+@contextmanager
+def deferred_side_effects() -> Generator[PendingWork, None, None]:
+    """Collects the side effects of labels and pre-conditions evaluated in this
+    context instead of executing them"""
+    global _pending_work
+    outer, _pending_work = _pending_work, PendingWork()
+    try:
+        yield _pending_work
+    finally:
+        _pending_work = outer
+
+
+def defer(job_id: str, name: str, task: Task) -> bool:
+    """Collects a task if side effects are deferred
+
+    Returns: whether the task has been deferred, otherwise the caller executes it
+    """
+    if _pending_work is None:
+        return False
+    _pending_work.add(job_id, name, task)
+    return True
+
+
+def is_pending(job_id: str, name: Union[str, None] = None) -> bool:
+    """Whether a task or any task of a job has been deferred in the current
+    context"""
+    return _pending_work is not None and _pending_work.pending(job_id, name)
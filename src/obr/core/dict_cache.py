@@ -0,0 +1,56 @@
+"""A per-process cache of values of OpenFOAM dictionary files.
+
+`obr.OpenFOAM.case.File.get` parses a dictionary file whenever a value is looked
+up. The looked up values are cached by path and reused as long as the stat key of
+the file is unchanged, see `obr.core.file_hash.stat_key`. Values written via
+`File.set` are dropped from the cache regardless of the stat key, since the stat
+key of a file rewritten within the same tick of a coarse modification time, ie. on
+NFS or Lustre, does not change.
+"""
+
+from pathlib import Path
+from typing import Any, Union
+
+
+class DictCache:
+    """Caches the values of OpenFOAM dictionary files looked up via `File.get`,
+    keyed by path. Cached values are shared by all `File` instances of a process
+    and reused as long as the stat key of the file is unchanged."""
+
+    def __init__(self):
+        self.files: dict[str, tuple[tuple[int, int, int], dict[str, Any]]] = {}
+
+    def values(self, path: Union[str, Path], key: tuple) -> dict[str, Any]:
+        """Returns the cached values of a file, which are updated in place"""
+        cached = self.files.get(str(path))
+        if cached and cached[0] == key:
+            return cached[1]
+        values: dict[str, Any] = {}
+        self.files[str(path)] = (key, values)
+        return values
+
+    def written(
+        self, path: Union[str, Path], key: tuple, values: dict[str, Any], args: dict
+    ) -> None:
+        """Updates the cached values of a file after args have been written, key is
+        the stat key after writing, which can equal the key before writing. Only
+        numbers are cached, other values are parsed from the file again since their
+        representation depends on the parser."""
+        values = {
+            name: value
+            for name, value in values.items()
+            if not any(_is_entry_of(name, k) for k in args)
+        }
+        for k, v in args.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                values[k] = v
+        self.files[str(path)] = (key, values)
+
+
+def _is_entry_of(name: str, key: str) -> bool:
+    """Whether name is key or a sub entry of key, ie. PISO/nCorrectors of PISO"""
+    if not name.startswith(key):
+        return False
+    return len(name) == len(key) or not (
+        name[len(key)].isalnum() or name[len(key)] == "_"
+    )
@@ -0,0 +1,120 @@
+"""In-process content hashes of case files.
+
+Files are streamed through hashlib instead of calling md5sum for every file. The
+digests are cached per process and keyed by the inode, size and modification time
+of a file, thus unchanged files are only stat'ed. Besides md5, which is the
+default and matches the output of md5sum, the faster non-cryptographic crc32 and,
+if the xxhash package is installed, xxh64 can be selected via the OBR_HASH
+environment variable. Digests of other algorithms than md5 are prefixed by the
+name of the algorithm, ie. crc32:1c291ca3, such that digests computed with
+different algorithms are never mistaken for each other.
+"""
+
+import hashlib
+import logging
+import os
+import zlib
+
+from pathlib import Path
+from typing import Union
+
+logger = logging.getLogger("OBR")
+
+DEFAULT_HASH = "md5"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class _Crc32:
+    """Minimal hashlib like interface for zlib.crc32"""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data: bytes) -> None:
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value:08x}"
+
+
+def _new_hash(algorithm: str):
+    if algorithm == "md5":
+        return hashlib.md5()
+    if algorithm == "crc32":
+        return _Crc32()
+    if algorithm == "xxh64":
+        try:
+            import xxhash
+        except ImportError:
+            raise ValueError("The xxh64 hash requires the xxhash package")
+        return xxhash.xxh64()
+    raise ValueError(f"Unknown hash algorithm {algorithm}")
+
+
+def hash_algorithm() -> str:
+    """Returns the hash algorithm selected via OBR_HASH, defaults to md5"""
+    return os.environ.get("OBR_HASH", DEFAULT_HASH)
+
+
+def digest_algorithm(digest: str) -> str:
+    """Returns the name of the algorithm which computed the given digest"""
+    algorithm, sep, _ = digest.partition(":")
+    return algorithm if sep else "md5"
+
+
+def stat_key(path: Union[str, Path]) -> tuple[int, int, int]:
+    """Returns the inode, size and modification time of a file, symlinks are
+    followed"""
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class HashCache:
+    """Caches digests of files keyed by path and algorithm. A cached digest is
+    reused as long as the stat key of the file is unchanged."""
+
+    def __init__(self):
+        self.digests: dict[tuple[str, str], tuple[tuple[int, int, int], str]] = {}
+
+    def digest(
+        self,
+        path: Union[str, Path],
+        algorithm: Union[str, None] = None,
+        key: Union[tuple, None] = None,
+    ) -> str:
+        """Returns the digest of a file
+
+        Args:
+            path: path to the file
+            algorithm: defaults to `hash_algorithm`
+            key: the stat key of the file if it has been stat'ed already
+        """
+        algorithm = algorithm or hash_algorithm()
+        key = key or stat_key(path)
+        cache_key = (str(path), algorithm)
+        cached = self.digests.get(cache_key)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        file_hash = _new_hash(algorithm)
+        with open(path, "rb") as fh:
+            while chunk := fh.read(HASH_CHUNK_SIZE):
+                file_hash.update(chunk)
+        digest = file_hash.hexdigest()
+        if algorithm != "md5":
+            digest = f"{algorithm}:{digest}"
+        self.digests[cache_key] = (key, digest)
+        return digest
+
+
+_hash_cache = HashCache()
+
+
+def file_digest(
+    path: Union[str, Path],
+    algorithm: Union[str, None] = None,
+    key: Union[tuple, None] = None,
+) -> str:
+    """Returns the digest of a file using the cache of the current process, see
+    `HashCache.digest`"""
+    return _hash_cache.digest(path, algorithm, key)
@@ -0,0 +1,152 @@
+"""Append-only history of the commands executed for a job.
+
+Every shell command, `logged_func` call and solver run adds a record to the history
+of a job. Instead of a list in the job document, which is read and rewritten with
+every access of the document, the records are appended as JSON lines to
+``obr_history.jsonl`` in the job folder. The latest record of every command is
+kept in the small ``obr_history_index.json``, such that the latest solver log or
+the state of the latest obr operation are found without reading the full history.
+
+Histories of workspaces created by earlier versions are stored in the job document.
+They are moved to the history file on the next append and read from the job
+document until then.
+"""
+
+import json
+import logging
+import os
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Generator, Iterable, Union
+
+from .job_index import HISTORY_INDEX_FILE, read_json
+
+logger = logging.getLogger("OBR")
+
+HISTORY_FILE = "obr_history.jsonl"
+
+
+def command_key(record: dict) -> str:
+    """The command by which a record is indexed, ie. blockMesh for logged_execute,
+    the function name for logged_func and the solver for solver runs"""
+    return str(record.get("solver") or record.get("cmd", ""))
+
+
+def index_record(index: dict[str, dict], record: dict) -> None:
+    """Stores a record as the latest record of its command, the index is ordered by
+    the time the commands have been executed last"""
+    key = command_key(record)
+    index.pop(key, None)
+    index[key] = record
+
+
+def record_time(record: dict) -> datetime:
+    """Returns the timestamp of a record, records without or with an unknown
+    timestamp format are the oldest"""
+    time = record.get("timestamp")
+    if not time or not isinstance(time, str):
+        return datetime.min
+    # timestamps are not standardized and can have to formats (in our case)
+    for fmt in ("%Y-%m-%d_%H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
+        try:
+            return datetime.strptime(time, fmt)
+        except ValueError:
+            pass
+    return datetime.min
+
+
+class JobHistory:
+    """The history file and latest entry index of a job folder"""
+
+    def __init__(self, job_path: Union[str, Path]):
+        self.path = Path(job_path) / HISTORY_FILE
+        self.index_path = Path(job_path) / HISTORY_INDEX_FILE
+
+    def append(self, records: Iterable[dict]) -> None:
+        """Appends records to the history file and updates the index"""
+        records = list(records)
+        if not records:
+            return
+        with open(self.path, "a") as fh:
+            fh.write("".join(json.dumps(record) + "\n" for record in records))
+
+        index = self.index()
+        for record in records:
+            index_record(index, record)
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as fh:
+            json.dump(index, fh)
+        os.replace(tmp_path, self.index_path)
+
+    def index(self) -> dict[str, dict]:
+        """Returns the latest record of every command, the most recently executed
+        command is last"""
+        return read_json(self.index_path)
+
+    def latest(self, command: str) -> Union[dict, None]:
+        """Returns the latest record of a command"""
+        return self.index().get(command)
+
+    def __iter__(self) -> Generator[dict, None, None]:
+        """Streams all records in the order they have been appended"""
+        yield from read_history_file(self.path)
+
+
+def read_history_file(path: Union[str, Path]) -> Generator[dict, None, None]:
+    """Streams the records of a history file, missing files are treated as empty"""
+    try:
+        fh = open(path)
+    except FileNotFoundError:
+        return
+    with fh:
+        for line in fh:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # a line which is still being written
+                logger.debug(f"Skipping incomplete record in {path}")
+
+
+def _legacy_history(job) -> list[dict]:
+    history = job.doc.get("history")
+    if not history:
+        return []
+    return history() if callable(history) else list(history)
+
+
+def migrate_job_history(doc) -> None:
+    """Moves the history list of a job document to the history file"""
+    if "history" not in doc:
+        return
+    history = doc["history"]
+    JobHistory(os.path.dirname(doc.filename)).append(
+        history() if callable(history) else history
+    )
+    del doc["history"]
+
+
+def append_job_history(doc, records: Iterable[dict]) -> None:
+    """Appends records to the history of the job owning the given job document.
+    Plain dictionaries, as used in tests, keep the history as list."""
+    if not hasattr(doc, "filename"):
+        doc.setdefault("history", []).extend(records)
+        return
+    migrate_job_history(doc)
+    JobHistory(os.path.dirname(doc.filename)).append(records)
+
+
+def job_history(job) -> Generator[dict, None, None]:
+    """Streams all records of the history of a job"""
+    yield from _legacy_history(job)
+    yield from JobHistory(job.path)
+
+
+def latest_job_history(job) -> dict[str, dict]:
+    """Returns the latest record of every command executed for a job"""
+    latest: dict[str, Any] = {}
+    for record in _legacy_history(job):
+        index_record(latest, record)
+    for record in JobHistory(job.path).index().values():
+        index_record(latest, record)
+    return latest
@@ -0,0 +1,180 @@
+"""An in-memory graph of the jobs of a workspace.
+
+Eligibility checks like `parent_job_is_ready` are evaluated by flow for every job
+and every operation. Instead of reading the job document of the parent job for
+every check, the ``JobGraph`` reads all statepoints and job documents once and
+keeps the parent, children and state of each job in memory. Writes to the state
+and cache of a job document go through `set_job_state`, `update_job_state` and
+`set_job_cache`, which mirror them to the graph, changes made by other processes
+are picked up by `JobGraph.refresh`.
+"""
+
+import logging
+import os
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Union
+
+from .core import update_job_document
+from .job_index import load_job_files, read_job_files
+
+logger = logging.getLogger("OBR")
+
+
+@dataclass
+class JobNode:
+    """Cached statepoint and document entries of a job required by the
+    eligibility checks"""
+
+    parent_id: Union[str, None] = None
+    operation: Union[str, None] = None
+    has_child: bool = False
+    children: list[str] = field(default_factory=list)
+    state: dict[str, Any] = field(default_factory=dict)
+    cache: dict[str, Any] = field(default_factory=dict)
+    stamp: Union[list, None] = None
+
+
+class JobGraph:
+    """Parent and child relations and cached states of all jobs of a workspace"""
+
+    def __init__(self, workspace: Union[str, Path]):
+        """
+        Args:
+            workspace: path to the signac workspace folder holding the job folders
+        """
+        self.workspace = Path(workspace)
+        self.nodes: dict[str, JobNode] = {}
+        self.refresh()
+
+    def job_paths(self) -> dict[str, str]:
+        """Returns a dictionary from job ids to job folders of the workspace"""
+        try:
+            with os.scandir(self.workspace) as it:
+                return {e.name: e.path for e in it if e.is_dir()}
+        except FileNotFoundError:
+            return {}
+
+    def refresh(self) -> int:
+        """Re-reads the statepoints and job documents of new jobs and of jobs whose
+        files changed since the last refresh and drops removed jobs
+
+        Returns: number of re-read jobs
+        """
+        job_paths = self.job_paths()
+        stamps = {
+            job_id: node.stamp for job_id, node in self.nodes.items() if node.stamp
+        }
+        updated = 0
+        for job_id, (stamp, sp, doc) in load_job_files(job_paths, stamps).items():
+            if sp is None:
+                continue
+            self._update_node(job_id, stamp, sp, doc or {})
+            updated += 1
+        for job_id in [job_id for job_id in self.nodes if job_id not in job_paths]:
+            del self.nodes[job_id]
+        if updated:
+            self._link_children()
+        return updated
+
+    def _update_node(self, job_id: str, stamp: list, sp: dict, doc: dict) -> None:
+        node = self.nodes.setdefault(job_id, JobNode())
+        node.parent_id = sp.get("parent_id")
+        node.operation = sp.get("operation")
+        node.has_child = bool(sp.get("has_child"))
+        node.state = doc.get("state", {})
+        node.cache = doc.get("cache", {})
+        node.stamp = stamp
+
+    def _link_children(self) -> None:
+        for node in self.nodes.values():
+            node.children = []
+        for job_id, node in self.nodes.items():
+            if node.parent_id and (parent := self.nodes.get(node.parent_id)):
+                parent.children.append(job_id)
+
+    def node(self, job_id: str) -> JobNode:
+        """Returns the node of a job, jobs created after the last refresh are read
+        on first access"""
+        if node := self.nodes.get(job_id):
+            return node
+        stamp, sp, doc = read_job_files(str(self.workspace / job_id))
+        self._update_node(job_id, stamp, sp or {}, doc or {})
+        self._link_children()
+        return self.nodes[job_id]
+
+    def parent(self, job_id: str) -> Union[JobNode, None]:
+        """Returns the node of the parent job or None for root jobs"""
+        if parent_id := self.node(job_id).parent_id:
+            return self.node(parent_id)
+        return None
+
+    def children(self, job_id: str) -> list[str]:
+        """Returns the ids of the child jobs"""
+        return self.node(job_id).children
+
+    def state(self, job_id: str) -> dict[str, Any]:
+        """Returns the cached state dictionary of the job document"""
+        return self.node(job_id).state
+
+    def set_state(self, job_id: str, key: str, value: Any) -> None:
+        """Mirrors a write to the state dictionary of a job document"""
+        self.update_state(job_id, {key: value})
+
+    def update_state(self, job_id: str, values: dict[str, Any]) -> None:
+        """Mirrors a write of several values to the state dictionary of a job
+        document"""
+        node = self.node(job_id)
+        node.state = {**node.state, **values}
+
+    def set_cache(self, job_id: str, key: str, value: Any) -> None:
+        """Mirrors a write to the cache dictionary of a job document"""
+        node = self.node(job_id)
+        node.cache = {**node.cache, key: value}
+
+
+_job_graphs: dict[str, JobGraph] = {}
+
+
+def get_job_graph(workspace: Union[str, Path]) -> JobGraph:
+    """Returns the JobGraph of a workspace, the graph is created on first access
+    and shared by all eligibility checks of the current process"""
+    key = os.path.abspath(workspace)
+    if not (graph := _job_graphs.get(key)):
+        graph = JobGraph(key)
+        _job_graphs[key] = graph
+    return graph
+
+
+def job_graph_of(job) -> JobGraph:
+    """Returns the JobGraph of the workspace holding the given job"""
+    return get_job_graph(os.path.dirname(job.path))
+
+
+def refresh_job_graph(workspace: Union[str, Path]) -> None:
+    """Refreshes the JobGraph of a workspace if it has been created already"""
+    if graph := _job_graphs.get(os.path.abspath(workspace)):
+        graph.refresh()
+
+
+def set_job_state(job, key: str, value: Any) -> None:
+    """Writes a value to the state dictionary of the job document and mirrors the
+    write to the JobGraph of the workspace if it has been created already. The
+    state and cache of job documents must only be written via these functions,
+    otherwise eligibility checks of the current process see outdated values."""
+    update_job_state(job, {key: value})
+
+
+def update_job_state(job, values: dict[str, Any]) -> None:
+    """Same as `set_job_state` for several values"""
+    update_job_document(job.doc, "state", values)
+    if graph := _job_graphs.get(os.path.abspath(os.path.dirname(job.path))):
+        graph.update_state(job.id, values)
+
+
+def set_job_cache(job, key: str, value: Any) -> None:
+    """Same as `set_job_state` for the cache dictionary of the job document"""
+    update_job_document(job.doc, "cache", {key: value})
+    if graph := _job_graphs.get(os.path.abspath(os.path.dirname(job.path))):
+        graph.set_cache(job.id, key, value)
@@ -0,0 +1,338 @@
+"""A persistent columnar index of flattened statepoints and job documents.
+
+Querying a workspace requires the merged statepoint and job document of every
+job. Reading those from the workspace means opening two json files per job, which
+dominates the runtime of ``obr query``, ``obr status`` and filtered ``obr run``
+calls on large workspaces. The ``JobIndex`` keeps a flattened copy of these
+files in ``.obr/job_index.json`` and only re-reads the files of jobs whose
+statepoint or job document changed on disk.
+"""
+
+import json
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterable, Union
+
+logger = logging.getLogger("OBR")
+
+INDEX_FILE = "job_index.json"
+INDEX_VERSION = 1
+
+# signac does not allow . inside keys, thus it can be used safely to join the keys
+# of nested dictionaries
+FLAT_KEY_SEP = "."
+
+SIGNAC_STATEPOINT_FILE = "signac_statepoint.json"
+SIGNAC_JOB_DOCUMENT_FILE = "signac_job_document.json"
+# latest history record of every command, see obr.core.history
+HISTORY_INDEX_FILE = "obr_history_index.json"
+
+
+def flatten_dict(d: dict, parent_key: str = "") -> dict[str, Any]:
+    """Flattens nested dictionaries to a single dictionary with joined keys, ie.
+    {"parent": {"solver": "pisoFoam"}} becomes {"parent.solver": "pisoFoam"}.
+
+    Lists are kept as values and empty dictionaries are stored as values such that
+    `unflatten_dict` can restore the original dictionary.
+    """
+    items: dict[str, Any] = {}
+    for k, v in d.items():
+        new_key = parent_key + FLAT_KEY_SEP + k if parent_key else k
+        if isinstance(v, dict) and v:
+            items.update(flatten_dict(v, new_key))
+        else:
+            items[new_key] = v
+    return items
+
+
+def unflatten_dict(flat: Iterable[tuple[str, Any]]) -> dict:
+    """Counter function to `flatten_dict`"""
+    ret: dict = {}
+    for key, value in flat:
+        *parents, leaf = key.split(FLAT_KEY_SEP)
+        d = ret
+        for parent in parents:
+            d = d.setdefault(parent, {})
+        # empty dictionaries are stored as values and must not be shared
+        d[leaf] = {} if value == {} else value
+    return ret
+
+
+def file_stamp(path: Union[str, Path]) -> Union[list[int], None]:
+    """Returns the modification time and size of a file, or None if the file does
+    not exist. The stamp is used to decide whether an index entry is outdated.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def read_json(path: Union[str, Path]) -> dict:
+    """Reads a json file, missing or incomplete files are treated as empty"""
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        logger.warning(f"Could not read {path}: {e}")
+        return {}
+
+
+def default_io_threads() -> int:
+    """Number of threads used to read job files, defaults to 1. On parallel file
+    systems reading many small files is dominated by metadata latency, which is
+    hidden by reading files concurrently, set the OBR_IO_THREADS environment
+    variable to enable the thread pool. On local disks the pool is slower.
+    """
+    if threads := os.environ.get("OBR_IO_THREADS"):
+        return max(1, int(threads))
+    return 1
+
+
+def default_worker_threads() -> int:
+    """Number of threads used to create links and to apply deferred work of jobs.
+    Unlike reading job files these tasks write files and wait on the file system,
+    thus a thread pool pays off on local disks too. Defaults to the default of
+    `ThreadPoolExecutor`, OBR_IO_THREADS takes precedence if set."""
+    if threads := os.environ.get("OBR_IO_THREADS"):
+        return max(1, int(threads))
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def read_job_files(
+    job_path: str, stamp: Union[list, None] = None
+) -> tuple[list, Union[dict, None], Union[dict, None]]:
+    """Reads the statepoint and job document of a single job. The latest record of
+    every command of the job history is added to the job document as history list,
+    the most recently executed command is last. Thus queries with latest_only
+    match the latest record, as for the history lists of earlier versions. Earlier
+    records of a command are not part of the job document, thus queries of the history
+    without latest_only return the latest record of every command only. The full
+    history is streamed by `obr.core.history.job_history`.
+
+    Args:
+        job_path: path to the job folder
+        stamp: the files are not read if their current stamp equals this stamp
+
+    Returns: the current stamp, the statepoint and job document or None, None if
+    the files have not changed
+    """
+    sp_fn = os.path.join(job_path, SIGNAC_STATEPOINT_FILE)
+    doc_fn = os.path.join(job_path, SIGNAC_JOB_DOCUMENT_FILE)
+    history_fn = os.path.join(job_path, HISTORY_INDEX_FILE)
+    current_stamp = [file_stamp(sp_fn), file_stamp(doc_fn), file_stamp(history_fn)]
+    if current_stamp == stamp:
+        return current_stamp, None, None
+    doc = read_json(doc_fn)
+    # job documents of earlier versions hold the full history
+    if current_stamp[2] and "history" not in doc:
+        doc["history"] = list(read_json(history_fn).values())
+    return current_stamp, read_json(sp_fn), doc
+
+
+def load_job_files(
+    job_paths: dict[str, str],
+    stamps: Union[dict[str, list], None] = None,
+    max_workers: Union[int, None] = None,
+) -> dict[str, tuple[list, Union[dict, None], Union[dict, None]]]:
+    """Reads the statepoints and job documents of many jobs concurrently
+
+    Args:
+        job_paths: a dictionary from job ids to job folder
+        stamps: a dictionary from job ids to stamps of already known files, see
+            `read_job_files`
+        max_workers: number of threads, defaults to `default_io_threads`
+
+    Returns: a dictionary from job ids to stamp, statepoint and job document as
+    plain dictionaries
+    """
+    stamps = stamps or {}
+    max_workers = max_workers or default_io_threads()
+
+    def read(item):
+        job_id, job_path = item
+        return read_job_files(job_path, stamps.get(job_id))
+
+    if max_workers == 1 or len(job_paths) < 2:
+        return {item[0]: read(item) for item in job_paths.items()}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(job_paths, executor.map(read, job_paths.items())))
+
+
+def merge_statepoint_and_document(statepoint: dict, document: dict) -> dict:
+    """Merges a job document and statepoint, statepoint keys take precedence"""
+    merged = {k: v for k, v in document.items()}
+    merged.update(statepoint)
+    return merged
+
+
+class JobIndex:
+    """Columnar storage of the merged statepoints and job documents of a project.
+
+    Every flattened key of a merged statepoint and job document, including the
+    keys of the nested parent statepoints, is a column which maps job ids to
+    values. Additionally, each job stores the stamps of its statepoint and job
+    document file and the order of its columns, such that the merged dictionary
+    can be restored exactly.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        """
+        Args:
+            root: path to the project folder, the index is stored in root/.obr
+        """
+        self.path = Path(root) / ".obr" / INDEX_FILE
+        self.column_names: list[str] = []
+        self.column_ids: dict[str, int] = {}
+        self.columns: dict[str, dict[str, Any]] = {}
+        self.rows: dict[str, dict] = {}
+        self.modified = False
+        self.load()
+
+    def load(self) -> None:
+        """Reads the index from disk, an incompatible or broken index is discarded"""
+        data = read_json(self.path)
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.column_names = data["column_names"]
+        self.column_ids = {name: i for i, name in enumerate(self.column_names)}
+        self.columns = data["columns"]
+        self.rows = data["rows"]
+
+    def save(self) -> None:
+        """Writes the index to disk if it has been modified.
+
+        The index is written to a temporary file first and moved afterwards, such
+        that concurrent readers never see a partially written index.
+        """
+        if not self.modified:
+            return
+        self.compact()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as fh:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "column_names": self.column_names,
+                    "columns": self.columns,
+                    "rows": self.rows,
+                },
+                fh,
+            )
+        os.replace(tmp_path, self.path)
+        self.modified = False
+
+    def compact(self) -> None:
+        """Removes columns which do not hold values of any job"""
+        if all(self.columns.get(name) for name in self.column_names):
+            return
+        names = [name for name in self.column_names if self.columns.get(name)]
+        new_ids = {name: i for i, name in enumerate(names)}
+        for row in self.rows.values():
+            row["columns"] = [
+                new_ids[self.column_names[i]]
+                for i in row["columns"]
+                if self.column_names[i] in new_ids
+            ]
+        self.column_names = names
+        self.column_ids = new_ids
+        self.columns = {name: self.columns[name] for name in names}
+
+    def remove(self, job_id: str) -> None:
+        """Removes a job from the index"""
+        row = self.rows.pop(job_id, None)
+        if not row:
+            return
+        for i in row["columns"]:
+            self.columns[self.column_names[i]].pop(job_id, None)
+        self.modified = True
+
+    def insert(self, job_id: str, stamp: list, merged: dict) -> None:
+        """Inserts or replaces the merged statepoint and job document of a job"""
+        self.remove(job_id)
+        row_columns = []
+        for key, value in flatten_dict(merged).items():
+            column_id = self.column_ids.get(key)
+            if column_id is None:
+                column_id = len(self.column_names)
+                self.column_names.append(key)
+                self.column_ids[key] = column_id
+                self.columns[key] = {}
+            self.columns[key][job_id] = value
+            row_columns.append(column_id)
+        self.rows[job_id] = {"stamp": stamp, "columns": row_columns}
+        self.modified = True
+
+    def prune(self, job_ids: Iterable[str]) -> None:
+        """Removes all jobs from the index which are not in job_ids, ie. jobs which
+        have been removed from the workspace"""
+        keep = set(job_ids)
+        for job_id in [job_id for job_id in self.rows if job_id not in keep]:
+            self.remove(job_id)
+
+    def update(
+        self, job_paths: dict[str, str], max_workers: Union[int, None] = None
+    ) -> int:
+        """Re-reads statepoints and job documents of all jobs which are new or
+        whose files changed since they have been indexed.
+
+        Args:
+            job_paths: a dictionary from job ids to job folder
+            max_workers: number of threads used to read the job files
+
+        Returns: number of re-read jobs
+        """
+        stamps = {job_id: row["stamp"] for job_id, row in self.rows.items()}
+        outdated = 0
+        for job_id, (stamp, sp, doc) in load_job_files(
+            job_paths, stamps, max_workers
+        ).items():
+            if sp is None:
+                continue
+            self.insert(job_id, stamp, merge_statepoint_and_document(sp, doc or {}))
+            outdated += 1
+        if outdated:
+            logger.debug(f"Updated {outdated} of {len(job_paths)} job index entries")
+        return outdated
+
+    def flat_job(self, job_id: str) -> dict:
+        """Restores the merged statepoint and job document of a single job"""
+        row = self.rows[job_id]
+        names = self.column_names
+        columns = self.columns
+        return unflatten_dict(
+            (names[i], columns[names[i]][job_id]) for i in row["columns"]
+        )
+
+    def column(self, key: str) -> dict[str, Any]:
+        """Returns a dictionary from job id to value of a flattened key, ie.
+        parent.solver"""
+        return self.columns.get(key, {})
+
+    def flatten(
+        self,
+        job_paths: dict[str, str],
+        prune=False,
+        max_workers: Union[int, None] = None,
+    ) -> dict[str, dict]:
+        """Brings the index up to date and returns the merged statepoints and job
+        documents of the given jobs ordered by job ids, see `flatten_jobs`
+
+        Args:
+            job_paths: a dictionary from job ids to job folder
+            prune: remove all other jobs from the index
+            max_workers: number of threads used to read the job files
+        """
+        if prune:
+            self.prune(job_paths.keys())
+        self.update(job_paths, max_workers)
+        self.save()
+        return {job_id: self.flat_job(job_id) for job_id in job_paths}
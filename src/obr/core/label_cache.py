@@ -0,0 +1,121 @@
+"""A persistent cache of labels and eligibility checks of jobs.
+
+``obr status`` evaluates all labels of every job and ``obr submit`` checks the
+eligibility of every job, which reads several files per job and can parse the mesh
+of final jobs. The results are stored in ``.obr/label_cache.json`` together with a
+stamp of the files they depend on, ie. the statepoint, the job document, the history
+index, the marker files of the case checked by the labels and the job document of
+the parent job. Values of jobs whose stamp did not change are served from the cache.
+Values of jobs with a deferred initialization are not cached, see
+`obr.core.deferred`.
+"""
+
+import json
+import os
+
+from pathlib import Path
+from typing import Any, Callable, Union
+
+from .deferred import INITIALIZE, is_pending
+from .job_index import (
+    HISTORY_INDEX_FILE,
+    SIGNAC_JOB_DOCUMENT_FILE,
+    SIGNAC_STATEPOINT_FILE,
+    read_json,
+)
+
+LABEL_CACHE_FILE = "label_cache.json"
+LABEL_CACHE_VERSION = 1
+
+# files of a job which determine its labels
+STAMPED_FILES = (
+    SIGNAC_STATEPOINT_FILE,
+    SIGNAC_JOB_DOCUMENT_FILE,
+    HISTORY_INDEX_FILE,
+    "case/system/controlDict",
+    "case/processor0",
+    "case/constant/polyMesh/points",
+)
+
+
+def link_stamp(path: Union[str, Path]) -> Union[list[int], None]:
+    """Returns the inode, modification time and size of a file without following
+    symlinks, such that replacing a symlink by a copy changes the stamp"""
+    try:
+        stat = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def job_stamp(job_path: Union[str, Path], parent_id: Union[str, None]) -> list:
+    """Returns the stamps of the files which determine the labels of a job"""
+    stamp = [link_stamp(os.path.join(job_path, fn)) for fn in STAMPED_FILES]
+    if parent_id:
+        parent_path = os.path.join(os.path.dirname(job_path), parent_id)
+        stamp.append(link_stamp(os.path.join(parent_path, SIGNAC_JOB_DOCUMENT_FILE)))
+    return stamp
+
+
+class LabelCache:
+    """Labels and eligibility checks of the jobs of a project"""
+
+    def __init__(self, root: Union[str, Path]):
+        """
+        Args:
+            root: path to the project folder, the cache is stored in root/.obr
+        """
+        self.path = Path(root) / ".obr" / LABEL_CACHE_FILE
+        self.entries: dict[str, dict] = {}
+        self.modified = False
+        data = read_json(self.path)
+        if data.get("version") == LABEL_CACHE_VERSION:
+            self.entries = data["entries"]
+
+    def value(self, job, key: str, evaluate: Callable[[], Any]) -> Any:
+        """Returns a cached value of a job or evaluates it if any of the files of
+        the job changed since it has been cached
+
+        Args:
+            job: the job
+            key: name of the value, ie. labels or eligible:blockMesh
+            evaluate: computes the value, must return a json serializable value
+        """
+        entry = self.entries.get(job.id)
+        parent_id = entry["parent_id"] if entry else job.sp.get("parent_id")
+        stamp = job_stamp(job.path, parent_id)
+        if entry and entry["stamp"] == stamp and key in entry["values"]:
+            return entry["values"][key]
+
+        value = evaluate()
+        if is_pending(job.id, INITIALIZE):
+            # the value changes once the case of the job is initialized. Deferred
+            # mesh stats only add nCells to the job document cache which no value
+            # depends on, storing them changes the stamp of the job anyway
+            return value
+        # evaluating labels can write the job document, ie. final caches nCells
+        stamp = job_stamp(job.path, parent_id)
+        if not entry or entry["stamp"] != stamp:
+            entry = {"stamp": stamp, "parent_id": parent_id, "values": {}}
+            self.entries[job.id] = entry
+        entry["values"][key] = value
+        self.modified = True
+        return value
+
+    def prune(self, job_ids) -> None:
+        """Removes all jobs which are not in job_ids"""
+        keep = set(job_ids)
+        for job_id in [job_id for job_id in self.entries if job_id not in keep]:
+            del self.entries[job_id]
+            self.modified = True
+
+    def save(self) -> None:
+        """Writes the cache to disk if it has been modified"""
+        if not self.modified:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as fh:
+            json.dump({"version": LABEL_CACHE_VERSION, "entries": self.entries}, fh)
+        os.replace(tmp_path, self.path)
+        self.modified = False
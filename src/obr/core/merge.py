@@ -0,0 +1,184 @@
+"""Merging of archived job documents and histories.
+
+`obr archive` stores a copy of the job document and of the history file of a job
+per archival, ie. ``signac_job_document_<md5sum>.json`` and
+``obr_history_<md5sum>.jsonl``. After restoring the archive of a campaign with many
+re-runs `merge_job_folder` merges them into the job document and history file of
+the job.
+
+The data and history lists of every source are sorted by timestamp and spilled to
+temporary JSON lines files one source at a time. The sorted runs are then merged
+with a streaming k-way merge, such that only a single source document and the
+hashes of already merged records are held in memory. Records with identical
+content, ie. from repeated archivals of the same job, are merged only once. Cache
+entries and other keys of the job document are taken from the source with the
+latest record, the current job document always takes precedence.
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import os
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Generator, Iterable, Union
+
+from .history import HISTORY_FILE, index_record, read_history_file, record_time
+from .job_index import HISTORY_INDEX_FILE, SIGNAC_JOB_DOCUMENT_FILE, read_json
+
+logger = logging.getLogger("OBR")
+
+SUB_DOCUMENT_PREFIX = "signac_job_document_"
+SUB_HISTORY_PREFIX = "obr_history_"
+# lists of the job document which are merged record by record
+MERGED_LISTS = ("data", "history")
+
+
+@dataclass
+class MergeStats:
+    """Number of merged sources and records of a job"""
+
+    sources: int = 0
+    data: int = 0
+    history: int = 0
+    duplicates: int = 0
+
+
+def merge_sources(job_path: Union[str, Path]) -> tuple[list[Path], list[Path]]:
+    """Returns the archived and current job documents and history files of a job"""
+    documents, histories = [], []
+    with os.scandir(job_path) as it:
+        for entry in it:
+            name = entry.name
+            if name == SIGNAC_JOB_DOCUMENT_FILE or name.startswith(SUB_DOCUMENT_PREFIX):
+                if name.endswith(".json"):
+                    documents.append(Path(entry.path))
+            elif name == HISTORY_FILE or (
+                name.startswith(SUB_HISTORY_PREFIX) and name.endswith(".jsonl")
+            ):
+                histories.append(Path(entry.path))
+    return sorted(documents), sorted(histories)
+
+
+def record_hash(record) -> bytes:
+    """Content hash of a record independent of the order of its keys"""
+    return hashlib.sha1(
+        json.dumps(record, sort_keys=True, default=str).encode()
+    ).digest()
+
+
+def _write_run(folder: str, records: list) -> Union[str, None]:
+    """Sorts records by timestamp and writes them to a temporary file"""
+    if not records:
+        return None
+    records.sort(key=record_time)
+    fd, path = tempfile.mkstemp(dir=folder, suffix=".jsonl")
+    with os.fdopen(fd, "w") as fh:
+        for record in records:
+            fh.write(json.dumps(record) + "\n")
+    return path
+
+
+def _read_run(path: str) -> Generator[dict, None, None]:
+    with open(path) as fh:
+        for line in fh:
+            yield json.loads(line)
+
+
+def _merged(runs: Iterable[str], seen: set, stats: MergeStats):
+    """Streams the records of sorted runs in timestamp order, skipping records
+    which have been merged already"""
+    for record in heapq.merge(*[_read_run(run) for run in runs], key=record_time):
+        digest = record_hash(record)
+        if digest in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(digest)
+        yield record
+
+
+def _write_atomic(path: Path, write) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as fh:
+        write(fh)
+    os.replace(tmp_path, path)
+
+
+def merge_job_folder(job_path: Union[str, Path]) -> MergeStats:
+    """Merges the archived job documents and history files of a job into its job
+    document and history file. Merging is idempotent, thus archived files are
+    kept.
+    """
+    job_path = Path(job_path)
+    documents, histories = merge_sources(job_path)
+    stats = MergeStats(sources=len(documents) + len(histories))
+    if not stats.sources:
+        return stats
+    # precedence, newest record, name and remaining keys of every document
+    doc_keys: list[tuple[bool, datetime, str, dict]] = []
+    runs: dict[str, list[str]] = {key: [] for key in MERGED_LISTS}
+
+    with tempfile.TemporaryDirectory(dir=job_path, prefix=".merge") as tmp_dir:
+        for path in documents:
+            doc = read_json(path)
+            newest = datetime.min
+            for key in MERGED_LISTS:
+                records = doc.pop(key, None) or []
+                if records:
+                    newest = max(newest, max(map(record_time, records)))
+                if run := _write_run(tmp_dir, records):
+                    runs[key].append(run)
+            is_current = path.name == SIGNAC_JOB_DOCUMENT_FILE
+            doc_keys.append((is_current, newest, path.name, doc))
+        for path in histories:
+            if run := _write_run(tmp_dir, list(read_history_file(path))):
+                runs["history"].append(run)
+
+        merged_doc: dict = {}
+        for *_, doc in sorted(doc_keys, key=lambda d: d[:3]):
+            for key, value in doc.items():
+                if key == "cache" and isinstance(value, dict):
+                    merged_doc.setdefault("cache", {}).update(value)
+                else:
+                    merged_doc[key] = value
+
+        merged_doc["data"] = list(_merged(runs["data"], set(), stats))
+        stats.data = len(merged_doc["data"])
+
+        index: dict[str, dict] = {}
+
+        def write_history(fh):
+            for record in _merged(runs["history"], set(), stats):
+                index_record(index, record)
+                fh.write(json.dumps(record) + "\n")
+                stats.history += 1
+
+        _write_atomic(job_path / HISTORY_FILE, write_history)
+        _write_atomic(job_path / HISTORY_INDEX_FILE, lambda fh: json.dump(index, fh))
+        _write_atomic(
+            job_path / SIGNAC_JOB_DOCUMENT_FILE, lambda fh: json.dump(merged_doc, fh)
+        )
+    logger.debug(f"Merged {stats} into {job_path}")
+    return stats
+
+
+def merge_job_folders(
+    job_paths: Iterable[Union[str, Path]], max_workers: Union[int, None] = None
+) -> list[MergeStats]:
+    """Merges the job documents of many jobs in parallel, see `merge_job_folder`
+
+    Args:
+        job_paths: the job folders
+        max_workers: number of processes, defaults to the number of cpus
+    """
+    job_paths = list(job_paths)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(job_paths) < 2:
+        return [merge_job_folder(path) for path in job_paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(merge_job_folder, job_paths, chunksize=8))
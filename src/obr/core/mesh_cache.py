@@ -0,0 +1,102 @@
+"""A cache of meshes generated by blockMesh and refineMesh.
+
+Mesh resolution sweeps generate the same meshes for many variations of solver
+settings. Meshes are therefore stored once per project in ``.obr/meshes`` keyed by
+the inputs of the mesher and the OpenFOAM version, ie. the blockMeshDict for
+blockMesh and the current mesh and refineMeshDict for refineMesh. Since every
+refinement is keyed by the mesh it refines, the refinement count is part of the
+key implicitly and intermediate refinement levels are shared as well.
+
+Jobs are populated from the cache via `copy_tree`, thus via reflinks on file systems
+which support them, see `obr.core.copy_strategy`. The mesh files of a job stay
+regular files, such that the job owns its mesh, see `owns_mesh`. The cache is
+disabled by setting OBR_MESH_CACHE=0.
+"""
+
+import os
+import shutil
+
+from pathlib import Path
+from typing import Any, Callable, Union
+
+from .content_cache import ContentCache, content_key, file_entries, foam_version
+from .copy_strategy import copy_tree
+
+MESH_CACHE_FOLDER = "meshes"
+
+
+def mesh_cache_enabled() -> bool:
+    """Whether the mesh cache is enabled via OBR_MESH_CACHE"""
+    return os.environ.get("OBR_MESH_CACHE", "1") not in ("0", "false", "False")
+
+
+def mesh_cache(job_path: Union[str, Path]) -> ContentCache:
+    """Returns the mesh cache of the project holding the job"""
+    return ContentCache.of_project(job_path, MESH_CACHE_FOLDER)
+
+
+def mesh_key(
+    cmd: str,
+    case_path: Union[str, Path],
+    inputs: list[Path],
+    settings: Union[dict[str, Any], None] = None,
+) -> str:
+    """Returns a digest of a mesh generating command, the OpenFOAM version, the
+    files it reads and further settings, ie. the write format of the controlDict"""
+    return content_key(
+        cmd, foam_version(), settings or {}, file_entries(case_path, inputs)
+    )
+
+
+def store_mesh(poly_mesh: Path, entry: Path) -> None:
+    """Copies a generated mesh to a new cache entry"""
+    copy_tree(poly_mesh, entry, symlinks=False, hardlinks=False)
+
+
+def populate_mesh(entry: Path, poly_mesh: Path) -> None:
+    """Replaces the mesh files of a case by the files of a cache entry, other files
+    of the polyMesh folder are kept. The files are reflinked if the file system
+    supports it, unless OBR_COPY=copy, they are never hardlinked to the entry."""
+    if poly_mesh.is_symlink():
+        poly_mesh.unlink()
+    poly_mesh.mkdir(parents=True, exist_ok=True)
+    with os.scandir(entry) as it:
+        for e in it:
+            target = poly_mesh / e.name
+            if target.is_symlink() or target.is_file():
+                target.unlink()
+            elif target.is_dir():
+                shutil.rmtree(target)
+    copy_tree(entry, poly_mesh, dirs_exist_ok=True, hardlinks=False)
+
+
+def cached_mesh(
+    job_path: Union[str, Path],
+    key: str,
+    poly_mesh: Path,
+    generate: Callable[[], bool],
+) -> Union[Path, None]:
+    """Generates a mesh or populates poly_mesh from an identical mesh
+
+    Args:
+        job_path: the job folder, which determines the cache
+        key: the mesh key, see `mesh_key`
+        poly_mesh: the polyMesh folder of the case
+        generate: runs the mesher and returns whether the mesh was generated,
+            failed meshes are not cached
+
+    Returns: the cache entry if the mesh has been taken from the cache
+    """
+    generated = False
+
+    def create(entry: Path):
+        nonlocal generated
+        generated = True
+        if generate():
+            store_mesh(poly_mesh, entry)
+
+    entry = mesh_cache(job_path).entry(key, create)
+    if generated or not entry:
+        return None
+    populate_mesh(entry, poly_mesh)
+    return entry
@@ -0,0 +1,128 @@
+"""A content-addressed cache of fetched cases.
+
+Root cases and MultiCase variations are fetched from a git repository or copied
+from disk once into the origin cache in ``.obr/origins`` of the project and every
+job is populated from the cache. The cache holds
+
+    git/<sha1 of url>.git    a bare mirror of every git repository
+    <key>/                   a fetched case
+
+where the key is a digest of the url, commit and folder of a git repository or of
+the path and the file stats of a case on disk. Thus a changed case on disk or a new
+commit results in a new entry, see `obr.core.content_cache`.
+
+Jobs are populated from the cache via `copy_tree`, thus via reflinks on file
+systems which support them, see `obr.core.copy_strategy`.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from subprocess import check_output
+from typing import Any, Iterable, Union
+
+from .content_cache import ContentCache, content_key, locked
+from .copy_strategy import copy_tree
+
+logger = logging.getLogger("OBR")
+
+ORIGIN_CACHE_FOLDER = Path(".obr") / "origins"
+
+
+def tree_digest(path: Union[str, Path]) -> str:
+    """Returns a digest of the relative paths, sizes and modification times of all
+    files below path, symlinks are followed"""
+    entries = []
+    for root, folders, files in os.walk(path, followlinks=True):
+        folders.sort()
+        for fn in sorted(files):
+            stat = os.stat(os.path.join(root, fn))
+            rel_path = os.path.relpath(os.path.join(root, fn), path)
+            entries.append((rel_path, stat.st_size, stat.st_mtime_ns))
+    return content_key(entries)
+
+
+class OriginCache(ContentCache):
+    """The origin cache of a project"""
+
+    @classmethod
+    def of_job(cls, job_path: Union[str, Path]) -> "OriginCache":
+        """Returns the origin cache of the project holding the job. The location can
+        be set via the OBR_ORIGIN_CACHE environment variable, ie. to share the cache
+        between projects"""
+        root: Union[str, Path, None] = os.environ.get("OBR_ORIGIN_CACHE")
+        if not root:
+            root = Path(job_path).absolute().parent.parent / ORIGIN_CACHE_FOLDER
+        return cls(root)
+
+    def git_mirror(self, url: str) -> tuple[Path, bool]:
+        """Returns the path of the bare mirror of a git repository and whether it
+        has been cloned by this call. The mirror is cloned if it does not exist."""
+        mirror = self.root / "git" / f"{content_key(url)}.git"
+        if mirror.exists():
+            return mirror, False
+        mirror.parent.mkdir(parents=True, exist_ok=True)
+        with locked(mirror.with_suffix(".lock")):
+            if mirror.exists():
+                return mirror, False
+            tmp_dir = tempfile.mkdtemp(dir=mirror.parent)
+            try:
+                check_output(
+                    ["git", "clone", "--mirror", "--quiet", url, "mirror.git"],
+                    cwd=tmp_dir,
+                )
+                os.rename(Path(tmp_dir) / "mirror.git", mirror)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return mirror, True
+
+    def update_git_mirror(self, mirror: Path) -> None:
+        """Fetches new commits into a mirror"""
+        with locked(mirror.with_suffix(".lock")):
+            check_output(["git", "--git-dir", str(mirror), "fetch", "--prune", "-q"])
+
+    def populate(self, entry: Path, dst: Union[str, Path]) -> None:
+        """Copies a cache entry to dst"""
+        logger.debug(f"copying {entry} to {dst}")
+        copy_tree(entry, dst, hardlinks=False)
+
+
+def default_fetch_threads() -> int:
+    """Number of concurrent fetches, fetches mostly wait on the network or the
+    remote file system, thus the default of `ThreadPoolExecutor` is used"""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def prefetch(
+    origins: Iterable[tuple[Any, str]], max_workers: Union[int, None] = None
+) -> int:
+    """Fetches origins concurrently into their origin cache
+
+    Args:
+        origins: pairs of origin, ie. GitRepo, and the path of a job using it,
+            origins with the same `cache_id` are fetched once
+        max_workers: number of threads, defaults to `default_fetch_threads`
+
+    Returns: number of fetched origins
+    """
+    unique: dict[str, tuple[Any, str]] = {}
+    for origin, job_path in origins:
+        if hasattr(origin, "cache_id"):
+            unique.setdefault(origin.cache_id(), (origin, job_path))
+
+    def fetch(item) -> bool:
+        origin, job_path = item
+        try:
+            return origin.fetch(job_path) is not None
+        except Exception as e:
+            # the fetch is repeated and reported by the operation
+            logger.warning(f"Could not prefetch {type(origin).__name__}: {e}")
+            return False
+
+    max_workers = max_workers or default_fetch_threads()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return sum(executor.map(fetch, unique.values()))
@@ -1,5 +1,6 @@
 import re
 import logging
+import operator
 import pandas as pd
 
 from dataclasses import dataclass, field
@@ -9,6 +10,8 @@ from signac.job import Job
 from typing import TYPE_CHECKING, Union
 from enum import Enum
 
+from .job_index import JobIndex
+
 if TYPE_CHECKING:
     from obr.signac_wrapper.operations import OpenFOAMProject
 
@@ -34,6 +37,16 @@ class Predicates(Enum):
     lt = "<"
 
 
+PREDICATE_MAP: dict[str, Callable[[Any, Any], bool]] = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "geq": operator.ge,
+    "leq": operator.le,
+}
+
+
 @dataclass
 class Query:
     key: str
@@ -46,16 +59,7 @@ class Query:
     negate: bool = False
 
     def execute(self, key, value):
-        predicate_map = {
-            "eq": lambda a, b: a == b,
-            "neq": lambda a, b: a != b,
-            "gt": lambda a, b: a > b,
-            "lt": lambda a, b: a < b,
-            "geq": lambda a, b: a >= b,
-            "leq": lambda a, b: a <= b,
-        }
-
-        self.predicate_op = predicate_map[self.predicate]
+        self.predicate_op = PREDICATE_MAP[self.predicate]
 
         # case: wrong key during iteration
         if not self.key == key:
@@ -120,15 +124,17 @@ def input_to_queries(inp: str) -> list[Query]:
     return [input_to_query(x) for x in inp_lst]
 
 
+def is_dict(value) -> bool:
+    """Check if value is a dictionary or a signac JSONAttrDict"""
+    return isinstance(value, dict) or type(value).__name__ == "JSONAttrDict"
+
+
 def execute_query(query: Query, key, value, latest_only=True, track_keys=list) -> Query:
     if isinstance(value, list) and latest_only and value:
         value = value[-1]
     # descent one level down, statepoints and job documents might contain
     # subdicts which we want to descent into at the same time we need to track
-
-    signac_attr_dict_str = "JSONAttrDict"
-
-    if isinstance(value, dict) or type(value).__name__ == signac_attr_dict_str:
+    if is_dict(value):
         track_keys.append(key)
         sub_results = [
             execute_query(deepcopy(query), sub_key, sub_value, latest_only, track_keys)
@@ -146,19 +152,216 @@ def execute_query(query: Query, key, value, latest_only=True, track_keys=list) -
     return query
 
 
+# marks comparison values which can not be converted to the type of a job value
+_INVALID_CAST = object()
+
+
+class CompiledQuery:
+    """A `Query` with a resolved predicate and comparison values which are cast
+    once per value type instead of once per compared job value.
+
+    `execute` mirrors `Query.execute` but returns the resulting state instead of
+    storing it, thus a CompiledQuery can be reused for all jobs and keys.
+    """
+
+    __slots__ = ("key", "value", "negate", "predicate_op", "casts")
+
+    def __init__(self, query: Query):
+        self.key = query.key
+        self.value = query.value
+        self.negate = query.negate
+        self.predicate_op = PREDICATE_MAP[query.predicate]
+        self.casts: dict[type, Any] = {}
+        # pre-cast to the most common types
+        if self.value is not None:
+            self.cast(float)
+            self.cast(str)
+
+    def cast(self, value_type: type) -> Any:
+        """convert the comparison value to value_type, see `Query.execute`"""
+        casted = self.casts.get(value_type, _INVALID_CAST)
+        if casted is not _INVALID_CAST or value_type in self.casts:
+            return casted
+        try:
+            casted = value_type(self.value)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Cannot compare {self.value} to {value_type} for {self.key}")
+            logger.debug(e)
+            casted = _INVALID_CAST
+        self.casts[value_type] = casted
+        return casted
+
+    def execute(self, key, value) -> Union[dict, None]:
+        """Returns {key: value} if key and value satisfy the query otherwise None"""
+        if not self.key == key:
+            return None
+
+        if self.value is None and key:
+            return {key: value}
+
+        if isinstance(value, (int, float)):
+            value = float(value)
+        casted = self.cast(type(value))
+        if casted is _INVALID_CAST:
+            return None
+        try:
+            if self.predicate_op(value, casted):
+                return {key: value}
+        except TypeError as e:
+            logger.error(f"{e}:")
+            logger.error(
+                f"\tTried to compare {casted}({type(casted)}) and"
+                f" {value}({type(value)}) for {key=}."
+            )
+        return None
+
+
+def collect_key_values(
+    key, value, pos: int, keys: set, latest_only: bool, candidates: dict
+) -> None:
+    """Collects all values of the requested keys in a (sub)dictionary
+
+    The values are stored in the order in which `execute_query` evaluates them,
+    ie. sub dictionaries are evaluated before the dictionary itself.
+
+    Parameters:
+    key, value -- the key and value to descent into
+    pos -- position of the top level key in the job dictionary
+    keys -- set of keys to collect
+    candidates -- dictionary from key to a list of (pos, value) tuples
+    """
+    if latest_only and isinstance(value, list) and value:
+        value = value[-1]
+    if is_dict(value):
+        for sub_key, sub_value in value.items():
+            collect_key_values(sub_key, sub_value, pos, keys, latest_only, candidates)
+    if key in keys:
+        candidates.setdefault(key, []).append((pos, value))
+
+
+def collect_sub_keys(key, value, latest_only: bool, track_keys: list) -> list:
+    """Returns the keys of all (sub)dictionaries in the order in which
+    `execute_query` descents into them"""
+    if latest_only and isinstance(value, list) and value:
+        value = value[-1]
+    if is_dict(value):
+        track_keys.append(key)
+        for sub_key, sub_value in value.items():
+            collect_sub_keys(sub_key, sub_value, latest_only, track_keys)
+    return track_keys
+
+
+class QueryMatcher:
+    """A list of queries compiled to a reusable matcher over flattened jobs.
+
+    The matcher has the same semantics as executing each query via `execute_query`
+    on each key of a job dictionary, but only walks each job dictionary once and
+    does not copy queries for every key.
+
+    Parameters:
+    queries -- list of queries to run
+    latest_only -- Take only latest value if resulting value is a list, the history
+        of a job holds the latest record of every command, see `read_job_files`
+    strict -- needs all queries to be successful to return a result
+    track_keys -- Whether to compute the sub_keys of the results
+    """
+
+    def __init__(
+        self,
+        queries: list[Query],
+        latest_only: bool = True,
+        strict: bool = False,
+        track_keys: bool = True,
+    ):
+        self.queries = [CompiledQuery(q) for q in queries]
+        self.keys = {q.key for q in self.queries}
+        self.latest_only = latest_only
+        self.strict = strict
+        self.track_keys = track_keys
+
+    def candidates(self, doc: dict) -> dict:
+        """Returns a dictionary from the requested keys to all (pos, value) pairs
+        of the given job dictionary"""
+        candidates: dict = {}
+        for pos, (key, value) in enumerate(doc.items()):
+            collect_key_values(key, value, pos, self.keys, self.latest_only, candidates)
+        return candidates
+
+    def match(self, job_id, doc: dict) -> Union[query_result, None]:
+        """Execute all queries on a single job dictionary
+
+        Returns: the query_result or None if the job does not satisfy the queries
+        """
+        candidates = self.candidates(doc)
+        matches: list[tuple[int, dict]] = []
+        all_required = True
+        for q in self.queries:
+            res_cache = None
+            matched_pos = -1
+            for pos, value in candidates.get(q.key, ()):
+                # only the first match of each top level key counts
+                if pos == matched_pos:
+                    continue
+                state = q.execute(q.key, value)
+                if not state:
+                    continue
+                if q.negate:
+                    all_required = False
+                    break
+                res_cache = state
+                matched_pos = pos
+                matches.append((pos, state))
+
+            if q.value and not res_cache:
+                all_required = False
+
+        # in strict mode all queries need to have some result
+        if self.strict:
+            all_required = len(matches) == len(self.queries)
+
+        if not all_required:
+            return None
+
+        res = query_result(job_id)
+        merged: dict = {}
+        items = list(doc.items()) if self.track_keys else []
+        for pos, state in matches:
+            merged.update(state)
+            if self.track_keys:
+                key, value = items[pos]
+                res.sub_keys.append(collect_sub_keys(key, value, self.latest_only, []))
+        res.result = [merged]
+        return res
+
+    def query(self, jobs: dict[str, dict]) -> list[query_result]:
+        """Execute all queries on a dictionary of flattened jobs"""
+        ret = []
+        for job_id, doc in jobs.items():
+            res = self.match(job_id, doc)
+            if res:
+                ret.append(res)
+        return ret
+
+
 def flatten_jobs(
     jobs: "Union[OpenFOAMProject, list[Job]]",
+    max_workers: Union[int, None] = None,
 ) -> dict:
-    """convert a list of jobs to a dictionary"""
-    docs: dict = {}
+    """convert a list of jobs to a dictionary
+
+    The merged job docs and statepoints are served from the job index in .obr,
+    which only re-reads jobs whose files have changed since the last call. Changed
+    files are read concurrently by max_workers threads, which defaults to the
+    OBR_IO_THREADS environment variable.
+    """
+    is_project = not isinstance(jobs, list)
+    jobs = list(jobs)
+    if not jobs:
+        return {}
 
-    # merge job docs and statepoints
-    for job in jobs:
-        docs[job.id] = {}
-        for key, value in job.doc.items():
-            docs[job.id].update({key: value})
-        docs[job.id].update(job.sp())
-    return docs
+    index = JobIndex(jobs[0].project.path)
+    job_paths = {job.id: job.path for job in jobs}
+    return index.flatten(job_paths, prune=is_project, max_workers=max_workers)
 
 
 def query_flat_jobs(
@@ -174,54 +377,10 @@ def query_flat_jobs(
     latest_only -- Take only latest value if resulting value is a list
     strict -- needs all queries to be successful to return a result
     """
-    ret = []
-    for job_id, doc in jobs.items():
-        # scan through merged operations and statepoint values of a job
-        # look for keys and values
-        # and append if all queries have been matched
-        tmp_qs: list[Query] = []
-        all_required = True
-        for q in queries:
-            res_cache = {}
-            for key, value in doc.items():
-                q_tmp = deepcopy(q)
-                res = execute_query(q_tmp, key, value, latest_only, [])
-                if res.state:
-                    # a filter query was hit
-                    if res.negate:
-                        all_required = False
-                        break
-
-                    res_cache = res.state
-                    tmp_qs.append(res)
-
-            # res.state could be from any key before
-            if q.value and not res_cache:
-                all_required = False
-
-        # append if all required results are present
-        res_tmp = query_result(job_id)
-        for q in tmp_qs:
-            # requests a value but not a state
-            # is currently considered to be failed
-            res_tmp.result.append(q.state)
-            res_tmp.sub_keys.append(q.sub_keys)
-
-        # in strict mode all queries need to have some result
-        if strict:
-            all_required = len(res_tmp.result) == len(queries)
-            # if not all_required:
-            #    raise Exception(res_tmp)
-
-        # merge all results to a single dictionary
-        res_tmp_dict = {}
-        for d in res_tmp.result:
-            res_tmp_dict.update(d)
-        res_tmp.result = [res_tmp_dict]
-
-        if all_required:
-            ret.append(deepcopy(res_tmp))
-    return ret
+    # scan through merged operations and statepoint values of a job
+    # look for keys and values
+    # and append if all queries have been matched
+    return QueryMatcher(queries, latest_only, strict).query(jobs)
 
 
 def query_to_dict(
@@ -243,10 +402,10 @@ def query_impl(
     queries: list[Query],
     output=False,
     latest_only=True,
-) -> list[dict]:
+) -> dict[str, dict]:
     """Performs a query and returns a list of records ie for each job the query result"""
     res = query_to_dict(jobs, queries, output, latest_only)
-    query_ids = {}
+    query_ids: dict[str, dict] = {}
     for id_ in res:
         query_ids[id_.id] = id_.result[0]
     return query_ids
@@ -262,9 +421,8 @@ def query_to_records(
 
     Flattens list of jobs to a dictionary with merged statepoints and job document first
     """
-    query_results = query_flat_jobs(
-        flatten_jobs(jobs), queries, False, latest_only, strict
-    )
+    matcher = QueryMatcher(queries, latest_only, strict, track_keys=False)
+    query_results = matcher.query(flatten_jobs(jobs))
     ret = []
     for q in query_results:
         for r in q.result:
@@ -273,6 +431,123 @@ def query_to_records(
     return ret
 
 
+def jobs_to_frame(jobs: dict[str, dict], keys: set, latest_only=True) -> pd.DataFrame:
+    """Loads all values of the requested keys of the flattened jobs into a single
+    DataFrame with the columns jobid, key, pos, type and value.
+
+    The rows of each job and key are ordered like the values of
+    `QueryMatcher.candidates`, ie. in the order in which queries evaluate them.
+    """
+    columns: dict[str, list] = {"jobid": [], "key": [], "pos": [], "value": []}
+    matcher = QueryMatcher([], latest_only)
+    matcher.keys = keys
+    for job_id, doc in jobs.items():
+        for key, candidates in matcher.candidates(doc).items():
+            for pos, value in candidates:
+                columns["jobid"].append(job_id)
+                columns["key"].append(key)
+                columns["pos"].append(pos)
+                columns["value"].append(value)
+    frame = pd.DataFrame(
+        {k: pd.Series(v, dtype=object) for k, v in columns.items()},
+    )
+    frame["type"] = frame["value"].map(type)
+    return frame
+
+
+def frame_query_mask(
+    q: CompiledQuery, frame: pd.DataFrame
+) -> tuple[pd.Series, pd.Series]:
+    """Evaluates a compiled query on all rows of a DataFrame created by
+    `jobs_to_frame` which hold the query key
+
+    Returns: a boolean mask of matching rows and the values to report for the rows
+    """
+    values = frame["value"]
+    mask = pd.Series(False, index=frame.index)
+    reported = values.copy()
+
+    if q.value is None and q.key:
+        mask[:] = True
+        return mask, reported
+
+    # numeric values are compared as floats, see `Query.execute`
+    is_numeric = frame["type"].isin([int, float, bool])
+    if is_numeric.any():
+        numeric = values[is_numeric].astype(float)
+        reported[is_numeric] = numeric
+        casted = q.cast(float)
+        if casted is not _INVALID_CAST:
+            mask[is_numeric] = q.predicate_op(numeric, casted)
+
+    is_str = frame["type"] == str
+    if is_str.any():
+        casted = q.cast(str)
+        if casted is not _INVALID_CAST:
+            mask[is_str] = q.predicate_op(values[is_str], casted)
+
+    # all other types, ie. lists or dictionaries, are evaluated one by one
+    is_other = ~(is_numeric | is_str)
+    if is_other.any():
+        mask[is_other] = values[is_other].map(
+            lambda value: q.execute(q.key, value) is not None
+        )
+    return mask.astype(bool), reported
+
+
+def vectorized_query_flat_jobs(
+    jobs: dict[str, dict], queries: list[Query], latest_only=True, strict=False
+) -> list[dict]:
+    """Vectorized version of `query_flat_jobs` returning records like
+    `query_to_records`
+
+    All values of the queried keys are loaded into a single DataFrame and the
+    predicates of the queries are evaluated as column masks.
+    """
+    compiled = [CompiledQuery(q) for q in queries]
+    frame = jobs_to_frame(jobs, {q.key for q in compiled}, latest_only)
+
+    failed: set = set()
+    matches = []
+    for qi, q in enumerate(compiled):
+        rows = frame[frame["key"] == q.key]
+        mask, reported = frame_query_mask(q, rows)
+        # only the first match of each top level key counts
+        matched = rows[mask].assign(value=reported[mask], query=qi)
+        matched = matched.drop_duplicates(subset=["jobid", "pos"], keep="first")
+        matched_ids = set(matched["jobid"])
+
+        if q.negate:
+            # negated matches are never part of the result
+            failed |= matched_ids
+            matched_ids = set()
+        else:
+            matches.append(matched)
+        if q.value:
+            failed |= set(jobs) - matched_ids
+
+    if matches:
+        matched = pd.concat(matches).sort_values(["query", "pos"], kind="stable")
+    else:
+        matched = frame.iloc[0:0]
+    job_matches: dict = {job_id: [] for job_id in jobs}
+    for job_id, key, value in zip(matched["jobid"], matched["key"], matched["value"]):
+        job_matches[job_id].append((key, value))
+
+    ret = []
+    for job_id, job_match in job_matches.items():
+        # in strict mode all queries need to have some result
+        if strict:
+            if len(job_match) != len(queries):
+                continue
+        elif job_id in failed:
+            continue
+        record = {key: value for key, value in job_match}
+        record.update({"jobid": job_id})
+        ret.append(record)
+    return ret
+
+
 def query_to_dataframe(
     jobs: "OpenFOAMProject",
     queries: list[Query],
@@ -280,6 +555,7 @@ def query_to_dataframe(
     strict: bool = False,
     index: list[str] = [],
     post_pro: Union[Callable, None] = None,
+    vectorized: bool = False,
 ) -> pd.DataFrame:
     """Given a list jobs find all jobs for which a query matches
 
@@ -287,10 +563,18 @@ def query_to_dataframe(
     Args:
         index: A list of strings defining which columns should be used as index
         post_pro: Function to apply to the DataFrame before creating the index
+        vectorized: Evaluate the queries as column masks, see
+            `vectorized_query_flat_jobs`
     """
-    ret = pd.DataFrame.from_records(
-        query_to_records(jobs, queries, latest_only=latest_only, strict=strict)
-    )
+    if vectorized:
+        records = vectorized_query_flat_jobs(
+            flatten_jobs(jobs), queries, latest_only=latest_only, strict=strict
+        )
+    else:
+        records = query_to_records(
+            jobs, queries, latest_only=latest_only, strict=strict
+        )
+    ret = pd.DataFrame.from_records(records)
     if post_pro:
         ret = post_pro(ret)
     if index:
@@ -298,12 +582,12 @@ def query_to_dataframe(
     return ret
 
 
-def build_filter_query(filters: Iterable[str]) -> list[Query]:
+def build_filter_query(filters: Union[str, Iterable[str]]) -> list[Query]:
     """This function builds a list of filter queries, where filter queries are queries that request a specific value and has to conform a predicate"""
     q: list[Query] = []
 
     # avoid iterating over characters of one filter/query
-    if not isinstance(filters, (list, tuple)):
+    if isinstance(filters, str):
         filters = [filters]
     for filter in filters:
         for predicate in Predicates:
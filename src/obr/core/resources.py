@@ -0,0 +1,62 @@
+"""Resource planning of jobs.
+
+Flow evaluates the directives of an operation, ie. the number of processors of
+runParallelSolver, for every job during status and submission passes. The number
+of subdomains of a job is stored in its statepoint or a statepoint of its parents,
+or in the job document cache after the decomposeParDict has been read. Instead of
+reading these files job by job, `resolve_number_of_procs` resolves the numbers of
+all jobs from the columns of the job index in a single sweep, and
+`plan_number_of_procs` keeps them in memory for the directives of the current
+process. The plan is reset by `reset_planned_number_of_procs` at the start of every
+run or submission, such that changed statepoints or decompositions are picked up.
+"""
+
+from typing import Iterable, Union
+
+from .job_index import FLAT_KEY_SEP, JobIndex
+
+NUMBER_OF_PROCS_KEY = "numberOfSubdomains"
+
+# number of subdomains of jobs by job id, resolved by the current process
+_planned_number_of_procs: dict[str, int] = {}
+
+
+def resolve_number_of_procs(index: JobIndex, job_ids: Iterable[str]) -> dict[str, int]:
+    """Resolves the number of subdomains of jobs from the job index. Like
+    `statepoint_get` the statepoint of a job takes precedence over the statepoints of
+    its parents, the job document cache is used last. Jobs without a number of
+    subdomains are omitted."""
+    # the columns of the job and of all its parents, ie. parent.parent.<key>,
+    # ordered like the recursion of statepoint_get. Levels might be missing in the
+    # index, ie. if none of the indexed jobs has a parent which sets the key.
+    prefix = "parent" + FLAT_KEY_SEP
+    keys = []
+    for name in index.column_names:
+        parents = name.removesuffix(NUMBER_OF_PROCS_KEY)
+        if parents != name and parents == prefix * (len(parents) // len(prefix)):
+            keys.append(name)
+    columns = [index.column(key) for key in sorted(keys, key=len)]
+    columns.append(index.column("cache" + FLAT_KEY_SEP + NUMBER_OF_PROCS_KEY))
+
+    resolved = {}
+    for job_id in job_ids:
+        for column in columns:
+            if np := column.get(job_id):
+                resolved[job_id] = int(np)
+                break
+    return resolved
+
+
+def plan_number_of_procs(number_of_procs: dict[str, int]) -> None:
+    """Keeps the number of subdomains of jobs for the current process"""
+    _planned_number_of_procs.update(number_of_procs)
+
+
+def planned_number_of_procs(job_id: str) -> Union[int, None]:
+    """Returns the planned number of subdomains of a job"""
+    return _planned_number_of_procs.get(job_id)
+
+
+def reset_planned_number_of_procs() -> None:
+    """Drops the planned number of subdomains of all jobs"""
+    _planned_number_of_procs.clear()
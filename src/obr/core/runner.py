@@ -0,0 +1,77 @@
+"""Asynchronous execution of commands with streamed log files.
+
+The output of OpenFOAM utilities like decomposePar or checkMesh can be large. Instead
+of buffering the full output of a command in memory, `run_command` streams stdout
+and stderr of the child process to a log file and keeps only a bounded tail of the
+output in memory, which is stored in the job history for short logs, see
+`obr.core.core.logged_execute`.
+"""
+
+import asyncio
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+# number of bytes of the output which are kept in memory
+LOG_TAIL_SIZE = 1000
+READ_CHUNK_SIZE = 2**16
+
+
+@dataclass
+class CommandResult:
+    """Exit code, size and tail of the output of a command. The exit code is None
+    if the command could not be started, ie. since it was not found."""
+
+    returncode: Union[int, None]
+    size: int = 0
+    tail: bytes = b""
+    error: str = ""
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def text(self) -> str:
+        """The tail of the output, the complete output if it is shorter than the
+        tail size"""
+        return self.tail.decode("utf-8", errors="replace")
+
+
+async def run_command(
+    cmd: list[str],
+    cwd: Union[str, Path],
+    log_path: Union[str, Path],
+    tail_size: int = LOG_TAIL_SIZE,
+) -> CommandResult:
+    """Runs a command and streams its stdout and stderr to log_path"""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+    except OSError as e:
+        return CommandResult(None, error=str(e))
+
+    size = 0
+    tail = bytearray()
+    if proc.stdout is None:
+        raise RuntimeError(f"Cannot read the output of {cmd}")
+    try:
+        with open(log_path, "wb") as fh:
+            while chunk := await proc.stdout.read(READ_CHUNK_SIZE):
+                fh.write(chunk)
+                size += len(chunk)
+                tail += chunk
+                if len(tail) > tail_size:
+                    del tail[:-tail_size]
+        returncode = await proc.wait()
+    except asyncio.CancelledError:
+        # do not leave the command running if the caller is interrupted
+        proc.kill()
+        await proc.wait()
+        raise
+    return CommandResult(returncode, size, bytes(tail))
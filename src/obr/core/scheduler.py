@@ -0,0 +1,193 @@
+"""Dependency-aware execution of the operations of a job tree.
+
+Child jobs of a variation tree become eligible only after their parent is ready.
+Running such a tree via `flow.FlowProject.run` executes one layer of the tree per
+pass and re-evaluates the eligibility of all jobs between passes. `run_topological`
+instead dispatches every job to an executor as soon as its parent has finished, thus
+jobs of different layers run concurrently and no job is checked more than once.
+Children of failed jobs are skipped. If only a selection of jobs is run, jobs whose
+parent is not selected are only run if the parent is ready, see `drop_blocked`.
+
+The returned `ScheduleStats` hold the throughput of every layer and the critical
+path, ie. the chain of jobs from a root to a leaf with the longest total runtime,
+which is a lower bound of the runtime of the tree with unlimited workers.
+"""
+
+import logging
+import math
+import time
+
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Union
+
+logger = logging.getLogger("OBR")
+
+
+@dataclass
+class LayerStats:
+    """Number of jobs and time span of a layer of the job tree"""
+
+    jobs: int = 0
+    failed: int = 0
+    start: float = math.inf
+    end: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end - self.start)
+
+    @property
+    def throughput(self) -> float:
+        """Jobs per second between the start of the first and the end of the last
+        job of the layer"""
+        return self.jobs / self.duration if self.duration else 0.0
+
+
+@dataclass
+class ScheduleStats:
+    """Statistics of a `run_topological` call"""
+
+    layers: dict[int, LayerStats] = field(default_factory=dict)
+    skipped: int = 0
+    critical_path: list[str] = field(default_factory=list)
+    critical_path_time: float = 0.0
+    duration: float = 0.0
+
+    def report(self) -> list[str]:
+        """Returns a human readable summary"""
+        lines = []
+        for depth, layer in sorted(self.layers.items()):
+            lines.append(
+                f"layer {depth}: {layer.jobs} jobs ({layer.failed} failed) in"
+                f" {layer.duration:.2f}s, {layer.throughput:.2f} jobs/s"
+            )
+        lines.append(
+            f"critical path: {len(self.critical_path)} jobs,"
+            f" {self.critical_path_time:.2f}s of {self.duration:.2f}s total"
+        )
+        if self.skipped:
+            lines.append(f"skipped {self.skipped} jobs with failed parents")
+        return lines
+
+
+def _timed(run: Callable[[str], bool], job_id: str) -> tuple[bool, float, float]:
+    start = time.time()
+    try:
+        success = bool(run(job_id))
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        success = False
+    return success, start, time.time()
+
+
+def drop_blocked(
+    parents: dict[str, Union[str, None]], ready: Callable[[str], bool]
+) -> list[str]:
+    """Removes jobs from parents whose parent is neither part of parents nor ready,
+    and the descendants of such jobs
+
+    Args:
+        parents: a dictionary from job ids to the ids of their parent jobs
+        ready: called with the id of a parent which is not part of parents,
+            returns whether the parent is ready
+
+    Returns: the ids of the removed jobs
+    """
+    dropped = []
+    while blocked := [
+        job_id
+        for job_id, parent_id in parents.items()
+        if parent_id and parent_id not in parents and not ready(parent_id)
+    ]:
+        for job_id in blocked:
+            del parents[job_id]
+        dropped.extend(blocked)
+    return dropped
+
+
+def run_topological(
+    parents: dict[str, Union[str, None]],
+    run: Callable[[str], bool],
+    executor: Executor,
+    done: Iterable[str] = (),
+    on_finished: Union[Callable[[str, bool], None], None] = None,
+) -> ScheduleStats:
+    """Runs jobs in dependency order
+
+    Args:
+        parents: a dictionary from job ids to the ids of their parent jobs, jobs whose
+            parent is not part of the dictionary are roots
+        run: called with the job id, returns whether the job succeeded. Must be
+            picklable if executor is a process pool.
+        executor: executor which runs the jobs
+        done: ids of jobs which have been completed already, they are not run again
+        on_finished: called with the job id and whether the job succeeded after
+            every job, ie. to display the progress
+
+    Returns: the layer statistics and the critical path
+    """
+    start = time.time()
+    done = set(done)
+    children: dict[Union[str, None], list[str]] = {}
+    for job_id, parent_id in parents.items():
+        if parent_id not in parents:
+            parent_id = None
+        children.setdefault(parent_id, []).append(job_id)
+
+    stats = ScheduleStats()
+    depth: dict[str, int] = {}
+    # accumulated runtime and predecessor on the longest path to every job
+    path_time: dict[str, float] = {}
+    path_parent: dict[str, Union[str, None]] = {}
+    running: dict[Future, str] = {}
+    executed: set[str] = set()
+
+    def release(parent_id: Union[str, None]):
+        """Dispatches the children of a finished job, completed children are
+        passed through to their children"""
+        for job_id in children.get(parent_id, []):
+            depth[job_id] = depth[parent_id] + 1 if parent_id else 0
+            path_time[job_id] = path_time.get(parent_id, 0.0) if parent_id else 0.0
+            path_parent[job_id] = parent_id if parent_id in executed else None
+            if job_id in done:
+                release(job_id)
+                continue
+            running[executor.submit(_timed, run, job_id)] = job_id
+
+    def skip(parent_id: str):
+        for job_id in children.get(parent_id, []):
+            stats.skipped += 1
+            skip(job_id)
+
+    release(None)
+    while running:
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            job_id = running.pop(future)
+            executed.add(job_id)
+            success, job_start, job_end = future.result()
+            if on_finished:
+                on_finished(job_id, success)
+            layer = stats.layers.setdefault(depth[job_id], LayerStats())
+            layer.jobs += 1
+            layer.start = min(layer.start, job_start)
+            layer.end = max(layer.end, job_end)
+            path_time[job_id] += job_end - job_start
+            if path_time[job_id] > stats.critical_path_time:
+                stats.critical_path_time = path_time[job_id]
+                stats.critical_path = _path_to(job_id, path_parent)
+            if success:
+                release(job_id)
+            else:
+                layer.failed += 1
+                skip(job_id)
+    stats.duration = time.time() - start
+    return stats
+
+
+def _path_to(job_id: str, path_parent: dict[str, Union[str, None]]) -> list[str]:
+    path = [job_id]
+    while parent_id := path_parent.get(path[-1]):
+        path.append(parent_id)
+    return path[::-1]
@@ -0,0 +1,149 @@
+"""Incremental generation of the view folder.
+
+The view folder holds a human readable symlink to every final job, ie.
+``view/path/1 -> ../../workspace/<job id>``. Instead of removing and recreating the
+whole tree whenever the jobs are created, `build_view` compares the requested links
+with the links recorded in ``.obr/view_index.json`` and creates or removes only the
+links which changed. The links are created concurrently. The index maps job ids to
+their view paths and is read by ``obr status`` instead of walking the view folder,
+see `read_view_index`.
+"""
+
+import json
+import logging
+import os
+import shutil
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+from .job_index import default_worker_threads, read_json
+
+logger = logging.getLogger("OBR")
+
+VIEW_INDEX_FILE = "view_index.json"
+VIEW_INDEX_VERSION = 1
+
+
+@dataclass
+class ViewStats:
+    """Number of created, removed and unchanged links of a `build_view` call"""
+
+    created: int = 0
+    removed: int = 0
+    kept: int = 0
+
+
+def view_index_path(root: Union[str, Path]) -> Path:
+    return Path(root) / ".obr" / VIEW_INDEX_FILE
+
+
+def read_view_index(root: Union[str, Path]) -> Union[dict[str, str], None]:
+    """Returns the view paths by job id of the view of the project at root, or None
+    if no view has been built via `build_view` or the view folder does not exist"""
+    data = read_json(view_index_path(root))
+    if data.get("version") != VIEW_INDEX_VERSION or not os.path.isdir(data["view"]):
+        return None
+    return data["links"]
+
+
+def _link_matches(link: Path, target: str) -> bool:
+    try:
+        return os.readlink(link) == target
+    except OSError:
+        return False
+
+
+def _remove_link(view_path: Path, link: Path) -> None:
+    """Removes a link and its parent folders which became empty"""
+    if link.is_symlink():
+        link.unlink()
+    folder = link.parent
+    while folder != view_path and folder.is_relative_to(view_path):
+        try:
+            folder.rmdir()
+        except OSError:
+            break
+        folder = folder.parent
+
+
+def _create_link(link: Path, target: str) -> bool:
+    if link.is_symlink():
+        link.unlink()
+    elif link.exists():
+        logger.warning(f"Cannot create view {link}, the path exists already")
+        return False
+    link.parent.mkdir(parents=True, exist_ok=True)
+    link.symlink_to(target)
+    return True
+
+
+def build_view(
+    root: Union[str, Path],
+    view_path: Union[str, Path],
+    job_paths: dict[str, str],
+    id_path_mapping: dict[str, str],
+    max_workers: Union[int, None] = None,
+) -> ViewStats:
+    """Creates or updates the view folder
+
+    Args:
+        root: path to the project folder, the index is stored in root/.obr
+        view_path: path of the view folder
+        job_paths: paths of the jobs which should be part of the view by job id
+        id_path_mapping: view paths relative to view_path by job id, jobs without
+            a view path are not part of the view
+        max_workers: number of threads, defaults to `default_worker_threads`
+    """
+    view_path = Path(view_path).absolute()
+    index_path = view_index_path(root)
+    data = read_json(index_path)
+    if data.get("version") == VIEW_INDEX_VERSION and data["view"] == str(view_path):
+        current = data["links"]
+    else:
+        # views which are not described by the index are rebuilt from scratch
+        current = {}
+        if view_path.exists():
+            shutil.rmtree(view_path)
+
+    requested = {}
+    targets = {}
+    for job_id, job_path in job_paths.items():
+        if rel_path := id_path_mapping.get(job_id):
+            rel_path = os.path.normpath(rel_path)
+            link = view_path / rel_path
+            requested[job_id] = rel_path
+            targets[job_id] = os.path.relpath(job_path, link.parent)
+
+    stats = ViewStats()
+    kept = set()
+    for job_id, rel_path in current.items():
+        link = view_path / rel_path
+        if requested.get(job_id) == rel_path and _link_matches(link, targets[job_id]):
+            kept.add(job_id)
+            continue
+        _remove_link(view_path, link)
+        stats.removed += 1
+    stats.kept = len(kept)
+    create = [
+        (view_path / rel_path, targets[job_id])
+        for job_id, rel_path in requested.items()
+        if job_id not in kept
+    ]
+
+    if create:
+        max_workers = max_workers or default_worker_threads()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            stats.created = sum(executor.map(lambda args: _create_link(*args), create))
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as fh:
+        json.dump(
+            {"version": VIEW_INDEX_VERSION, "view": str(view_path), "links": requested},
+            fh,
+        )
+    os.replace(tmp_path, index_path)
+    return stats
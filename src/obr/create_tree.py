@@ -3,12 +3,13 @@ import sys
 
 from collections.abc import MutableMapping
 from pathlib import Path
-from subprocess import check_output
 from signac.job import Job
 from obr.signac_wrapper.operations import OpenFOAMProject
 from obr.core.queries import statepoint_query
 from obr.core.parse_yaml import eval_generator_expressions
 from obr.core.logger_setup import logger
+from obr.core.view_index import build_view
+from obr.core.job_graph import set_job_state
 from copy import deepcopy
 
 
@@ -77,31 +78,19 @@ def extract_from_operation(operation: dict, value) -> dict:
 def generate_view(
     project: OpenFOAMProject, workspace: Path, view_path: Path, id_path_mapping: dict
 ):
-    """
+    """Creates or updates the links of the final jobs in the view folder, only
+    changed links are touched, see `obr.core.view_index.build_view`
+
     Parameters:
         - workspace: folder that contains the workspace folder
         - view_path: path where the view should be created
         - id_path_mapping: dictionary from job.id to relative path name
     """
-
-    def ln(src, dst):
-        src = Path(src)
-        dst = Path(dst).absolute()
-        relpath = os.path.relpath(src, dst)
-        # for some reason the relpath has one ../ too much
-        relpath = relpath[3:]
-        dst.symlink_to(relpath)
-
-    if (view_path).exists():
-        check_output(["rm", "-rf", str(view_path)])
-
-    if not id_path_mapping:
-        return
-
-    project.find_jobs(filter={"has_child": False}).export_to(
-        str(workspace),
-        path=lambda job: "view/" + id_path_mapping[job.id],
-        copytree=lambda src, dst: ln(src, dst),
+    job_paths = {job.id: job.path for job in project.find_jobs({"has_child": False})}
+    stats = build_view(workspace, view_path, job_paths, id_path_mapping)
+    logger.debug(
+        f"Updated view: {stats.created} created, {stats.removed} removed,"
+        f" {stats.kept} unchanged links"
     )
 
 
@@ -258,7 +247,7 @@ def add_variations(
             job = project.open_job(statepoint)
             setup_job_doc(job)
             job.init()
-            job.doc["state"]["global"] = ""
+            set_job_state(job, "global", "")
 
             id_path_mapping[job.id] = (
                 id_path_mapping.get(parent_job.id, "") + parse_res["path"]
@@ -282,7 +271,6 @@ def setup_job_doc(job: Job, reset: bool = False) -> None:
         return
     job.doc["state"] = {}
     job.doc["data"] = []  # store results data here
-    job.doc["history"] = []  # history of executed operations
     job.doc["cache"] = {}
 
 
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 
+from functools import partial
 from pathlib import Path
 from flow import FlowProject
 
 from ..core.core import get_mesh_stats
+from ..core.deferred import MESH_STATS, defer
+from ..core.job_graph import job_graph_of, set_job_cache
 
 
 @FlowProject.label
@@ -58,21 +61,38 @@ def final(job):
     """jobs that dont have children/variations are considered to be final and
     are thus eligible for execution
 
-    NOTE as a side effect we check the number of cells
+    NOTE as a side effect we check the number of cells, which is deferred within
+    `obr.core.deferred.deferred_side_effects`
     """
     if not uninitialised(job):
-        final = not job.sp.get("has_child")
+        node = job_graph_of(job).node(job.id)
+        final = not node.has_child
         if final:
-            owner_path = f"{job.path}/case/constant/polyMesh/owner"
-            if not job.doc["cache"].get("nCells"):
-                mesh_stats = get_mesh_stats(owner_path)
-                job.doc["cache"]["nCells"] = mesh_stats["nCells"]
-                job.doc["cache"]["nFaces"] = mesh_stats["nFaces"]
+            if not node.cache.get("nCells"):
+                if not defer(job.id, MESH_STATS, partial(read_mesh_stats, job)):
+                    cache_mesh_stats(job)
             return True
     else:
         return False
 
 
+def cache_mesh_stats(job):
+    """Stores the number of cells and faces of the mesh in the job document"""
+    read_mesh_stats(job)()
+
+
+def read_mesh_stats(job):
+    """Reads the number of cells and faces of the mesh, returns a callable which
+    stores them in the job document, see `obr.core.deferred`"""
+    mesh_stats = get_mesh_stats(f"{job.path}/case/constant/polyMesh/owner")
+
+    def store():
+        set_job_cache(job, "nCells", mesh_stats["nCells"])
+        set_job_cache(job, "nFaces", mesh_stats["nFaces"])
+
+    return store
+
+
 @FlowProject.label
 def failed_op(job):
     if job.doc["state"].get("global") == "failure":
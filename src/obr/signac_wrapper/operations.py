@@ -5,27 +5,59 @@ import sys
 import obr.core.caseOrigins as caseOrigins
 import traceback
 import logging
-import json
 import shutil
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from subprocess import check_output
 from signac.job import Job
+from tqdm import tqdm
 from typing import Union, Literal
 from datetime import datetime
 
 from .labels import owns_mesh, final, finished
 from ..core.core import (
+    append_history,
     execute_shell,
     GLOBAL_INIT_COUNT,
+    JobDocumentSession,
+    link_tree,
     map_view_folder_to_job_id,
 )  # noqa
-from obr.OpenFOAM.case import OpenFOAMCase
+from obr.OpenFOAM.case import File, OpenFOAMCase
 from obr.core.queries import filter_jobs, query_impl, Query, statepoint_get
 from obr.core.caseOrigins import instantiate_origin_class
+from obr.core.origin_cache import prefetch
+from obr.core.job_index import JobIndex
+from obr.core.deferred import INITIALIZE, defer, deferred_side_effects, is_pending
+from obr.core.scheduler import ScheduleStats, drop_blocked, run_topological
+from obr.core.resources import (
+    plan_number_of_procs,
+    planned_number_of_procs,
+    reset_planned_number_of_procs,
+    resolve_number_of_procs,
+)
+from obr.core.copy_strategy import (
+    CopyStats,
+    copy_file,
+    copy_path,
+    copy_tree,
+    copy_stats,
+)
+from obr.core.job_graph import (
+    get_job_graph,
+    job_graph_of,
+    refresh_job_graph,
+    set_job_cache,
+    set_job_state,
+)
 
 logger = logging.getLogger("OBR")
 
+# operations and groups which fetch cases, see prefetch_case_origins
+FETCH_OPERATIONS = {"generate", "fetchCase", "MultiCase"}
+
 
 class OpenFOAMProject(flow.FlowProject):
     filtered_jobs: list[Job] = []
@@ -33,6 +65,80 @@ class OpenFOAMProject(flow.FlowProject):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def run(self, *args, **kwargs):
+        """Forwards to `flow.FlowProject.run` after picking up changes of job
+        documents since the last run. If cases are fetched, the cases of all jobs
+        are fetched into the origin cache concurrently beforehand."""
+        refresh_job_graph(self.workspace)
+        names = kwargs.get("names")
+        if names is None or FETCH_OPERATIONS.intersection(names):
+            prefetch_case_origins(kwargs.get("jobs") or self)
+        initialize_jobs(kwargs.get("jobs") or self, requested_operations(self, names))
+        if names is None or "runParallelSolver" in names:
+            plan_resources(kwargs.get("jobs") or self)
+        return super().run(*args, **kwargs)
+
+    def submit(self, *args, **kwargs):
+        """Forwards to `flow.FlowProject.submit` after picking up changes of job
+        documents since the last call and resolving the resources of all jobs, such
+        that the directives are evaluated from memory"""
+        refresh_job_graph(self.workspace)
+        names = kwargs.get("names")
+        if names is None or "runParallelSolver" in names:
+            plan_resources(kwargs.get("jobs") or self)
+        return super().submit(*args, **kwargs)
+
+    def run_generate(
+        self, jobs=None, np: int = -1, progress: bool = False
+    ) -> ScheduleStats:
+        """Runs the generate operations of all jobs in dependency order, every job
+        is dispatched to a process pool as soon as its parent is ready, see
+        `obr.core.scheduler`. Jobs whose parent is not part of jobs and not ready
+        are skipped.
+
+        Args:
+            jobs: the jobs to generate, defaults to all jobs
+            np: number of processes, defaults to the number of cpus
+            progress: show a progress bar of the generated jobs
+        """
+        jobs = list(jobs or self)
+        refresh_job_graph(self.workspace)
+        graph = get_job_graph(self.workspace)
+        parents = {job.id: graph.node(job.id).parent_id for job in jobs}
+
+        def is_ready(job_id: str) -> bool:
+            return graph.state(job_id).get("global") == "ready"
+
+        for job_id in drop_blocked(parents, is_ready):
+            logger.warning(
+                f"Skipping job {job_id}, its parent is not ready and not generated"
+                " by this run"
+            )
+        jobs = [job for job in jobs if job.id in parents]
+        prefetch_case_origins(jobs)
+        done = [job_id for job_id in parents if is_ready(job_id)]
+        max_workers = np if np and np > 0 else os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=max_workers) as executor, tqdm(
+            total=len(parents) - len(done), disable=not progress
+        ) as bar:
+            stats = run_topological(
+                parents,
+                partial(_generate_job, self.path),
+                executor,
+                done,
+                on_finished=lambda job_id, success: bar.update(),
+            )
+        refresh_job_graph(self.workspace)
+        for line in stats.report():
+            logger.info(line)
+        return stats
+
+    def _run_operations(self, *args, **kwargs):
+        """Refreshes the JobGraph after each pass, since operations executed in
+        parallel update the job documents from other processes"""
+        super()._run_operations(*args, **kwargs)
+        refresh_job_graph(self.workspace)
+
     def print_operations(self):
         ops = sorted(self.groups.keys())
         logger.info("Available operations are:\n\t" + "\n\t".join(ops))
@@ -48,7 +154,7 @@ class OpenFOAMProject(flow.FlowProject):
         )
         return self.filtered_jobs
 
-    def query(self, jobs: list[Job], query: list[Query]) -> list[dict]:
+    def query(self, jobs: list[Job], query: list[Query]) -> dict[str, dict]:
         """return list of job ids as result of `Query`."""
         return query_impl(jobs, query, output=True)
 
@@ -99,7 +205,7 @@ def is_job(job: Job) -> bool:
 
 def operation_complete(job: Job, operation: str) -> bool:
     """An operation is considered to be complete if an entry in the job document with same arguments exists and state is success"""
-    if job.doc["state"].get("global") == "ready":
+    if job_graph_of(job).state(job.id).get("global") == "ready":
         return True
     else:
         return False
@@ -118,12 +224,12 @@ def basic_eligible(job: Job, operation: str) -> bool:
 
     if (
         is_locked(job)
-        or not operation == job.sp().get("operation")
+        or not operation == job_graph_of(job).node(job.id).operation
         or not parent_job_is_ready(job) == "ready"
         or not initialize_if_required(
             job
         )  # keep this here start initialization only if operation is requested
-        or not is_case(job)
+        or not (is_case(job) or is_pending(job.id, INITIALIZE))
     ):
         # For Debug purposes
         if False and (operation == job.sp().get("operation")):
@@ -143,98 +249,38 @@ def basic_eligible(job: Job, operation: str) -> bool:
 
 def parent_job_is_ready(job: Job) -> str:
     """Checks whether the parent of the given job is ready"""
-    if parent_id := job.sp().get("parent_id"):
-        project = OpenFOAMProject.get_project(path=job.path + "/../..")
-        with open(job.path + f"/../{parent_id}/signac_job_document.json", "r") as jh:
-            parent_job_dict = json.load(jh)
-            return parent_job_dict["state"].get("global", "")
+    if parent := job_graph_of(job).parent(job.id):
+        return parent.state.get("global", "")
     return ""
 
 
-def _link_path(base: Path, dst: Path, parent_id: str, copy_instead_link: bool):
+def _link_path(
+    base: Path,
+    dst: Path,
+    parent_id: str,
+    copy_instead_link: bool,
+    max_workers: Union[int, None] = None,
+) -> CopyStats:
     """creates file tree under dst with same folder structure as base but all
-    files are relative symlinks
+    files are relative symlinks, see `link_tree`
+
+    Returns: the statistics of the copied files
     """
     # NOTE if copy instead linking is requested we
     # just copy the full tree and are done
     if copy_instead_link:
         if dst.exists():
             shutil.rmtree(f"{dst}")
-        shutil.copytree(src=f"{base}", dst=f"{dst}", symlinks=False)
-        return
+        return copy_tree(base, dst, symlinks=False)
 
-    # ensure dst path exists
-    check_output(["mkdir", "-p", str(dst)])
-    for root, folder, files in os.walk(Path(base)):
-        relative_path = Path(root).relative_to(base)
-
-        # NOTE Treat processor folder separately
-        # Dont recurse into processor folders for now since that can
-        # become very costly. Instead we copy all processor folder
-        # entirely and pop the folder from the folder list
-        if "processor0" in folder:
-            for fold in folder:
-                if not fold.startswith("processor"):
-                    continue
-                proc_root, proc_folder, _ = next(os.walk(f"{base}/{fold}"))
-                # NOTE The constant folder is linked
-                # to reduce the resulting folder size
-                trgt_proc_fold = f"{dst}/{fold}"
-                for proc_cont in proc_folder:
-                    if proc_cont == "constant":
-                        check_output(["mkdir", "-p", trgt_proc_fold])
-                        check_output(
-                            [
-                                "ln",
-                                "-s",
-                                # we can use this folder format here because
-                                # we know where the parent job lies relative
-                                # to this one in the workspace
-                                f"../../../{parent_id}/case/{fold}/constant",
-                            ],
-                            cwd=trgt_proc_fold,
-                        )
-                    else:
-                        shutil.copytree(
-                            src=f"{proc_root}/{proc_cont}",
-                            dst=f"{trgt_proc_fold}/{proc_cont}",
-                            symlinks=False,
-                        )
-            # pop all processor folder to avoid recursing
-            pop_idx = [i for i, f in enumerate(folder) if f.startswith("processor")]
-            for i in sorted(pop_idx, reverse=True):
-                del folder[i]
-
-        for fold in folder:
-            src = Path(root) / fold
-            dst_ = dst / relative_path / fold
-            if not dst_.exists():
-                check_output(
-                    [
-                        "mkdir",
-                        fold,
-                    ],
-                    cwd=dst / relative_path,
-                )
-
-        for fn in files:
-            src = Path(root) / fn
-            dst_ = Path(dst) / relative_path / fn
-            if not dst_.exists():
-                check_output(
-                    [
-                        "ln",
-                        "-s",
-                        str(os.path.relpath(src, dst / relative_path)),
-                    ],
-                    cwd=dst / relative_path,
-                )
+    return link_tree(base, dst, parent_id, max_workers)
 
 
 def needs_initialization(job: Job) -> bool:
     """Check if this job has been initialized already, without performing the initialization"""
-    if parent_id := job.sp().get("parent_id"):
-        if job.doc["state"].get("is_initialized"):
+    node = job_graph_of(job).node(job.id)
+    if node.parent_id:
+        if node.state.get("is_initialized"):
             return False
     return True
 
@@ -243,34 +289,86 @@ def initialize_if_required(job: Job) -> bool:
     """check if this job has been already linked to
 
     The default strategy is to link all files. If a file is modified
-    the modifying operations are responsible for unlinking and copying
+    the modifying operations are responsible for unlinking and copying.
+    Within `obr.core.deferred.deferred_side_effects` the initialization is deferred.
     """
-    if parent_id := job.sp().get("parent_id"):
-        if job.doc["state"].get("is_initialized"):
+    node = job_graph_of(job).node(job.id)
+    if parent_id := node.parent_id:
+        if node.state.get("is_initialized"):
             return True
-        global GLOBAL_INIT_COUNT
-        GLOBAL_UNINIT_COUNT = os.environ.get("GLOBAL_UNINIT_COUNT")
-
-        GLOBAL_INIT_COUNT += 1
-        base_path = Path(job.path).parent / parent_id / "case"
-        dst_path = Path(job.path) / "case"
-        # logger.info(f"linking {base_path} to {dst_path}")
         # shell scripts might change files as side effect hence we copy all files
         # instead of linking to avoid side effects in future it might make sense to
         # specify the files which are modified in the yaml file
-        copy_instead_link = job.sp().get("operation") == "shell"
-        _link_path(base_path, dst_path, parent_id, copy_instead_link)
-        job.doc["state"]["is_initialized"] = True
-        if GLOBAL_UNINIT_COUNT:
-            logger.info(
-                "Done initialization of case"
-                f" {job.id} [{GLOBAL_INIT_COUNT}/{int(GLOBAL_UNINIT_COUNT)}]\r"
-            )
+        copy_instead_link = node.operation == "shell"
+        link = partial(link_parent_case, job, parent_id, copy_instead_link)
+        if not defer(job.id, INITIALIZE, link):
+            link()()
         return True
     else:
         return False
 
 
+def link_parent_case(job: Job, parent_id: str, copy_instead_link: bool):
+    """Links the case of the parent job into the case of the job
+
+    Returns: a callable marking the job as initialized and recording the copy
+    statistics, see `obr.core.deferred`
+    """
+    base_path = Path(job.path).parent / parent_id / "case"
+    dst_path = Path(job.path) / "case"
+    stats = _link_path(base_path, dst_path, parent_id, copy_instead_link)
+    return partial(mark_initialized, job, stats)
+
+
+def mark_initialized(job: Job, stats: CopyStats) -> None:
+    global GLOBAL_INIT_COUNT
+    GLOBAL_UNINIT_COUNT = os.environ.get("GLOBAL_UNINIT_COUNT")
+
+    GLOBAL_INIT_COUNT += 1
+    record_copy_stats(job, stats)
+    set_job_state(job, "is_initialized", True)
+    if GLOBAL_UNINIT_COUNT:
+        logger.info(
+            "Done initialization of case"
+            f" {job.id} [{GLOBAL_INIT_COUNT}/{int(GLOBAL_UNINIT_COUNT)}]\r"
+        )
+
+
+def requested_operations(
+    project: OpenFOAMProject, names: Union[list[str], None]
+) -> Union[set[str], None]:
+    """Returns the names of the operations of the requested operations and groups,
+    or None if all operations are requested"""
+    if names is None:
+        return None
+    operations: set[str] = set()
+    for name in names:
+        if group := project.groups.get(name):
+            operations.update(group.operations)
+    return operations
+
+
+def initialize_jobs(jobs, operations: Union[set[str], None] = None) -> int:
+    """Initializes the cases of all eligible jobs concurrently, instead of one by one
+    while flow checks the pre-conditions
+
+    Args:
+        jobs: the jobs to initialize
+        operations: only jobs of these operations are initialized, defaults to all
+
+    Returns: number of initialized jobs
+    """
+    with deferred_side_effects() as pending:
+        for job in jobs:
+            operation = job_graph_of(job).node(job.id).operation
+            if operation and (operations is None or operation in operations):
+                basic_eligible(job, operation)
+    initialized = pending.apply()
+    if initialized:
+        logger.info(f"Initialized {initialized} cases")
+    return initialized
+
+
 def get_args(job: Job, args: Union[dict, str]) -> Union[dict, str]:
     """operation can get args either via function call or it statepoint
     if no args are passed via function the args from the statepoint are taken
@@ -334,34 +432,74 @@ def execute_pre_build(operation_name: str, job: Job):
 def start_job_state(_, job: Job) -> None:
     current_state = job.doc["state"].get("global")
     if not current_state:
-        job.doc["state"]["global"] = "started"
+        set_job_state(job, "global", "started")
     elif current_state == "started":
         # job has been started but not finished yet
-        job.doc["state"]["global"] = "tmp_lock"
+        set_job_state(job, "global", "tmp_lock")
 
 
 def end_job_state(_, job: Job) -> Literal[True]:
-    job.doc["state"]["global"] = "ready"
+    set_job_state(job, "global", "ready")
     return True
 
 
+# copy statistics at the start of running operations, see dispatch_pre_hooks
+_copy_stats_at_start: dict[str, CopyStats] = {}
+
+
+def record_copy_stats(job: Job, stats: CopyStats) -> None:
+    """Adds copy statistics to the copyStats of the job document cache"""
+    if stats.files:
+        previous = job.doc.get("cache", {}).get("copyStats") or {}
+        stats = stats + CopyStats(**previous)
+        set_job_cache(job, "copyStats", stats.to_dict())
+
+
+def record_operation_copy_stats(job: Job) -> None:
+    """Adds the copy statistics of a running operation to the job document cache"""
+    if (stats_at_start := _copy_stats_at_start.pop(job.id, None)) is not None:
+        record_copy_stats(job, copy_stats() - stats_at_start)
+
+
 def dispatch_pre_hooks(operation_name: str, job: Job):
-    """just forwards to start_job_state and execute_pre_build"""
+    """just forwards to start_job_state and execute_pre_build
+
+    The started state is written immediately, such that other obr calls see the
+    lock. History records and state updates of the pre build steps are collected
+    in a `JobDocumentSession`, which is written before the operation runs. Thus
+    the operation reads the current job document and its records are written as
+    they happen, ie. also if the solver run is killed.
+    """
     start_job_state(operation_name, job)
-    execute_pre_build(operation_name, job)
+    _copy_stats_at_start[job.id] = copy_stats()
+    try:
+        with JobDocumentSession(job):
+            execute_pre_build(operation_name, job)
+    except BaseException:
+        # flow does not call the on_exception hooks for failing on_start hooks
+        record_operation_copy_stats(job)
+        raise
 
 
 def dispatch_post_hooks(operation_name: str, job: Job):
     """Forwards to `execute_post_build`, performs md5sum calculation of case files and finishes with `end_job_state`"""
-    execute_post_build(operation_name, job)
-    case = OpenFOAMCase(str(job.path) + "/case", job)
-    case.perform_post_md5sum_calculations()
-    end_job_state(operation_name, job)
+    with JobDocumentSession(job):
+        try:
+            execute_post_build(operation_name, job)
+            case = OpenFOAMCase(str(job.path) + "/case", job)
+            case.perform_post_md5sum_calculations()
+            end_job_state(operation_name, job)
+        finally:
+            record_operation_copy_stats(job)
 
 
 def set_failure(operation_name: str, error, job: Job):
     """just forwards to start_job_state and execute_pre_build"""
-    job.doc["state"]["global"] = "failure"
+    with JobDocumentSession(job):
+        try:
+            set_job_state(job, "global", "failure")
+        finally:
+            record_operation_copy_stats(job)
 
 
 def copy_on_uses(args: dict, job: Job, path: str, target: str):
@@ -370,18 +508,17 @@ def copy_on_uses(args: dict, job: Job, path: str, target: str):
         return
     if uses := args.pop("uses", False):
         if path:
-            check_output([
-                "cp",
+            copy_file(
                 "{}/case/{}/{}".format(job.path, path, uses),
                 "{}/case/{}/{}".format(job.path, path, target),
-            ])
+            )
         else:
             src_path = "{}/case/{}".format(job.path, uses)
             trg_path = "{}/case/{}".format(job.path, target)
             # It should be alright if the source path does not exists
             # as long as the target path exists
             if not Path(trg_path).exists() and Path(src_path).exists():
-                check_output(["cp", "-r", src_path, trg_path])
+                copy_path(src_path, trg_path)
 
 
 @generate
@@ -515,8 +652,14 @@ def transportProperties(job: Job, args={}):
 def turbulenceProperties(job: Job, args={}):
     args = get_args(job, args)
     copy_on_uses(args, job, "constant", "turbulenceProperties")
-    if args:
-        OpenFOAMCase(str(job.path) + "/case", job).turbulenceProperties.set(args)
+    if not args:
+        return
+    turbulenceProperties = OpenFOAMCase(
+        str(job.path) + "/case", job
+    ).turbulenceProperties
+    if not isinstance(turbulenceProperties, File):
+        raise ValueError(f"No turbulenceProperties found in job {job.id}")
+    turbulenceProperties.set(args)
 
 
 @generate
@@ -555,12 +698,8 @@ def has_mesh(job: Job) -> bool:
 def decomposePar(job: Job, args={}):
     args = get_args(job, args)
 
-    # NOTE don't try anything smart about reusing existing decompositions
-    # if decompositions should be reused place decompositions in front
-    # of your workflow file
-    workspace_folder = Path(job.path) / "../"
-    root, job_paths, _ = next(os.walk(workspace_folder))
-
+    # NOTE identical decompositions of sibling jobs are reused via the
+    # decomposition cache, see obr.core.decomposition_cache
     target_case = OpenFOAMCase(str(job.path) + "/case", job)
     target_case.decomposePar(args)
 
@@ -593,11 +732,56 @@ def fetchCase(job: Job, args={}):
             getattr(sys.modules[__name__], k)(job, {"uses": v})
 
 
+def case_origin(job: Job) -> Union[object, None]:
+    """Returns the origin of the case fetched by fetchCase or MultiCase for a job"""
+    sp = job.sp()
+    args = get_args(job, {})
+    if not isinstance(args, dict):
+        return None
+    if sp.get("operation") == "MultiCase":
+        case_type = args.get("type")
+    elif not sp.get("parent_id"):
+        case_type = sp.get("type")
+    else:
+        return None
+    if case_type not in ("GitRepo", "CaseOnDisk", "OpenFOAMTutorialCase"):
+        return None
+    args = {k: v for k, v in args.items() if k != "uses"}
+    return instantiate_origin_class(case_type, args)
+
+
+def _generate_job(project_path: str, job_id: str) -> bool:
+    """Runs the generate operations of a single job in a worker process of
+    `OpenFOAMProject.run_generate`, returns whether the job is ready"""
+    project = OpenFOAMProject.get_project(project_path)
+    job = project.open_job(id=job_id)
+    project.run(jobs=[job], names=["generate"])
+    return job.doc["state"].get("global") == "ready"
+
+
+def prefetch_case_origins(jobs) -> None:
+    """Fetches the cases of all jobs which do not have a case yet into the origin
+    cache concurrently, such that fetchCase and MultiCase only copy from the
+    cache"""
+    origins = []
+    for job in jobs:
+        if (Path(job.path) / "case").exists():
+            continue
+        try:
+            if origin := case_origin(job):
+                origins.append((origin, job.path))
+        except Exception as e:
+            logger.debug(f"Cannot prefetch case of job {job.id}: {e}")
+    if origins:
+        fetched = prefetch(origins)
+        logger.info(f"Fetched {fetched} case origins")
+
+
 def is_locked(job: Job) -> bool:
     """Cases that are already started are set to tmp_lock
     dont try to execute them
     """
-    return job.doc["state"].get("global") == "tmp_lock"
+    return job_graph_of(job).state(job.id).get("global") == "tmp_lock"
 
 
 @generate
@@ -636,31 +820,58 @@ def checkMesh(job: Job, args={}):
         .decode("utf-8")
         .split()[-1]
     )
-    job.doc["cache"]["nCells"] = int(cells)
+    set_job_cache(job, "nCells", int(cells))
 
 
 def get_number_of_procs(job: Job) -> int:
     """Deduces the number of processors
     For performance reasons the cache is used to store the number of subdomains
     """
-    np = statepoint_get(job.sp(), "numberOfSubdomains")
+    np = planned_number_of_procs(job.id)
     if np:
-        return int(np)
-    np = job.doc["cache"].get("numberOfSubdomains", False)
-    if np:
-        return int(np)
-    # Reading from numberOfSubdomains from the decomposeParDict should
-    # be the last resort since it is very expensive
-    np = int(
-        OpenFOAMCase(str(job.path) + "/case", job).decomposeParDict.get(
-            "numberOfSubdomains"
-        )
-    )
+        return np
+    np = statepoint_get(job.sp(), "numberOfSubdomains")
+    if not np:
+        np = job.doc["cache"].get("numberOfSubdomains", False)
+    if not np:
+        # Reading from numberOfSubdomains from the decomposeParDict should
+        # be the last resort since it is very expensive
+        decomposeParDict = OpenFOAMCase(str(job.path) + "/case", job).decomposeParDict
+        if not isinstance(decomposeParDict, File):
+            raise ValueError(f"No decomposeParDict found in job {job.id}")
+        np = int(decomposeParDict.get("numberOfSubdomains"))
+        if np:
+            set_job_cache(job, "numberOfSubdomains", np)
+    np = int(np)
     if np:
-        job.doc["cache"]["numberOfSubdomains"] = np
+        plan_number_of_procs({job.id: np})
     return np
 
 
+def plan_resources(jobs) -> None:
+    """Resolves the number of processors of all jobs in a single sweep over the job
+    index, see `obr.core.resources`. Only the decomposeParDicts of final jobs which
+    are not resolved by the index are read."""
+    reset_planned_number_of_procs()
+    jobs = list(jobs)
+    if not jobs:
+        return
+    index = JobIndex(jobs[0].project.path)
+    index.update({job.id: job.path for job in jobs})
+    index.save()
+    resolved = resolve_number_of_procs(index, [job.id for job in jobs])
+    plan_number_of_procs(resolved)
+    with deferred_side_effects() as pending:
+        unresolved = [job for job in jobs if job.id not in resolved and final(job)]
+    pending.apply()
+    for job in unresolved:
+        try:
+            get_number_of_procs(job)
+        except Exception as e:
+            logger.debug(f"Cannot resolve number of processors of job {job.id}: {e}")
+    logger.debug(f"Resolved number of processors of {len(resolved)} jobs from index")
+
+
 def get_values(jobs: list, key: str) -> set:
     """find all different statepoint values"""
     values = [job.sp().get(key) for job in jobs if job.sp().get(key)]
@@ -686,8 +897,6 @@ def run_cmd_builder(job: Job, cmd_format: str, args: dict) -> str:
     solver = case.controlDict.get("application")
     timestamp = datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
 
-    res = job.doc["history"]
-
     cli_args = {
         "solver": solver,
         "path": job.path,
@@ -695,23 +904,20 @@ def run_cmd_builder(job: Job, cmd_format: str, args: dict) -> str:
         "np": get_number_of_procs(job),
     }
     cmd_str = cmd_format.format(**cli_args)
-    res.append({
-        "cmd": cmd_str,
-        "type": "shell",
-        "log": f"{solver}_{timestamp}.log",
-        "state": "started",
-        "timestamp": timestamp,
-        "user": os.environ.get("USER"),
-        "hostname": os.environ.get("HOST"),
-    })
-    job.doc["history"] = res
+    append_history(
+        job.doc,
+        {
+            "cmd": cmd_str,
+            "solver": solver,
+            "type": "shell",
+            "log": f"{solver}_{timestamp}.log",
+            "state": "started",
+            "timestamp": timestamp,
+            "user": os.environ.get("USER"),
+            "hostname": os.environ.get("HOST"),
+        },
+    )
 
-    cli_args = {
-        "solver": solver,
-        "path": job.path,
-        "timestamp": timestamp,
-        "np": get_number_of_procs(job),
-    }
     preflight = os.environ.get("OBR_PREFLIGHT")
     if preflight:
         preflight_cmd = f"{preflight} > {job.path}/case/preflight_{timestamp}.log && "
@@ -719,7 +925,7 @@ def run_cmd_builder(job: Job, cmd_format: str, args: dict) -> str:
 
     postflight_cmd = f" && echo $? > {job.path}/case/solverExitCode.log "
 
-    job.doc["state"]["global"] = "started"
+    set_job_state(job, "global", "started")
 
     # NOTE we add || true such that the command never fails
     # otherwise if one execution would fail OBR exits and
@@ -729,8 +935,9 @@ def run_cmd_builder(job: Job, cmd_format: str, args: dict) -> str:
 
 def validate_state_impl(_: str, job: Job) -> None:
     """Perform a detailed update of the job state"""
-    case = OpenFOAMCase(Path(job.path) / "case", job)
-    case.detailed_update()
+    with JobDocumentSession(job):
+        case = OpenFOAMCase(Path(job.path) / "case", job)
+        case.detailed_update()
 
 
 @OpenFOAMProject.pre(parent_job_is_ready)
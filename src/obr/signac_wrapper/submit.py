@@ -8,6 +8,8 @@ from tqdm import tqdm
 
 from .operations import OpenFOAMProject, basic_eligible
 from .labels import final
+from ..core.deferred import deferred_side_effects
+from ..core.label_cache import LabelCache
 from ..core.logger_setup import logger
 
 
@@ -75,16 +77,26 @@ def submit_impl(
             time.sleep(15)
     else:
         eligible_jobs = []
-        for operation in operations:
-            if operation == "runParallelSolver":
-                for job in tqdm(jobs):
-                    if final(job):
-                        eligible_jobs.append(job)
-            else:
-                logger.info(f"Collecting eligible jobs for operation: {operation}.")
-                for job in tqdm(jobs):
-                    if basic_eligible(job, operation):
-                        eligible_jobs.append(job)
+        label_cache = LabelCache(project.path)
+        with deferred_side_effects() as pending:
+            for operation in operations:
+                if operation == "runParallelSolver":
+                    for job in tqdm(jobs):
+                        if label_cache.value(job, "final", lambda: bool(final(job))):
+                            eligible_jobs.append(job)
+                else:
+                    logger.info(f"Collecting eligible jobs for operation: {operation}.")
+                    for job in tqdm(jobs):
+                        if label_cache.value(
+                            job,
+                            f"eligible:{operation}",
+                            lambda: basic_eligible(job, operation),
+                        ):
+                            eligible_jobs.append(job)
+        # initialize cases and cache mesh stats of eligible jobs concurrently
+        if applied := pending.apply():
+            logger.info(f"Initialized and updated {applied} eligible jobs")
+        label_cache.save()
 
         logger.info(
             f"Submitting operations {operations}. In total {len(eligible_jobs)} of"
@@ -0,0 +1,28 @@
+import signac
+import pytest
+
+
+@pytest.fixture
+def make_project(tmpdir):
+    """Returns a function which creates a project with a base job and child jobs
+    of the base job, jobs without document get an empty global state"""
+
+    def make(base_sp, children_sp, base_doc=None, child_doc=None):
+        project = signac.init_project(str(tmpdir))
+        base = project.open_job(base_sp).init()
+        base.doc.update(base_doc or {"state": {"global": ""}})
+        for child_sp in children_sp:
+            child = project.open_job({**child_sp, "parent_id": base.id}).init()
+            child.doc.update(child_doc or {"state": {"global": ""}})
+        return project
+
+    return make
+
+
+@pytest.fixture
+def project(make_project):
+    """A base job with two controlDict variations"""
+    return make_project(
+        {"solver": "pisoFoam", "has_child": True},
+        [{"endTime": endTime, "operation": "controlDict"} for endTime in [100, 200]],
+    )
@@ -0,0 +1,39 @@
+import pytest
+
+from obr.OpenFOAM.BlockMesh import cells_pattern, set_cells
+
+BLOCK_MESH_DICT = """
+blocks
+(
+    hex (0 1 2 3 4 5 6 7) (20 20 1) simpleGrading (1 1 1)
+    hex (8 9 10 11 12 13 14 15) ( 20  20 1 ) simpleGrading (1 1 1)
+    hex (16 17 18 19 20 21 22 23) (120 20 1) simpleGrading (1 1 1)
+);
+"""
+
+
+@pytest.fixture
+def blockMeshDict(tmp_path):
+    fn = tmp_path / "blockMeshDict"
+    fn.write_text(BLOCK_MESH_DICT)
+    return fn
+
+
+def test_cells_pattern():
+    assert len(cells_pattern("(20 20 1)").findall(BLOCK_MESH_DICT)) == 2
+    assert len(cells_pattern("20 20 1").findall(BLOCK_MESH_DICT)) == 2
+    assert cells_pattern("(2 20 1)").search(BLOCK_MESH_DICT) is None
+
+
+def test_set_cells(blockMeshDict):
+    set_cells(blockMeshDict, [("(20 20 1)", "(100 100 1)"), ("120 ", "240")])
+    content = blockMeshDict.read_text()
+    assert content.count("(100 100 1) simpleGrading") == 2
+    assert "(240 20 1)" in content
+
+
+def test_set_cells_validates_matches(blockMeshDict):
+    with pytest.raises(ValueError, match=r"\(30 30 1\)"):
+        set_cells(blockMeshDict, [("(20 20 1)", "(40 40 1)"), ("(30 30 1)", "")])
+    # nothing is written if any substitution fails
+    assert blockMeshDict.read_text() == BLOCK_MESH_DICT
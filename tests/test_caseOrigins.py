@@ -1,5 +1,8 @@
 from obr.core.caseOrigins import CaseOnDisk, OpenFOAMTutorialCase, GitRepo
+from obr.core.origin_cache import prefetch
+from subprocess import check_output
 import os
+import threading
 import pytest
 
 
@@ -31,3 +34,113 @@ def test_OpenFOAMTutorialCase_raises_if_nonexistent(tmp_path):
     assert (tmp_path / "case/constant").exists()
     assert (tmp_path / "case/system").exists()
     assert (tmp_path / "case/system/controlDict").exists()
+
+
+def test_CaseOnDisk_is_cached(tmp_path):
+    origin = tmp_path / "origin"
+    (origin / "system").mkdir(parents=True)
+    (origin / "system/controlDict").write_text("application icoFoam;")
+    cache = tmp_path / ".obr/origins"
+
+    for job in ["job0", "job1"]:
+        CaseOnDisk(origin=str(origin)).init(str(tmp_path / "workspace" / job))
+        assert (tmp_path / "workspace" / job / "case/system/controlDict").exists()
+    assert len([p for p in cache.iterdir() if p.is_dir()]) == 1
+
+    # modified cases are fetched again
+    (origin / "system/controlDict").write_text("application pisoFoam;")
+    CaseOnDisk(origin=str(origin)).init(str(tmp_path / "workspace/job2"))
+    controlDict = tmp_path / "workspace/job2/case/system/controlDict"
+    assert controlDict.read_text() == "application pisoFoam;"
+    assert len([p for p in cache.iterdir() if p.is_dir()]) == 2
+
+
+@pytest.fixture
+def git_origin(tmp_path):
+    origin = tmp_path / "origin"
+    (origin / "cases/cavity/system").mkdir(parents=True)
+    (origin / "cases/cavity/system/controlDict").write_text("v1")
+
+    def git(*args):
+        return check_output(["git", *args], cwd=origin, text=True).strip()
+
+    git("init", "-q", "-b", "main")
+    git("add", "-A")
+    git("-c", "user.name=obr", "-c", "user.email=obr@obr", "commit", "-qm", "v1")
+    first = git("rev-parse", "HEAD")
+    (origin / "cases/cavity/system/controlDict").write_text("v2")
+    git("-c", "user.name=obr", "-c", "user.email=obr@obr", "commit", "-qam", "v2")
+    return origin, first
+
+
+def test_GitRepo(tmp_path, git_origin):
+    origin, first = git_origin
+    workspace = tmp_path / "workspace"
+
+    GitRepo(url=str(origin), folder="cases/cavity").init(str(workspace / "job0"))
+    assert (workspace / "job0/case/system/controlDict").read_text() == "v2"
+
+    GitRepo(url=str(origin), folder="cases/cavity", commit=first).init(
+        str(workspace / "job1")
+    )
+    assert (workspace / "job1/case/system/controlDict").read_text() == "v1"
+
+    GitRepo(url=str(origin)).init(str(workspace / "job2"))
+    controlDict = workspace / "job2/case/cases/cavity/system/controlDict"
+    assert controlDict.read_text() == "v2"
+    assert (workspace / "job2/case/.git").exists()
+
+    # a single mirror is shared by all checkouts
+    assert len(list((tmp_path / ".obr/origins/git").glob("*.git"))) == 1
+
+
+def test_prefetch(tmp_path, git_origin):
+    origin, first = git_origin
+    origins = [
+        (GitRepo(url=str(origin), folder="cases/cavity"), tmp_path / "workspace/a"),
+        (GitRepo(url=str(origin), folder="cases/cavity"), tmp_path / "workspace/b"),
+        (GitRepo(url=str(origin), commit=first), tmp_path / "workspace/c"),
+    ]
+    assert prefetch(origins, max_workers=2) == 2
+    assert len([p for p in (tmp_path / ".obr/origins").iterdir() if p.is_dir()]) == 3
+
+
+def test_prefetch_is_concurrent_by_default(monkeypatch, tmp_path):
+    monkeypatch.delenv("OBR_IO_THREADS", raising=False)
+    barrier = threading.Barrier(2, timeout=5)
+
+    class Origin:
+        def __init__(self, name):
+            self.name = name
+
+        def cache_id(self):
+            return self.name
+
+        def fetch(self, path):
+            # both fetches have to run at the same time to pass the barrier
+            barrier.wait()
+            return path
+
+    origins = [(Origin(name), tmp_path / name) for name in ["a", "b"]]
+    assert prefetch(origins) == 2
+
+
+def test_GitRepo_cache_folder(tmp_path, git_origin):
+    origin, first = git_origin
+    workspace = tmp_path / "workspace"
+    cache_folder = tmp_path / "checkout"
+
+    # the repository is cloned into a missing cache_folder
+    GitRepo(
+        url=str(origin), folder="cases/cavity", cache_folder=str(cache_folder)
+    ).init(str(workspace / "job0"))
+    assert (cache_folder / ".git").exists()
+    assert (cache_folder / "cases/cavity/system/controlDict").read_text() == "v2"
+    assert not list(cache_folder.glob("git"))
+
+    # an existing checkout is used instead of the origin cache
+    (cache_folder / "cases/cavity/system/fvSchemes").write_text("local")
+    GitRepo(
+        url=str(origin), folder="cases/cavity", cache_folder=str(cache_folder)
+    ).init(str(workspace / "job1"))
+    assert (workspace / "job1/case/system/fvSchemes").read_text() == "local"
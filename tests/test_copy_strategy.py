@@ -0,0 +1,76 @@
+import os
+import pytest
+
+from obr.core.copy_strategy import (
+    CopyStats,
+    copy_file,
+    copy_stats,
+    copy_strategy,
+    copy_tree,
+    supports_reflink,
+)
+from obr.core.core import modifies_file
+
+
+@pytest.fixture
+def case(tmp_path):
+    src = tmp_path / "src"
+    (src / "system").mkdir(parents=True)
+    (src / "system/controlDict").write_text("application icoFoam;")
+    (src / "constant").mkdir()
+    (src / "constant/transportProperties").write_text("nu 0.01;")
+    return src
+
+
+@pytest.mark.parametrize("strategy", ["auto", "reflink", "copy"])
+def test_copy_tree(tmp_path, case, monkeypatch, strategy):
+    monkeypatch.setenv("OBR_COPY", strategy)
+    before = copy_stats()
+    stats = copy_tree(case, tmp_path / "dst")
+    assert copy_stats() - before == stats
+
+    dst_file = tmp_path / "dst/system/controlDict"
+    assert dst_file.read_text() == "application icoFoam;"
+    assert os.stat(dst_file).st_nlink == 1
+    assert stats.files == 2
+    if strategy == "copy" or not supports_reflink(tmp_path):
+        assert stats == CopyStats(2, 28, 0)
+    else:
+        assert stats == CopyStats(2, 0, 28)
+
+
+def test_hardlinks_are_broken_on_write(tmp_path, case, monkeypatch):
+    monkeypatch.setenv("OBR_COPY", "hardlink")
+    before = copy_stats()
+    copy_tree(case, tmp_path / "dst")
+    assert copy_stats() - before == CopyStats(2, 0, 28)
+
+    dst_file = tmp_path / "dst/system/controlDict"
+    assert os.stat(dst_file).st_nlink == 2
+    modifies_file(tmp_path / "dst/system")
+    assert os.stat(dst_file).st_nlink == 1
+    dst_file.write_text("application pisoFoam;")
+    assert (case / "system/controlDict").read_text() == "application icoFoam;"
+
+
+def test_cache_entries_are_not_hardlinked(tmp_path, case, monkeypatch):
+    monkeypatch.setenv("OBR_COPY", "hardlink")
+    stats = copy_tree(case, tmp_path / "dst", hardlinks=False)
+    assert os.stat(tmp_path / "dst/system/controlDict").st_nlink == 1
+    assert stats.files == 2
+    if not supports_reflink(tmp_path):
+        assert stats == CopyStats(2, 28, 0)
+
+
+def test_copy_file_replaces_existing_files(tmp_path, case, monkeypatch):
+    monkeypatch.setenv("OBR_COPY", "hardlink")
+    dst = tmp_path / "controlDict"
+    dst.write_text("foo")
+    copy_file(case / "system/controlDict", dst)
+    assert dst.read_text() == "application icoFoam;"
+
+
+def test_unknown_copy_strategy(monkeypatch):
+    monkeypatch.setenv("OBR_COPY", "rsync")
+    with pytest.raises(ValueError):
+        copy_strategy()
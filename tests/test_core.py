@@ -1,13 +1,24 @@
+import asyncio
 import obr
+import json
 import os
 import pytest
+import signac
 
 from obr.core.core import (
+    JobDocumentSession,
     get_mesh_stats,
+    logged_execute,
+    logged_execute_async,
+    update_job_document,
+    parse_foam_file_dict,
+    read_foam_header,
     TemporaryFolder,
     link_folder_to_copy,
+    link_tree,
     DelinkFolder,
 )
+from obr.core.history import JobHistory
 from pathlib import Path
 from subprocess import check_output
 
@@ -152,3 +163,120 @@ def test_DelinkFolder(tmpdir):
 
     # outside the create_unlink_dir the bck folder should not exist anymore
     assert not (tmpdir / "test.bck").exists()
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_link_tree(tmpdir, monkeypatch, max_workers):
+    monkeypatch.setattr(obr.core.core, "LINK_TREE_MIN_PARALLEL", 0)
+    base = Path(tmpdir) / "parent" / "case"
+    for fold in ["system", "constant/polyMesh", "processor0/constant", "processor0/0"]:
+        (base / fold).mkdir(parents=True)
+    (base / "processor1").symlink_to("processor0")
+    for fn in ["system/controlDict", "constant/polyMesh/points", "processor0/0/U"]:
+        (base / fn).write_text("foo")
+
+    dst = Path(tmpdir) / "child" / "case"
+    # the U files of both processor folders are copied
+    assert link_tree(base, dst, "parent", max_workers=max_workers).files == 2
+
+    # files are relative symlinks
+    assert (dst / "system/controlDict").is_symlink()
+    assert (
+        os.readlink(dst / "system/controlDict")
+        == "../../../parent/case/system/controlDict"
+    )
+    assert (dst / "constant/polyMesh/points").read_text() == "foo"
+    # processor constant folders are linked to the parent job
+    for proc in ["processor0", "processor1"]:
+        assert (
+            os.readlink(dst / proc / "constant")
+            == f"../../../parent/case/{proc}/constant"
+        )
+        # other processor folders are copied
+        assert not (dst / proc / "0").is_symlink()
+        assert not (dst / proc / "0/U").is_symlink()
+        assert (dst / proc / "0/U").read_text() == "foo"
+
+    # linking again keeps existing files
+    (dst / "system/controlDict").unlink()
+    (dst / "system/controlDict").write_text("bar")
+    link_tree(base, dst, "parent", max_workers=max_workers)
+    assert (dst / "system/controlDict").read_text() == "bar"
+
+
+def test_read_foam_header(tmpdir, create_of_default_owner, monkeypatch):
+    monkeypatch.setattr(obr.core.core, "FOAM_HEADER_SIZE", 64)
+    owner = Path(tmpdir) / "owner"
+    with open(owner, "ab") as fh:
+        fh.write(bytes(range(256)) * 1000)
+
+    header = read_foam_header(owner)
+    # the prefix is extended until the FoamFile dictionary is closed
+    assert len(header) < 2048
+    entries = parse_foam_file_dict(header)
+    assert entries["format"] == "binary"
+    assert entries["arch"] == '"LSB;label=32;scalar=64"'
+    assert entries["object"] == "owner"
+    assert get_mesh_stats(str(owner)) == {"nCells": 25228544, "nFaces": 76530828}
+
+
+def test_JobDocumentSession(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"solver": "pisoFoam"}).init()
+    job.doc["history"] = []
+    job.doc["state"] = {"global": ""}
+    doc_path = Path(job.path) / "signac_job_document.json"
+
+    def on_disk():
+        with open(doc_path) as fh:
+            return json.load(fh)
+
+    mtime = doc_path.stat().st_mtime_ns
+    with JobDocumentSession(job):
+        for _ in range(3):
+            logged_execute(["echo", "foo"], Path(job.path), job.doc)
+        with JobDocumentSession(job):
+            update_job_document(job.doc, "state", {"global": "started"})
+        # nested sessions do not write the document
+        assert doc_path.stat().st_mtime_ns == mtime
+        update_job_document(job.doc, "state", {"latestTime": 0.5})
+    assert "history" not in on_disk()
+    assert len(list(JobHistory(job.path))) == 3
+    assert on_disk()["state"] == {"global": "started", "latestTime": 0.5}
+
+    # without a session the document is written directly
+    update_job_document(job.doc, "cache", {"nCells": 100})
+    assert on_disk()["cache"] == {"nCells": 100}
+
+
+def test_logged_execute(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"solver": "pisoFoam"}).init()
+    path = Path(job.path)
+    script = "import sys; print('x' * int(sys.argv[1])); sys.exit(int(sys.argv[2]))"
+
+    # short outputs are stored in the history
+    assert logged_execute(["python", "-c", script, "10", "0"], path, job.doc) is None
+    # long outputs are streamed to a log file
+    log_path = logged_execute(["python", "-c", script, "5000", "1"], path, job.doc)
+    assert log_path.read_text() == "x" * 5000 + "\n"
+    assert logged_execute(["obr-missing-command"], path, job.doc) is None
+
+    short, long, missing = JobHistory(job.path)
+    assert (short["log"], short["state"]) == ("x" * 10 + "\n", "success")
+    assert (long["log"], long["state"]) == (log_path.name, "failure")
+    assert missing["state"] == "failure"
+    # no temporary log files are left
+    assert not list(path.glob(".obr-*"))
+
+
+def test_logged_execute_removes_log_of_interrupted_commands(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"endTime": 0}).init()
+    path = Path(job.path)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(
+            asyncio.wait_for(logged_execute_async(["sleep", "1"], path, job.doc), 0.2)
+        )
+    assert not list(path.glob(".obr-*"))
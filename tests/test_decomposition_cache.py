@@ -0,0 +1,132 @@
+import pytest
+import threading
+
+from pathlib import Path
+
+from obr.core.content_cache import ContentCache, worker_slot
+from obr.core.decomposition_cache import (
+    decomposition_cache,
+    decomposition_key,
+    populate_decomposition,
+    store_decomposition,
+)
+
+
+def make_case(path: Path, n_procs: int = 2) -> Path:
+    (path / "system").mkdir(parents=True)
+    (path / "system/controlDict").write_text("application icoFoam;")
+    (path / "system/decomposeParDict").write_text(f"numberOfSubdomains {n_procs};")
+    (path / "system/fvSolution").write_text("solvers {}")
+    (path / "constant/polyMesh").mkdir(parents=True)
+    (path / "constant/polyMesh/points").write_text("points")
+    (path / "0").mkdir()
+    (path / "0/U").write_text("U")
+    return path
+
+
+def decompose(case: Path, n_procs: int = 2):
+    """Mimics the output of decomposePar"""
+    for i in range(n_procs):
+        proc = case / f"processor{i}"
+        (proc / "constant/polyMesh").mkdir(parents=True)
+        (proc / "constant/polyMesh/points").write_text(f"points{i}")
+        (proc / "0").mkdir()
+        (proc / "0/U").write_text(f"U{i}")
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return [
+        make_case(tmp_path / "workspace" / job_id / "case")
+        for job_id in ("job1", "job2")
+    ]
+
+
+def test_decomposition_key(jobs):
+    case1, case2 = jobs
+    assert decomposition_key(case1) == decomposition_key(case2)
+
+    # settings which are irrelevant for the decomposition
+    (case2 / "system/fvSolution").write_text("solvers { p {} }")
+    assert decomposition_key(case1) == decomposition_key(case2)
+
+    (case2 / "system/decomposeParDict").write_text("numberOfSubdomains 4;")
+    assert decomposition_key(case1) != decomposition_key(case2)
+
+
+def test_decomposition_key_of_foam_version(jobs, monkeypatch):
+    case1, _ = jobs
+    key = decomposition_key(case1)
+    monkeypatch.setenv("WM_PROJECT_VERSION", "v2312")
+    assert decomposition_key(case1) != key
+
+
+def test_decomposition_key_of_symlinked_mesh(jobs):
+    case1, case2 = jobs
+    key = decomposition_key(case2)
+    for fn in (case2 / "constant/polyMesh").iterdir():
+        fn.unlink()
+    (case2 / "constant/polyMesh").rmdir()
+    (case2 / "constant/polyMesh").symlink_to(case1 / "constant/polyMesh")
+    assert decomposition_key(case2) == key
+
+
+def test_populate_decomposition(jobs):
+    case1, case2 = jobs
+    cache = decomposition_cache(case1.parent)
+    assert cache.root == case1.parents[2] / ".obr/decompositions"
+
+    calls = []
+
+    def create(entry):
+        calls.append(entry)
+        decompose(case1)
+        store_decomposition(case1, entry)
+
+    key = decomposition_key(case1)
+    entry = cache.entry(key, create)
+    populate_decomposition(entry, case1)
+    # an existing decomposition is replaced
+    decompose(case2, 4)
+    populate_decomposition(cache.entry(key, create), case2)
+
+    assert len(calls) == 1
+    for case in jobs:
+        procs = sorted(p.name for p in case.iterdir() if p.name.startswith("proc"))
+        assert procs == ["processor0", "processor1"]
+        mesh = case / "processor1/constant/polyMesh"
+        assert not mesh.is_symlink()
+        assert (mesh / "points").read_text() == "points1"
+        assert (case / "processor1/0/U").read_text() == "U1"
+        assert not (case / "processor1/0/U").is_symlink()
+
+
+def test_failed_creation_is_not_cached(tmp_path):
+    cache = ContentCache(tmp_path / "cache")
+    assert cache.entry("key", lambda entry: None) is None
+    assert cache.get("key") is None
+    assert cache.entry("key", lambda entry: entry.mkdir()) == tmp_path / "cache/key"
+
+
+def test_worker_slot(tmp_path):
+    active, peak = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(4)
+
+    def work():
+        barrier.wait()
+        with worker_slot(tmp_path, 2):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            threading.Event().wait(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(peak) == 4
+    assert max(peak) <= 2
@@ -0,0 +1,80 @@
+import signac
+import threading
+import pytest
+
+from obr.core.deferred import (
+    MESH_STATS,
+    defer,
+    deferred_side_effects,
+    is_pending,
+)
+from obr.core.job_graph import job_graph_of
+from obr.signac_wrapper.labels import final
+
+OWNER_HEADER = """FoamFile
+{
+    version     2.0;
+    format      ascii;
+    class       labelList;
+    note        "nPoints:4  nCells:10  nFaces:20  nInternalFaces:5";
+    object      owner;
+}
+"""
+
+
+@pytest.fixture
+def job(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"solver": "pisoFoam"}).init()
+    job.doc["state"] = {"global": ""}
+    job.doc["cache"] = {}
+    (tmpdir / "workspace" / job.id / "case/system").ensure(dir=True)
+    (tmpdir / "workspace" / job.id / "case/system/controlDict").write("")
+    poly_mesh = tmpdir / "workspace" / job.id / "case/constant/polyMesh"
+    poly_mesh.ensure(dir=True)
+    (poly_mesh / "owner").write(OWNER_HEADER)
+    return job
+
+
+def test_pending_work():
+    calls = []
+    assert not defer("job1", "init", lambda: calls.append("eager"))
+
+    with deferred_side_effects() as pending:
+        assert defer("job1", "init", lambda: calls.append("init1"))
+        assert defer("job1", "init", lambda: calls.append("init1 again"))
+        assert defer("job1", "stats", lambda: calls.append("stats1"))
+        assert defer("job2", "init", lambda: 1 / 0)
+        assert is_pending("job1", "init") and is_pending("job2")
+        assert not is_pending("job3")
+    assert not is_pending("job1")
+
+    assert len(pending) == 3
+    assert pending.apply() == 2
+    assert calls == ["init1", "stats1"]
+    assert len(pending) == 0
+
+
+def test_pending_work_updates_run_in_calling_thread():
+    threads = []
+
+    def task():
+        return lambda: threads.append(threading.current_thread())
+
+    with deferred_side_effects() as pending:
+        for job_id in ["job1", "job2", "job3"]:
+            defer(job_id, "init", task)
+    assert pending.apply(max_workers=3) == 3
+    assert threads == [threading.current_thread()] * 3
+
+
+def test_final_defers_mesh_stats(job):
+    with deferred_side_effects() as pending:
+        assert final(job)
+    assert pending.pending(job.id, MESH_STATS)
+    assert "nCells" not in job.doc["cache"]
+
+    assert pending.apply(max_workers=2) == 1
+    assert job.doc["cache"]["nCells"] == 10
+    assert job.doc["cache"]["nFaces"] == 20
+    assert job_graph_of(job).node(job.id).cache["nCells"] == 10
@@ -0,0 +1,35 @@
+from obr.core.dict_cache import DictCache, _is_entry_of
+
+
+def test_is_entry_of():
+    assert _is_entry_of("PISO", "PISO")
+    assert _is_entry_of("PISO/nCorrectors", "PISO")
+    assert not _is_entry_of("PISOFoam", "PISO")
+    assert not _is_entry_of("PISO_old", "PISO")
+    assert not _is_entry_of("endTime", "PISO")
+
+
+def test_dict_cache():
+    cache = DictCache()
+    key = (1, 100, 10)
+    values = cache.values("controlDict", key)
+    values["endTime"] = 10
+    values["writeFormat"] = "ascii"
+    assert cache.values("controlDict", key) == {"endTime": 10, "writeFormat": "ascii"}
+    # a changed stat key invalidates the values
+    assert cache.values("controlDict", (1, 100, 11)) == {}
+
+
+def test_dict_cache_written_with_unchanged_stat_key():
+    """A same size write within the same tick of a coarse modification time does not
+    change the stat key"""
+    cache = DictCache()
+    key = (1, 100, 10)
+    values = cache.values("controlDict", key)
+    values.update({"endTime": 10, "writeFormat": "ascii", "PISO/nCorrectors": 2})
+
+    cache.written("controlDict", key, values, {"endTime": 20, "PISO": {}})
+    assert cache.values("controlDict", key) == {"endTime": 20, "writeFormat": "ascii"}
+
+    cache.written("controlDict", key, values, {"writeFormat": "binary"})
+    assert "writeFormat" not in cache.values("controlDict", key)
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import pytest
+
+from subprocess import check_output
+
+from obr.core.file_hash import HashCache, digest_algorithm, stat_key
+
+
+@pytest.fixture
+def case_file(tmpdir):
+    fn = tmpdir / "controlDict"
+    fn.write("application pisoFoam;\n")
+    return fn
+
+
+def test_md5_matches_md5sum(case_file):
+    digest = HashCache().digest(case_file, "md5")
+    assert digest == check_output(["md5sum", str(case_file)], text=True).split()[0]
+    assert digest_algorithm(digest) == "md5"
+
+
+def test_crc32_is_prefixed(case_file):
+    digest = HashCache().digest(case_file, "crc32")
+    assert digest.startswith("crc32:")
+    assert digest_algorithm(digest) == "crc32"
+    assert digest != HashCache().digest(case_file, "md5")
+
+
+def test_unchanged_files_are_not_read(case_file, monkeypatch):
+    cache = HashCache()
+    digest = cache.digest(case_file, "md5")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file should not be read")
+
+    monkeypatch.setattr("builtins.open", fail)
+    assert cache.digest(case_file, "md5") == digest
+    monkeypatch.undo()
+
+    case_file.write("application icoFoam;\n")
+    # ensure a different modification time on file systems with coarse timestamps
+    stat = os.stat(case_file)
+    os.utime(case_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    new_digest = cache.digest(case_file, "md5")
+    assert new_digest == hashlib.md5(b"application icoFoam;\n").hexdigest()
+    assert cache.digests[(str(case_file), "md5")][0] == stat_key(case_file)
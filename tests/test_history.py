@@ -0,0 +1,86 @@
+import signac
+
+from obr.core.core import append_history
+from obr.core.history import (
+    JobHistory,
+    job_history,
+    latest_job_history,
+    record_time,
+)
+from obr.core.job_index import read_job_files
+from obr.core.queries import Query, query_impl
+
+
+def test_JobHistory(tmpdir):
+    history = JobHistory(tmpdir)
+    assert list(history) == []
+    assert history.latest("blockMesh") is None
+
+    history.append([
+        {"cmd": "blockMesh", "state": "failure"},
+        {"cmd": "mpirun -np 2 pisoFoam", "solver": "pisoFoam", "log": "a.log"},
+    ])
+    history.append([{"cmd": "blockMesh", "state": "success"}])
+    # an incomplete record of a concurrent writer is skipped
+    with open(history.path, "a") as fh:
+        fh.write('{"cmd": "decomp')
+
+    assert [record["cmd"] for record in history] == [
+        "blockMesh",
+        "mpirun -np 2 pisoFoam",
+        "blockMesh",
+    ]
+    assert history.latest("blockMesh")["state"] == "success"
+    assert history.latest("pisoFoam")["log"] == "a.log"
+
+
+def test_history_migration(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"solver": "pisoFoam"}).init()
+    job.doc["history"] = [{"cmd": "blockMesh", "state": "failure"}]
+    # histories of earlier versions are read from the job document
+    assert latest_job_history(job)["blockMesh"]["state"] == "failure"
+
+    append_history(job.doc, {"cmd": "blockMesh", "state": "success"})
+    assert "history" not in job.doc
+    assert [record["state"] for record in job_history(job)] == ["failure", "success"]
+    assert latest_job_history(job)["blockMesh"]["state"] == "success"
+
+    # the latest records are part of the queryable job document
+    _, _, doc = read_job_files(job.path)
+    assert doc["history"][-1]["state"] == "success"
+
+
+def test_query_latest_history(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"solver": "pisoFoam"}).init()
+    append_history(job.doc, {"cmd": "blockMesh", "state": "success", "log": "a.log"})
+    append_history(job.doc, {"cmd": "decomposePar", "state": "failure", "log": "b.log"})
+    assert query_impl([job], [Query(key="log")])[job.id] == {"log": "b.log"}
+
+    # a re-run command becomes the latest record
+    append_history(job.doc, {"cmd": "blockMesh", "state": "success", "log": "c.log"})
+    assert list(JobHistory(job.path).index()) == ["decomposePar", "blockMesh"]
+    assert query_impl([job], [Query(key="log")])[job.id] == {"log": "c.log"}
+    assert query_impl([job], [Query(key="state", value="success")])
+
+
+def test_query_all_history_records(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"solver": "pisoFoam"}).init()
+    append_history(job.doc, {"cmd": "blockMesh", "state": "failure", "log": "a.log"})
+    append_history(job.doc, {"cmd": "decomposePar", "state": "success", "log": "b.log"})
+    append_history(job.doc, {"cmd": "blockMesh", "state": "success", "log": "c.log"})
+
+    # the history list of a query holds the latest record of every command only,
+    # earlier runs of a command are streamed via job_history
+    res = query_impl([job], [Query(key="history")], latest_only=False)
+    assert [record["log"] for record in res[job.id]["history"]] == ["b.log", "c.log"]
+    assert [record["log"] for record in job_history(job)] == ["a.log", "b.log", "c.log"]
+
+
+def test_record_time():
+    assert record_time({"timestamp": "2024-03-03_10:00:00"}) < record_time(
+        {"timestamp": "2024-03-03 10:00:01.5"}
+    )
+    assert record_time({}) < record_time({"timestamp": "2024-03-03_10:00:00"})
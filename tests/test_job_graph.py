@@ -0,0 +1,60 @@
+from obr.core.job_graph import (
+    JobGraph,
+    get_job_graph,
+    set_job_cache,
+    set_job_state,
+    update_job_state,
+)
+
+
+def test_job_graph_relations(project):
+    graph = JobGraph(project.workspace)
+    base = next(j for j in project if not j.sp.get("parent_id"))
+    children = [j for j in project if j.sp.get("parent_id")]
+
+    assert sorted(graph.children(base.id)) == sorted(j.id for j in children)
+    assert graph.node(base.id).has_child
+    for child in children:
+        assert graph.parent(child.id) is graph.node(base.id)
+        assert graph.node(child.id).operation == "controlDict"
+    assert graph.parent(base.id) is None
+
+
+def test_job_graph_state_updates(project):
+    graph = get_job_graph(project.workspace)
+    base = next(j for j in project if not j.sp.get("parent_id"))
+    child = next(j for j in project if j.sp.get("parent_id"))
+
+    set_job_state(base, "global", "ready")
+    assert graph.state(base.id)["global"] == "ready"
+    assert base.doc["state"]["global"] == "ready"
+
+    # changes from other processes are picked up on refresh
+    child.doc["state"]["global"] = "tmp_lock"
+    assert graph.state(child.id)["global"] == ""
+    assert graph.refresh() >= 1
+    assert graph.state(child.id)["global"] == "tmp_lock"
+    assert graph.refresh() == 0
+
+
+def test_state_writes_are_visible_to_eligibility_checks(project):
+    graph = get_job_graph(project.workspace)
+    base = next(j for j in project if not j.sp.get("parent_id"))
+    child = next(j for j in project if j.sp.get("parent_id"))
+    # the children are eligible once their parent is ready
+    assert graph.parent(child.id).state.get("global") == ""
+
+    # ie. by OpenFOAMCase.reset_case, without a refresh of the graph
+    set_job_state(base, "global", "ready")
+    assert graph.parent(child.id).state["global"] == "ready"
+
+    # ie. by process_latest_time_stats
+    update_job_state(base, {"global": "failure", "failureState": "FOAM ERROR"})
+    assert graph.parent(child.id).state["global"] == "failure"
+    assert base.doc["state"]["failureState"] == "FOAM ERROR"
+
+    # ie. by checkMesh
+    set_job_cache(child, "nCells", 100)
+    assert graph.node(child.id).cache["nCells"] == 100
+    assert graph.refresh() >= 1
+    assert graph.node(child.id).cache["nCells"] == 100
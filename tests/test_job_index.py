@@ -0,0 +1,80 @@
+import pytest
+
+from obr.core.job_index import (
+    JobIndex,
+    default_io_threads,
+    default_worker_threads,
+    flatten_dict,
+    unflatten_dict,
+)
+from obr.core.queries import flatten_jobs
+
+
+@pytest.fixture
+def project(make_project):
+    return make_project(
+        {"solver": "pisoFoam", "parent": {}},
+        [{"endTime": 100, "parent": {"solver": "pisoFoam", "parent": {}}}],
+        base_doc={"state": {"global": "ready"}, "cache": {}},
+        child_doc={"state": {"global": ""}, "history": [{"cmd": "blockMesh"}]},
+    )
+
+
+def test_flatten_dict():
+    d = {"a": 1, "parent": {"b": [1, 2], "parent": {"c": "d", "parent": {}}}}
+    flat = flatten_dict(d)
+    assert flat == {
+        "a": 1,
+        "parent.b": [1, 2],
+        "parent.parent.c": "d",
+        "parent.parent.parent": {},
+    }
+    assert unflatten_dict(flat.items()) == d
+
+
+def test_index_matches_job_files(project):
+    flat_jobs = flatten_jobs(project)
+    for job in project:
+        expected = dict(job.doc.items())
+        expected.update(job.sp())
+        assert flat_jobs[job.id] == expected
+
+    index = JobIndex(project.path)
+    assert index.path.exists()
+    assert set(index.column("parent.solver").values()) == {"pisoFoam"}
+
+
+def test_index_is_updated_on_change(project):
+    flatten_jobs(project)
+    job = next(j for j in project if j.sp.get("parent_id"))
+    job.doc["state"] = {"global": "ready"}
+
+    index = JobIndex(project.path)
+    job_paths = {j.id: j.path for j in project}
+    assert index.update(job_paths) == 1
+    assert index.flat_job(job.id)["state"] == {"global": "ready"}
+    assert index.update(job_paths) == 0
+
+
+def test_index_prunes_removed_jobs(project):
+    flatten_jobs(project)
+    job = next(j for j in project if j.sp.get("parent_id"))
+    job.remove()
+
+    flat_jobs = flatten_jobs(project)
+    assert job.id not in flat_jobs
+    assert job.id not in JobIndex(project.path).rows
+
+
+def test_default_io_threads(monkeypatch):
+    monkeypatch.delenv("OBR_IO_THREADS", raising=False)
+    assert default_io_threads() == 1
+    monkeypatch.setenv("OBR_IO_THREADS", "8")
+    assert default_io_threads() == 8
+
+
+def test_default_worker_threads(monkeypatch):
+    monkeypatch.delenv("OBR_IO_THREADS", raising=False)
+    assert default_worker_threads() > 1
+    monkeypatch.setenv("OBR_IO_THREADS", "1")
+    assert default_worker_threads() == 1
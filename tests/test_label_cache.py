@@ -0,0 +1,70 @@
+from obr.core.deferred import INITIALIZE, MESH_STATS, defer, deferred_side_effects
+from obr.core.label_cache import LabelCache
+
+
+def jobs_of(project):
+    base = next(j for j in project if not j.sp.get("parent_id"))
+    child = next(j for j in project if j.sp.get("parent_id"))
+    return base, child
+
+
+def test_label_cache_hit(project):
+    _, child = jobs_of(project)
+    calls = []
+
+    def evaluate():
+        calls.append(child.id)
+        return ["ready"]
+
+    cache = LabelCache(project.path)
+    assert cache.value(child, "labels", evaluate) == ["ready"]
+    assert cache.value(child, "labels", evaluate) == ["ready"]
+    cache.save()
+
+    cache = LabelCache(project.path)
+    assert cache.value(child, "labels", evaluate) == ["ready"]
+    assert calls == [child.id]
+
+
+def test_label_cache_invalidation(project):
+    base, child = jobs_of(project)
+    calls = []
+
+    def evaluate():
+        calls.append(child.id)
+        return child.doc["state"]["global"] + base.doc["state"]["global"]
+
+    cache = LabelCache(project.path)
+    assert cache.value(child, "eligible", evaluate) == ""
+
+    child.doc["state"] = {"global": "completed"}
+    assert cache.value(child, "eligible", evaluate) == "completed"
+
+    base.doc["state"] = {"global": "ready"}
+    assert cache.value(child, "eligible", evaluate) == "completedready"
+    assert cache.value(child, "eligible", evaluate) == "completedready"
+    assert len(calls) == 3
+
+    cache.prune([base.id])
+    assert cache.entries == {}
+
+
+def test_label_cache_with_deferred_work(project):
+    base, child = jobs_of(project)
+    calls = []
+
+    def evaluate(job, name):
+        def labels():
+            calls.append(job.id)
+            defer(job.id, name, lambda: None)
+            return ["final"]
+
+        return labels
+
+    cache = LabelCache(project.path)
+    for _ in range(2):
+        with deferred_side_effects():
+            cache.value(child, "labels", evaluate(child, MESH_STATS))
+            cache.value(base, "labels", evaluate(base, INITIALIZE))
+    # pending mesh stats do not change the labels, a pending initialization does
+    assert calls == [child.id, base.id, base.id]
@@ -0,0 +1,133 @@
+import shutil
+import pytest
+
+from pathlib import Path
+
+import obr.OpenFOAM.log_tail
+from obr.OpenFOAM.log_tail import SolverLogTail
+
+LOGS = Path(__file__).parent / "logs"
+
+
+@pytest.mark.parametrize(
+    "log,time,completed,failed",
+    [
+        ("icoFoamIncomplete.log", 0.485, False, False),
+        ("icoFoamFailure.log", 8.5, False, True),
+        ("icoFoamSuccess.log", 0.5, True, False),
+        ("icoFoamStartupFailure.log", None, False, False),
+    ],
+)
+def test_log_tail(log, time, completed, failed):
+    tail = SolverLogTail()
+    assert tail.update(LOGS / log)
+    assert tail.time == time
+    assert tail.completed == completed
+    assert ("ERROR" in tail.footer_content) == failed
+
+
+def test_log_tail_reads_appended_lines_only(tmpdir):
+    log = Path(tmpdir) / "icoFoam.log"
+    lines = (LOGS / "icoFoamSuccess.log").read_text().splitlines(keepends=True)
+    end_of_step = lines.index("Time = 0.25\n")
+    log.write_text("".join(lines[:end_of_step]) + "Time = 0.2")
+
+    tail = SolverLogTail()
+    tail.update(log)
+    # the incomplete last line is not parsed yet
+    assert tail.time == 0.245
+    offset = tail.offset
+
+    state = tail.to_dict()
+    with open(log, "a") as fh:
+        fh.write("5\n" + "".join(lines[end_of_step + 1 :]))
+
+    tail = SolverLogTail.from_dict(state)
+    tail.update(log)
+    assert tail.offset > offset
+    assert tail.time == 0.5
+    assert tail.completed
+    assert tail.execution_time == {"ExecutionTime": 0.05, "ClockTime": 0}
+    assert not tail.update(log)
+
+
+def test_log_tail_detects_replaced_log(tmpdir):
+    log = Path(tmpdir) / "icoFoam.log"
+    shutil.copyfile(LOGS / "icoFoamFailure.log", log)
+    tail = SolverLogTail()
+    tail.update(log)
+    assert tail.time == 8.5
+
+    shutil.copyfile(LOGS / "icoFoamSuccess.log", log)
+    tail.update(log)
+    assert tail.time == 0.5
+    assert tail.completed
+
+
+def test_log_tail_of_large_log_starts_at_last_time_steps(monkeypatch):
+    monkeypatch.setattr(obr.OpenFOAM.log_tail, "TAIL_SEEK_SIZE", 100)
+    monkeypatch.setattr(obr.OpenFOAM.log_tail, "READ_CHUNK_SIZE", 100)
+    tail = SolverLogTail()
+    tail.update(LOGS / "icoFoamSuccess.log")
+    assert tail.time == 0.5
+    assert tail.completed
+    assert tail.continuity_errors["cumulative"] == 1.0402e-18
+
+
+def parse_full_log(lines: list[str]) -> dict:
+    """Job state of a log following the rules applied to the latest time step and
+    footer of a fully parsed log"""
+    footer = "\n".join(lines)
+    if "There are not enough slots available" in footer:
+        return {"global": "failure", "failureState": "MPI startup error"}
+    state = {}
+    ends = [i for i, line in enumerate(lines) if line.startswith("ExecutionTime")]
+    if ends:
+        footer = "\n".join(lines[ends[-1] + 1 :])
+    if "ERROR" in footer:
+        state["failureState"] = "FOAM ERROR"
+    if not ends:
+        state["global"] = "failure"
+        return state
+    times = [line for line in lines[: ends[-1]] if line.startswith("Time = ")]
+    state["latestTime"] = float(times[-1].split()[-1])
+    completed = "End" in [line.strip() for line in lines[ends[-1] + 1 :]]
+    state["global"] = "completed" if completed else "incomplete"
+    return state
+
+
+@pytest.mark.parametrize(
+    "log", ["icoFoamSuccess.log", "icoFoamFailure.log", "icoFoamStartupFailure.log"]
+)
+def test_log_tail_job_state_of_truncated_logs(tmpdir, log):
+    log_path = Path(tmpdir) / log
+    lines = (LOGS / log).read_text().splitlines()
+    for end in range(0, len(lines) + 1, 3):
+        log_path.write_text("".join(line + "\n" for line in lines[:end]))
+        tail = SolverLogTail()
+        tail.update(log_path)
+        state, _ = tail.job_state()
+        expected = parse_full_log(lines[:end])
+        assert {k: state.get(k) for k in expected} == expected, end
+        assert state.keys() <= expected.keys() | {
+            "continuityErrors",
+            "CourantNumber",
+            "ExecutionTime",
+            "ClockTime",
+        }
+
+
+def test_log_tail_keeps_statistics_of_completed_time_step(tmpdir):
+    log = Path(tmpdir) / "icoFoam.log"
+    lines = (LOGS / "icoFoamSuccess.log").read_text().splitlines(keepends=True)
+    # crash after the Courant number of time step 0.25 has been written
+    end = lines.index("Time = 0.25\n") + 3
+    log.write_text("".join(lines[:end]))
+
+    tail = SolverLogTail()
+    tail.update(log)
+    assert tail.time == 0.245
+    assert tail.courant_number == {"mean": 0.222146, "max": 0.852129}
+    assert tail.step["time"] == 0.25
+    assert tail.job_state()[0]["global"] == "incomplete"
+    assert len(tail.to_dict()["footer"]) <= obr.OpenFOAM.log_tail.FOOTER_MAX_LINES
@@ -0,0 +1,91 @@
+import json
+
+from pathlib import Path
+
+from obr.core.history import JobHistory
+from obr.core.merge import merge_job_folder, merge_job_folders
+
+
+def write_json(path: Path, d: dict):
+    with open(path, "w") as fh:
+        json.dump(d, fh)
+
+
+def record(cmd: str, timestamp: str, state="success") -> dict:
+    return {"cmd": cmd, "timestamp": timestamp, "state": state}
+
+
+def create_archived_job(path: Path):
+    path.mkdir(parents=True)
+    write_json(
+        path / "signac_job_document_a.json",
+        {
+            "data": [{"run": 1, "timestamp": "2024-01-01_10:00:00"}],
+            "history": [
+                record("blockMesh", "2024-01-01_09:00:00"),
+                record("pisoFoam", "2024-01-01_10:00:00", "failure"),
+            ],
+            "cache": {"nCells": 100, "numberOfSubdomains": 2},
+            "state": {"global": "failure"},
+        },
+    )
+    # a later archival of the same job holds the earlier records again
+    write_json(
+        path / "signac_job_document_b.json",
+        {
+            "data": [
+                {"run": 1, "timestamp": "2024-01-01_10:00:00"},
+                {"run": 2, "timestamp": "2024-01-02_10:00:00"},
+            ],
+            "cache": {"numberOfSubdomains": 4},
+            "state": {"global": "completed"},
+        },
+    )
+    with open(path / "obr_history_b.jsonl", "w") as fh:
+        for r in [
+            record("blockMesh", "2024-01-01_09:00:00"),
+            record("pisoFoam", "2024-01-01_10:00:00", "failure"),
+            record("pisoFoam", "2024-01-02_10:00:00"),
+        ]:
+            fh.write(json.dumps(r) + "\n")
+
+
+def test_merge_job_folder(tmpdir):
+    job_path = Path(tmpdir) / "workspace" / "job"
+    create_archived_job(job_path)
+
+    stats = merge_job_folder(job_path)
+    assert stats.sources == 3
+    assert stats.data == 2
+    assert stats.history == 3
+    assert stats.duplicates == 3
+
+    with open(job_path / "signac_job_document.json") as fh:
+        doc = json.load(fh)
+    assert [d["run"] for d in doc["data"]] == [1, 2]
+    # the document with the latest records takes precedence
+    assert doc["cache"] == {"nCells": 100, "numberOfSubdomains": 4}
+    assert doc["state"] == {"global": "completed"}
+    assert "history" not in doc
+
+    history = JobHistory(job_path)
+    assert [r["timestamp"][:10] for r in history] == [
+        "2024-01-01",
+        "2024-01-01",
+        "2024-01-02",
+    ]
+    assert history.latest("pisoFoam")["state"] == "success"
+
+    # merging is idempotent
+    merge_job_folder(job_path)
+    assert len(list(history)) == 3
+    with open(job_path / "signac_job_document.json") as fh:
+        assert json.load(fh) == doc
+
+
+def test_merge_job_folders(tmpdir):
+    job_paths = [Path(tmpdir) / "workspace" / f"job{i}" for i in range(3)]
+    for job_path in job_paths:
+        create_archived_job(job_path)
+    stats = merge_job_folders(job_paths, max_workers=2)
+    assert [s.history for s in stats] == [3, 3, 3]
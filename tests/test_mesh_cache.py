@@ -0,0 +1,118 @@
+import pytest
+
+from pathlib import Path
+
+import obr.core.copy_strategy
+from obr.core.mesh_cache import cached_mesh, mesh_cache, mesh_key
+
+MESH_FILES = ["boundary", "faces", "neighbour", "owner", "points"]
+
+
+def make_case(path: Path, cells: str = "(10 10 1)") -> Path:
+    (path / "system").mkdir(parents=True)
+    (path / "system/blockMeshDict").write_text(f"blocks (hex (0 1 2 3) {cells});")
+    (path / "system/fvSolution").write_text("solvers {}")
+    (path / "constant/polyMesh").mkdir(parents=True)
+    return path
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return [
+        make_case(tmp_path / "workspace" / job_id / "case")
+        for job_id in ("job1", "job2", "job3")
+    ]
+
+
+def mesher(case: Path, calls: list):
+    def generate() -> bool:
+        calls.append(case)
+        cells = (case / "system/blockMeshDict").read_text()
+        for fn in MESH_FILES:
+            (case / "constant/polyMesh" / fn).write_text(f"{fn} {cells}")
+        return True
+
+    return generate
+
+
+def block_mesh(case: Path, calls: list):
+    key = mesh_key("blockMesh", case, [case / "system/blockMeshDict"])
+    return cached_mesh(
+        case.parent, key, case / "constant/polyMesh", mesher(case, calls)
+    )
+
+
+def test_mesh_key(jobs, monkeypatch):
+    case1, case2, _ = jobs
+
+    def inputs(case):
+        return [case / "system/blockMeshDict"]
+
+    key = mesh_key("blockMesh", case1, inputs(case1))
+    assert key == mesh_key("blockMesh", case2, inputs(case2))
+    assert key != mesh_key("refineMesh", case1, inputs(case1))
+
+    # meshes written with other controlDict settings
+    binary = {"writeFormat": "binary"}
+    assert key != mesh_key("blockMesh", case1, inputs(case1), binary)
+    assert mesh_key("blockMesh", case1, inputs(case1), binary) == mesh_key(
+        "blockMesh", case2, inputs(case2), binary
+    )
+
+    monkeypatch.setenv("WM_PROJECT_VERSION", "v2312")
+    assert key != mesh_key("blockMesh", case1, inputs(case1))
+
+
+def test_cached_mesh(jobs):
+    case1, case2, case3 = jobs
+    (case3 / "system/blockMeshDict").write_text("blocks (hex (0 1 2 3) (20 20 1));")
+    # stale files are replaced, other files are kept
+    (case2 / "constant/polyMesh/points").symlink_to(case3 / "system/fvSolution")
+    (case2 / "constant/polyMesh/cellZones").write_text("cellZones")
+    calls = []
+
+    assert block_mesh(case1, calls) is None
+    entry = block_mesh(case2, calls)
+    assert block_mesh(case3, calls) is None
+
+    assert calls == [case1, case3]
+    assert entry.parent == mesh_cache(case1.parent).root
+    for fn in MESH_FILES:
+        mesh_file = case2 / "constant/polyMesh" / fn
+        assert not mesh_file.is_symlink()
+        assert mesh_file.read_text() == (case1 / "constant/polyMesh" / fn).read_text()
+    assert (case2 / "constant/polyMesh/cellZones").read_text() == "cellZones"
+    assert (case3 / "constant/polyMesh/points").read_text().endswith("(20 20 1));")
+
+
+def test_failed_mesh_is_not_cached(jobs):
+    case1, case2, _ = jobs
+    calls = []
+    key = mesh_key("blockMesh", case1, [case1 / "system/blockMeshDict"])
+    poly_mesh = case1 / "constant/polyMesh"
+
+    assert cached_mesh(case1.parent, key, poly_mesh, lambda: False) is None
+    assert block_mesh(case2, calls) is None
+    assert calls == [case2]
+
+
+@pytest.mark.parametrize("strategy", ["auto", "hardlink"])
+def test_cached_mesh_is_reflinked(jobs, monkeypatch, strategy):
+    case1, case2, _ = jobs
+    reflinked = []
+
+    def reflink(src, dst):
+        reflinked.append(Path(dst))
+        Path(dst).write_bytes(Path(src).read_bytes())
+
+    monkeypatch.setenv("OBR_COPY", strategy)
+    monkeypatch.setattr(obr.core.copy_strategy, "supports_reflink", lambda _: True)
+    monkeypatch.setattr(obr.core.copy_strategy, "_reflink", reflink)
+    calls = []
+    block_mesh(case1, calls)
+    assert block_mesh(case2, calls)
+
+    for fn in MESH_FILES:
+        mesh_file = case2 / "constant/polyMesh" / fn
+        assert mesh_file in reflinked
+        assert mesh_file.stat().st_nlink == 1
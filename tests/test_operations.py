@@ -1,5 +1,12 @@
-from obr.signac_wrapper.operations import _link_path
-
+from obr.signac_wrapper.operations import (
+    _link_path,
+    dispatch_pre_hooks,
+    set_failure,
+)
+from obr.core.core import append_history, job_document_session
+from obr.core.history import JobHistory
+
+import signac
 from subprocess import check_output
 from pathlib import Path
 
@@ -23,3 +30,22 @@ def test_link_path(tmpdir):
 
     dst_fold = dst / "fold1"
     assert dst_fold.exists() == True
+
+
+def test_operation_hooks_write_before_the_operation(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    job = project.open_job({"operation": "controlDict"}).init()
+    job.doc["state"] = {}
+
+    dispatch_pre_hooks("controlDict", job)
+    # the operation runs without an open session and sees the current state
+    assert job_document_session(job.doc) is None
+    assert job.doc["state"]["global"] == "started"
+
+    # records of the operation are written immediately, ie. by logged_execute,
+    # thus they are kept if the operation is interrupted
+    append_history(job.doc, {"cmd": "pisoFoam", "state": "failure"})
+    assert [record["cmd"] for record in JobHistory(job.path)] == ["pisoFoam"]
+
+    set_failure("controlDict", RuntimeError("interrupted"), job)
+    assert job.doc["state"]["global"] == "failure"
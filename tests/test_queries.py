@@ -6,6 +6,9 @@ from obr.core.queries import (
     query_to_dataframe,
     filter_jobs,
     Query,
+    QueryMatcher,
+    vectorized_query_flat_jobs,
+    build_filter_query,
 )
 from obr.signac_wrapper.operations import OpenFOAMProject
 from obr.create_tree import create_tree
@@ -107,6 +110,43 @@ def test_nested_results_with_lists(mock_job_dict):
     assert executed_query.sub_keys == [34567, "obr", "postProcessing", "machine_name"]
 
 
+def test_query_matcher(mock_job_dict):
+    queries = [Query(key="preconditioner", value="IC")]
+    matcher = QueryMatcher(queries)
+    res = matcher.query(mock_job_dict)
+    assert [r.id for r in res] == [12345, 23456]
+    assert res[1].sub_keys == [["obr"]]
+
+    # matchers are reusable
+    assert [r.id for r in matcher.query(mock_job_dict)] == [12345, 23456]
+
+    queries = [Query(key="time", value="2", predicate="gt")]
+    res = QueryMatcher(queries).query(mock_job_dict)
+    assert res[0].result == [{"time": 3.0}]
+    assert res[0].sub_keys == [["obr", "postProcessing", "machine_name"]]
+
+    queries = [Query(key="logFiles"), Query(key="preconditioner", negate=True)]
+    res = QueryMatcher(queries, latest_only=False).query(mock_job_dict)
+    assert [r.id for r in res] == [34567]
+    assert res[0].result == [{"logFiles": ["foo", "bar", "baz"]}]
+
+    res = QueryMatcher(queries, strict=True).query(mock_job_dict)
+    assert res == []
+
+
+def test_vectorized_query_flat_jobs(mock_job_dict):
+    for filters in [["preconditioner==IC"], ["time>2"], ["time>=1", "logFiles"]]:
+        queries = build_filter_query(filters)
+        expected = [
+            {**r.result[0], "jobid": r.id}
+            for r in QueryMatcher(queries).query(mock_job_dict)
+        ]
+        assert vectorized_query_flat_jobs(mock_job_dict, queries) == expected
+
+    queries = build_filter_query(["time>2", "preconditioner"])
+    assert vectorized_query_flat_jobs(mock_job_dict, queries, strict=True) == []
+
+
 @pytest.fixture()
 def get_project(tmpdir):
     config = {
@@ -163,3 +203,10 @@ def test_predicates(get_project):
     queries_str = "{key: 'maxIter', value: '3100', predicate:'leq'}"
     jobs = filter_jobs(p, queries_str)
     assert jobs[0].sp.get("post_build")[2].get("fvSolution").get("maxIter") == 3000
+
+
+def test_vectorized_query_to_dataframe(get_project):
+    queries = build_filter_query(["maxIter>=2900", "solver"])
+    df = query_to_dataframe(get_project, queries)
+    df_vectorized = query_to_dataframe(get_project, queries, vectorized=True)
+    pd.testing.assert_frame_equal(df, df_vectorized)
@@ -0,0 +1,60 @@
+import signac
+import pytest
+
+from obr.core.job_index import JobIndex
+from obr.core.queries import statepoint_get
+from obr.core.resources import (
+    plan_number_of_procs,
+    planned_number_of_procs,
+    reset_planned_number_of_procs,
+    resolve_number_of_procs,
+)
+
+
+@pytest.fixture
+def project(make_project):
+    project = make_project(
+        {"solver": "pisoFoam", "parent": {}},
+        [{"numberOfSubdomains": 4, "parent": {"solver": "pisoFoam", "parent": {}}}],
+    )
+    decomposed = next(job for job in project if job.sp.get("parent_id"))
+    # inherits the number of subdomains of its parent
+    project.open_job({
+        "endTime": 100,
+        "parent_id": decomposed.id,
+        "parent": decomposed.sp(),
+    }).init()
+    cached = project.open_job({"solver": "icoFoam", "parent": {}}).init()
+    cached.doc["cache"] = {"numberOfSubdomains": 8}
+    return project
+
+
+def test_resolve_number_of_procs(project):
+    index = JobIndex(project.path)
+    index.update({job.id: job.path for job in project})
+    resolved = resolve_number_of_procs(index, [job.id for job in project])
+
+    for job in project:
+        expected = statepoint_get(job.sp(), "numberOfSubdomains")
+        expected = expected or job.doc.get("cache", {}).get("numberOfSubdomains")
+        assert resolved.get(job.id) == expected
+    assert sorted(resolved.values()) == [4, 4, 8]
+
+
+def test_resolve_number_of_procs_of_grandparents(tmpdir):
+    project = signac.init_project(str(tmpdir))
+    decomposed = {"numberOfSubdomains": 4, "parent": {}}
+    refined = {"endTime": 100, "parent": decomposed}
+    job = project.open_job({"solver": "pisoFoam", "parent": refined}).init()
+    # the index has no parent.numberOfSubdomains column
+    index = JobIndex(project.path)
+    index.update({job.id: job.path})
+    assert resolve_number_of_procs(index, [job.id]) == {job.id: 4}
+
+
+def test_plan_number_of_procs():
+    plan_number_of_procs({"a": 2})
+    assert planned_number_of_procs("a") == 2
+    assert planned_number_of_procs("b") is None
+    reset_planned_number_of_procs()
+    assert planned_number_of_procs("a") is None
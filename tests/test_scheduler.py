@@ -0,0 +1,74 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from obr.core.scheduler import drop_blocked, run_topological
+
+# base -> a -> a1, a2
+#      -> b -> b1
+PARENTS = {
+    "base": None,
+    "a": "base",
+    "b": "base",
+    "a1": "a",
+    "a2": "a",
+    "b1": "b",
+}
+
+
+def test_run_topological_order():
+    finished, lock = [], threading.Lock()
+
+    def run(job_id):
+        assert PARENTS[job_id] is None or PARENTS[job_id] in finished
+        time.sleep(0.05 if job_id == "a" else 0.01)
+        with lock:
+            finished.append(job_id)
+        return True
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        stats = run_topological(PARENTS, run, executor)
+
+    assert sorted(finished) == sorted(PARENTS)
+    # b1 does not wait for the slower sibling a of its parent
+    assert finished.index("b1") < finished.index("a")
+    assert {d: layer.jobs for d, layer in stats.layers.items()} == {0: 1, 1: 2, 2: 3}
+    assert stats.critical_path[:2] == ["base", "a"]
+    assert stats.critical_path_time >= 0.06
+    assert stats.layers[2].throughput > 0
+
+
+def test_run_topological_skips_done_and_failed():
+    started = []
+
+    def run(job_id):
+        started.append(job_id)
+        return job_id != "a"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stats = run_topological(PARENTS, run, executor, done=["base"])
+
+    assert sorted(started) == ["a", "b", "b1"]
+    assert stats.skipped == 2
+    assert stats.layers[1].failed == 1
+    assert "layer 1: 2 jobs (1 failed)" in stats.report()[0]
+
+
+def test_drop_blocked():
+    # neither base nor a are selected, base is ready and a is not
+    parents = {k: v for k, v in PARENTS.items() if k not in ["base", "a"]}
+    dropped = drop_blocked(parents, lambda job_id: job_id == "base")
+    assert sorted(dropped) == ["a1", "a2"]
+    assert sorted(parents) == ["b", "b1"]
+
+    # descendants of dropped jobs are dropped too
+    parents = {k: v for k, v in PARENTS.items() if k != "base"}
+    assert sorted(drop_blocked(parents, lambda job_id: False)) == [
+        "a",
+        "a1",
+        "a2",
+        "b",
+        "b1",
+    ]
+    assert parents == {}
@@ -0,0 +1,55 @@
+import os
+
+from pathlib import Path
+
+from obr.core.core import map_view_folder_to_job_id
+from obr.core.view_index import build_view, read_view_index
+
+
+def make_jobs(tmp_path, job_ids):
+    job_paths = {}
+    for job_id in job_ids:
+        job_paths[job_id] = str(tmp_path / "workspace" / job_id)
+        os.makedirs(job_paths[job_id])
+    return job_paths
+
+
+def test_build_view(tmp_path):
+    view = tmp_path / "view"
+    job_paths = make_jobs(tmp_path, ["job1", "job2", "job3"])
+    mapping = {"job1": "path/1/", "job2": "path/2/", "job3": "other/3"}
+
+    stats = build_view(tmp_path, view, job_paths, mapping)
+    assert (stats.created, stats.removed, stats.kept) == (3, 0, 0)
+    assert read_view_index(tmp_path) == map_view_folder_to_job_id(str(view))
+    assert (view / "path/1").resolve() == Path(job_paths["job1"]).resolve()
+    assert os.readlink(view / "path/1") == "../../workspace/job1"
+
+    # only changed links are touched
+    link_inode = os.lstat(view / "path/1").st_ino
+    del job_paths["job3"]
+    mapping["job2"] = "path/4"
+    stats = build_view(tmp_path, view, job_paths, mapping)
+    assert (stats.created, stats.removed, stats.kept) == (1, 2, 1)
+    assert os.lstat(view / "path/1").st_ino == link_inode
+    assert not (view / "path/2").exists()
+    assert not (view / "other").exists()
+    assert read_view_index(tmp_path) == {"job1": "path/1", "job2": "path/4"}
+    assert read_view_index(tmp_path) == map_view_folder_to_job_id(str(view))
+
+
+def test_build_view_without_index(tmp_path):
+    view = tmp_path / "view"
+    job_paths = make_jobs(tmp_path, ["job1"])
+    (view / "stale").mkdir(parents=True)
+    assert read_view_index(tmp_path) is None
+
+    stats = build_view(tmp_path, view, job_paths, {"job1": "path/1"})
+    assert stats.created == 1
+    assert not (view / "stale").exists()
+
+    # links removed by hand are restored
+    (view / "path/1").unlink()
+    stats = build_view(tmp_path, view, job_paths, {"job1": "path/1"})
+    assert (stats.created, stats.removed, stats.kept) == (1, 1, 0)
+    assert (view / "path/1").is_symlink()